@@ -1,4 +1,21 @@
-from .openai_api import OpenAIHandler
-from .anthropic_api import AnthropicHandler
+from .stub_api import StubHandler
+from .heuristic_bot import HeuristicBotHandler
+from .prompt_cache import PromptCacheStats
+
+# 服務商 SDK 導入較慢，第一次使用對應的處理程序時才導入
+_LAZY_HANDLERS = {
+    "OpenAIHandler": ".openai_api",
+    "AnthropicHandler": ".anthropic_api"
+}
+
+def __getattr__(name):
+    """按需導入服務商處理程序（from api import OpenAIHandler 仍然可用）"""
+    module_name = _LAZY_HANDLERS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    handler = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = handler
+    return handler
 
 # 將來可以導入其他 API 處理程序
@@ -1,44 +1,94 @@
 import os
 import anthropic
 
+from .client_pool import shared_client
+from .prompt_cache import PromptCacheStats
+
 class AnthropicHandler:
     """處理與 Anthropic API (Claude) 的交互"""
     
-    def __init__(self, model="claude-3-opus-20240229"):
+    # 提示詞緩存需要的 beta 標頭
+    PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+    
+    def __init__(self, model="claude-3-opus-20240229", prompt_caching=True):
         """初始化 Anthropic API 處理器
         
         Args:
             model (str): 要使用的 Anthropic 模型名稱
+            prompt_caching (bool, optional): 是否為系統消息和穩定前綴啟用提示詞緩存。默認為 True
         """
         self.api_key = os.environ.get("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("缺少 ANTHROPIC_API_KEY 環境變數")
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
         self.model = model
+        self.prompt_caching = prompt_caching
+        self.cache_stats = PromptCacheStats()
+        self.last_usage = None  # 最近一次調用的實際標記數 (prompt_tokens, completion_tokens)
     
-    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500):
+    @property
+    def client(self):
+        """當前事件循環中共用的 AsyncAnthropic 客戶端"""
+        return shared_client(("anthropic", self.api_key), lambda: anthropic.AsyncAnthropic(api_key=self.api_key))
+    
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
         """從 Anthropic API 獲取回應
         
         Args:
-            prompt (str): 要發送給模型的提示
+            prompt (str): 要發送給模型的提示（易變後綴）
             system_message (str, optional): 系統消息。默認為 None
             temperature (float, optional): 溫度參數。默認為 0.7
             max_tokens (int, optional): 最大生成標記數。默認為 500
+            prompt_prefix (str, optional): 可緩存的穩定前綴，會放在提示之前。默認為 None
+            stop (list, optional): 停止序列，生成到其中任一序列即停止。默認為 None
             
         Returns:
             str: 模型的回應文本
         """
+        self.last_usage = None
         system = system_message or ""
+        extra_headers = None
+        
+        if self.prompt_caching:
+            # 系統消息和穩定前綴都標記為緩存斷點，後綴保持不變
+            cache_control = {"type": "ephemeral"}
+            if system:
+                system = [{"type": "text", "text": system, "cache_control": cache_control}]
+            content = []
+            if prompt_prefix:
+                content.append({"type": "text", "text": prompt_prefix, "cache_control": cache_control})
+            content.append({"type": "text", "text": prompt})
+            extra_headers = {"anthropic-beta": self.PROMPT_CACHING_BETA}
+        else:
+            content = (prompt_prefix or "") + prompt
         
-        response = self.client.messages.create(
+        response = await self.client.messages.create(
             model=self.model,
             system=system,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": content}
             ],
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            stop_sequences=stop or anthropic.NOT_GIVEN,
+            extra_headers=extra_headers
         )
         
+        self._record_cache_usage(response)
         return response.content[0].text
+    
+    def _record_cache_usage(self, response):
+        """記錄回應中的標記數和緩存使用情況
+        
+        Args:
+            response: Anthropic 回應對象
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        # Anthropic 的 input_tokens 不包括緩存讀寫的部分
+        prompt_tokens = (getattr(usage, "input_tokens", 0) or 0) + cache_read + cache_write
+        self.last_usage = (prompt_tokens, getattr(usage, "output_tokens", 0) or 0)
+        self.cache_stats.record(prompt_tokens, cache_read, cache_write)
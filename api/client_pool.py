@@ -0,0 +1,31 @@
+import asyncio
+import threading
+import weakref
+
+# 每個事件循環中共用的 SDK 客戶端 {event_loop: {key: client}}，事件循環關閉並回收後自動清除
+_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+def shared_client(key, factory):
+    """獲取當前事件循環中共用的 SDK 客戶端
+    
+    SDK 客戶端內部的連接池綁定在創建它的事件循環上，因此按事件循環分別緩存。
+    同一事件循環中使用相同服務商和 API key 的處理程序共用一個客戶端，
+    創建處理程序時不再構建客戶端。
+    
+    Args:
+        key (tuple): 緩存鍵，例如 ("openai", api_key)
+        factory (callable): 無參數的客戶端構造函數
+        
+    Returns:
+        SDK 客戶端
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _clients.get(loop)
+        if clients is None:
+            clients = _clients[loop] = {}
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = factory()
+    return client
@@ -0,0 +1,174 @@
+import random
+import re
+
+# 從討論中識別預言家公布的查驗結果，例如「我是預言家，昨晚查驗了玩家3，結果是狼人」
+_CHECK_CLAIM_PATTERN = re.compile(r'查驗了?玩家(\d+)[^。！]*?(狼人|好人)')
+_SEER_CLAIM_PATTERN = re.compile(r'我是預言家')
+_ACCUSE_PATTERN = re.compile(r'懷疑玩家(\d+)')
+_CANDIDATE_PATTERN = re.compile(r'^- 玩家(\d+)', re.MULTILINE)
+
+class HeuristicBotHandler:
+    """基於規則的AI玩家，不調用任何模型
+    
+    實現與模型處理程序相同的 get_response 接口，另外提供 choose_target 和
+    compose_speech，角色類檢測到這兩個方法時會直接使用，跳過提示詞構建。
+    規則：預言家優先查驗未查驗過的玩家並在查到狼人時公布；狼人不攻擊或投票
+    給隊友，優先攻擊跳預言家的玩家；其他人跟隨預言家公布的查驗結果投票。
+    """
+    
+    def __init__(self, model="heuristic", seed=None):
+        """初始化規則玩家
+        
+        Args:
+            model (str, optional): 顯示用的模型名稱。默認為 "heuristic"
+            seed (int, optional): 隨機種子
+        """
+        self.model = model
+        self.rng = random.Random(seed)  # 可重新設定種子以重現模擬結果
+    
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
+        """在沒有結構化信息時，從提示中的候選玩家中選擇一個
+        
+        Args:
+            prompt (str): 提示
+            system_message (str, optional): 不使用
+            temperature (float, optional): 不使用
+            max_tokens (int, optional): 不使用
+            prompt_prefix (str, optional): 不使用
+            stop (list, optional): 不使用
+            
+        Returns:
+            str: 回應文本
+        """
+        candidates = _CANDIDATE_PATTERN.findall(prompt)
+        if not candidates:
+            return "我還在觀察大家的發言。"
+        return f"我選擇玩家{self.rng.choice(candidates)}"
+    
+    def choose_target(self, role, action, legal_ids, game_state):
+        """為角色選擇行動目標
+        
+        Args:
+            role: 角色對象
+            action (str): 行動類型（check、attack、vote）
+            legal_ids (list): 合法的目標玩家 ID
+            game_state (dict): 該玩家可見的遊戲狀態
+            
+        Returns:
+            int: 目標玩家 ID
+        """
+        legal = set(legal_ids)
+        claims = self._claimed_checks(game_state)
+        
+        if action == "check":
+            checked = getattr(role, "checked_players", {})
+            unchecked = [pid for pid in legal_ids if pid not in checked and pid not in claims]
+            return self.rng.choice(unchecked or legal_ids)
+        
+        teammates = set(getattr(role, "teammates", []))
+        if action == "attack":
+            # 優先除掉公開身份的預言家
+            seers = [pid for pid in self._seer_claimants(game_state) if pid in legal]
+            return self.rng.choice(seers or legal_ids)
+        
+        # 投票
+        if teammates:
+            candidates = [pid for pid in legal_ids if pid not in teammates]
+            seers = [pid for pid in self._seer_claimants(game_state) if pid in candidates]
+            return self.rng.choice(seers or candidates or legal_ids)
+        
+        known_wolves = [pid for pid, result in getattr(role, "checked_players", {}).items()
+                        if result == "狼人" and pid in legal]
+        if known_wolves:
+            return known_wolves[0]
+        
+        claimed_wolves = [pid for pid, result in claims.items() if result == "狼人" and pid in legal]
+        if claimed_wolves:
+            return claimed_wolves[0]
+        
+        cleared = {pid for pid, result in claims.items() if result == "好人"}
+        accused = self._most_accused(game_state, legal - cleared)
+        if accused is not None:
+            return accused
+        return self.rng.choice([pid for pid in legal_ids if pid not in cleared] or legal_ids)
+    
+    def compose_speech(self, role, game_state):
+        """為角色生成白天發言
+        
+        Args:
+            role: 角色對象
+            game_state (dict): 該玩家可見的遊戲狀態
+            
+        Returns:
+            str: 發言內容
+        """
+        alive = [p["player_id"] for p in game_state["players"] if p["is_alive"] and p["player_id"] != role.player_id]
+        if not alive:
+            return "我沒有什麼要補充的。"
+        
+        checked = getattr(role, "checked_players", {})
+        if checked:
+            alive_set = set(alive)
+            wolves = [pid for pid, result in checked.items() if result == "狼人" and pid in alive_set]
+            if wolves:
+                return f"我是預言家，我查驗了玩家{wolves[0]}，結果是狼人，大家投他。"
+            latest = next(reversed(checked))
+            return f"我是預言家，我查驗了玩家{latest}，結果是好人。"
+        
+        teammates = set(getattr(role, "teammates", []))
+        suspects = [pid for pid in alive if pid not in teammates]
+        claims = self._claimed_checks(game_state)
+        claimed_wolves = [pid for pid, result in claims.items() if result == "狼人" and pid in suspects]
+        if claimed_wolves and not teammates:
+            return f"我相信預言家的查驗，我懷疑玩家{claimed_wolves[0]}是狼人。"
+        return f"我懷疑玩家{self.rng.choice(suspects or alive)}，他的發言有些可疑。"
+    
+    def _claimed_checks(self, game_state):
+        """從今天的討論中收集預言家公布的查驗結果
+        
+        Args:
+            game_state (dict): 遊戲狀態
+            
+        Returns:
+            dict: {player_id: "狼人" 或 "好人"}
+        """
+        claims = {}
+        for discussion in game_state["current_discussions"]:
+            content = discussion["content"]
+            if not _SEER_CLAIM_PATTERN.search(content):
+                continue
+            for player_id, result in _CHECK_CLAIM_PATTERN.findall(content):
+                claims[int(player_id)] = result
+        return claims
+    
+    def _seer_claimants(self, game_state):
+        """今天自稱預言家的玩家
+        
+        Args:
+            game_state (dict): 遊戲狀態
+            
+        Returns:
+            list: 玩家 ID 列表
+        """
+        return [d["player_id"] for d in game_state["current_discussions"]
+                if _SEER_CLAIM_PATTERN.search(d["content"])]
+    
+    def _most_accused(self, game_state, candidates):
+        """今天被懷疑次數最多的候選玩家
+        
+        Args:
+            game_state (dict): 遊戲狀態
+            candidates (set): 候選玩家 ID
+            
+        Returns:
+            int: 玩家 ID，沒有人被懷疑時為 None
+        """
+        counts = {}
+        for discussion in game_state["current_discussions"]:
+            for player_id in _ACCUSE_PATTERN.findall(discussion["content"]):
+                player_id = int(player_id)
+                if player_id in candidates:
+                    counts[player_id] = counts.get(player_id, 0) + 1
+        if not counts:
+            return None
+        return max(sorted(counts), key=counts.get)
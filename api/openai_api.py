@@ -1,5 +1,8 @@
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from .client_pool import shared_client
+from .prompt_cache import PromptCacheStats
 
 class OpenAIHandler:
     """處理與 OpenAI API 的交互"""
@@ -14,33 +17,62 @@ class OpenAIHandler:
         if not self.api_key:
             raise ValueError("缺少 OPENAI_API_KEY 環境變數")
         
-        self.client = OpenAI(api_key=self.api_key)
         self.model = model
+        self.cache_stats = PromptCacheStats()
+        self.last_usage = None  # 最近一次調用的實際標記數 (prompt_tokens, completion_tokens)
+    
+    @property
+    def client(self):
+        """當前事件循環中共用的 AsyncOpenAI 客戶端"""
+        return shared_client(("openai", self.api_key), lambda: AsyncOpenAI(api_key=self.api_key))
     
-    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500):
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
         """從 OpenAI API 獲取回應
         
+        OpenAI 會自動緩存相同的提示前綴，因此只需保證系統消息和穩定前綴
+        總是位於消息的最前面。
+        
         Args:
-            prompt (str): 要發送給模型的提示
+            prompt (str): 要發送給模型的提示（易變後綴）
             system_message (str, optional): 系統消息。默認為 None
             temperature (float, optional): 溫度參數。默認為 0.7
             max_tokens (int, optional): 最大生成標記數。默認為 500
+            prompt_prefix (str, optional): 可緩存的穩定前綴，會放在提示之前。默認為 None
+            stop (list, optional): 停止序列，生成到其中任一序列即停止。默認為 None
             
         Returns:
             str: 模型的回應文本
         """
+        self.last_usage = None
         messages = []
         
         if system_message:
             messages.append({"role": "system", "content": system_message})
         
-        messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "user", "content": (prompt_prefix or "") + prompt})
         
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.model,
             messages=messages,
             temperature=temperature,
-            max_tokens=max_tokens
+            max_tokens=max_tokens,
+            stop=stop
         )
         
+        self._record_cache_usage(response)
         return response.choices[0].message.content
+    
+    def _record_cache_usage(self, response):
+        """記錄回應中的標記數和緩存使用情況
+        
+        Args:
+            response: OpenAI 回應對象
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.last_usage = (prompt_tokens, getattr(usage, "completion_tokens", 0) or 0)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+        self.cache_stats.record(prompt_tokens, cached_tokens)
@@ -0,0 +1,106 @@
+import threading
+
+def estimate_tokens(text):
+    """粗略估計文本的標記數（中文約一字一標記，英文約四字元一標記）
+    
+    Args:
+        text (str): 文本
+        
+    Returns:
+        int: 估計的標記數
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def call_usage(handler, response, prompt, prompt_prefix=None, system_message=None):
+    """一次調用的 (提示標記數, 生成標記數)
+    
+    優先使用服務商返回的實際用量（處理程序的 last_usage，在 get_response 返回前設置，
+    必須在 await 返回後立即讀取）；替身處理程序和沒有用量信息的回應按 estimate_tokens 估計。
+    
+    Args:
+        handler: 處理程序
+        response (str): 回應文本，調用失敗時為 None
+        prompt (str): 提示
+        prompt_prefix (str, optional): 提示前綴
+        system_message (str, optional): 系統消息
+        
+    Returns:
+        tuple: (prompt_tokens, completion_tokens)
+    """
+    usage = getattr(handler, "last_usage", None) if response is not None else None
+    if usage is not None:
+        return usage
+    prompt_tokens = estimate_tokens(prompt) + estimate_tokens(prompt_prefix) + estimate_tokens(system_message)
+    return prompt_tokens, estimate_tokens(response)
+
+
+class PromptCacheStats:
+    """統計服務商側提示詞緩存的命中情況"""
+    
+    def __init__(self):
+        """初始化緩存統計"""
+        self._lock = threading.Lock()
+        self.requests = 0  # 請求總數
+        self.hits = 0  # 有緩存命中的請求數
+        self.prompt_tokens = 0  # 輸入標記總數
+        self.cached_tokens = 0  # 從緩存讀取的輸入標記數
+        self.cache_write_tokens = 0  # 寫入緩存的輸入標記數
+    
+    def record(self, prompt_tokens, cached_tokens=0, cache_write_tokens=0):
+        """記錄一次請求的緩存情況
+        
+        Args:
+            prompt_tokens (int): 輸入標記總數（包括緩存部分）
+            cached_tokens (int, optional): 從緩存讀取的標記數。默認為 0
+            cache_write_tokens (int, optional): 寫入緩存的標記數。默認為 0
+        """
+        with self._lock:
+            self.requests += 1
+            if cached_tokens:
+                self.hits += 1
+            self.prompt_tokens += prompt_tokens or 0
+            self.cached_tokens += cached_tokens or 0
+            self.cache_write_tokens += cache_write_tokens or 0
+    
+    def merge(self, other):
+        """合併另一份統計
+        
+        Args:
+            other (PromptCacheStats): 另一份統計
+        """
+        with self._lock:
+            self.requests += other.requests
+            self.hits += other.hits
+            self.prompt_tokens += other.prompt_tokens
+            self.cached_tokens += other.cached_tokens
+            self.cache_write_tokens += other.cache_write_tokens
+    
+    @property
+    def hit_rate(self):
+        """有緩存命中的請求比例"""
+        return self.hits / self.requests if self.requests else 0.0
+    
+    @property
+    def token_hit_rate(self):
+        """從緩存讀取的輸入標記比例"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+    
+    def to_dict(self):
+        """轉換為字典
+        
+        Returns:
+            dict: 統計數據
+        """
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "token_hit_rate": round(self.token_hit_rate, 4)
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import re
+import time
+from collections import OrderedDict
+
+from .prompt_cache import PromptCacheStats, estimate_tokens
+
+class StubHandler:
+    """本地替身 API 處理程序，不調用任何模型
+    
+    模擬服務商的延遲模型：固定開銷 + 未緩存輸入標記 + 緩存輸入標記 + 輸出標記，
+    並像服務商一樣緩存最近出現過的（系統消息, 前綴）組合，用於在沒有 API key
+    的情況下驗證提示詞緩存的效果、運行模擬和基準測試。
+    """
+    
+    def __init__(self, model="stub", base_latency=0.3, uncached_token_latency=0.0004,
+                 cached_token_latency=0.00004, output_token_latency=0.02, time_scale=1.0,
+                 cache_ttl=300.0, cache_size=1024, min_cacheable_tokens=0, seed=None):
+        """初始化替身處理器
+        
+        Args:
+            model (str, optional): 顯示用的模型名稱。默認為 "stub"
+            base_latency (float, optional): 每次請求的固定延遲（秒）
+            uncached_token_latency (float, optional): 每個未緩存輸入標記的延遲（秒）
+            cached_token_latency (float, optional): 每個緩存輸入標記的延遲（秒）
+            output_token_latency (float, optional): 每個輸出標記的延遲（秒）
+            time_scale (float, optional): 延遲縮放係數，0 表示不等待。默認為 1.0
+            cache_ttl (float, optional): 前綴緩存的有效期（秒）。默認為 300
+            cache_size (int, optional): 最多緩存的前綴數量。默認為 1024
+            min_cacheable_tokens (int, optional): 可緩存前綴的最小標記數。默認為 0
+            seed (int, optional): 隨機種子
+        """
+        self.model = model
+        self.base_latency = base_latency
+        self.uncached_token_latency = uncached_token_latency
+        self.cached_token_latency = cached_token_latency
+        self.output_token_latency = output_token_latency
+        self.time_scale = time_scale
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.min_cacheable_tokens = min_cacheable_tokens
+        self.cache_stats = PromptCacheStats()
+        self.simulated_latency = 0.0  # 累計模擬延遲（秒）
+        self._prefix_cache = OrderedDict()  # {(system_message, prefix): 過期時間}
+        self.rng = random.Random(seed)  # 可重新設定種子以重現模擬結果
+    
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
+        """返回一個模擬回應
+        
+        Args:
+            prompt (str): 提示（易變後綴）
+            system_message (str, optional): 系統消息。默認為 None
+            temperature (float, optional): 不使用
+            max_tokens (int, optional): 最大生成標記數。默認為 500
+            prompt_prefix (str, optional): 可緩存的穩定前綴。默認為 None
+            stop (list, optional): 停止序列。默認為 None
+            
+        Returns:
+            str: 模擬的回應文本
+        """
+        prefix_tokens = estimate_tokens(system_message) + estimate_tokens(prompt_prefix)
+        prompt_tokens = prefix_tokens + estimate_tokens(prompt)
+        cached_tokens = 0
+        cache_write_tokens = 0
+        
+        if prompt_prefix and prefix_tokens >= self.min_cacheable_tokens:
+            if self._lookup_prefix((system_message, prompt_prefix)):
+                cached_tokens = prefix_tokens
+            else:
+                cache_write_tokens = prefix_tokens
+        self.cache_stats.record(prompt_tokens, cached_tokens, cache_write_tokens)
+        
+        response = self._compose_response(prompt, stop)
+        output_tokens = min(estimate_tokens(response), max_tokens)
+        latency = (self.base_latency
+                   + (prompt_tokens - cached_tokens) * self.uncached_token_latency
+                   + cached_tokens * self.cached_token_latency
+                   + output_tokens * self.output_token_latency)
+        self.simulated_latency += latency
+        
+        if self.time_scale > 0:
+            await asyncio.sleep(latency * self.time_scale)
+        return response
+    
+    def _lookup_prefix(self, key):
+        """查找並刷新前綴緩存
+        
+        Args:
+            key (tuple): (system_message, prefix)
+            
+        Returns:
+            bool: 是否命中
+        """
+        now = time.monotonic()
+        expires = self._prefix_cache.pop(key, None)
+        hit = expires is not None and expires > now
+        self._prefix_cache[key] = now + self.cache_ttl
+        while len(self._prefix_cache) > self.cache_size:
+            self._prefix_cache.popitem(last=False)
+        return hit
+    
+    def _compose_response(self, prompt, stop=None):
+        """從提示中的候選玩家中隨機選擇一個作為回應
+        
+        Args:
+            prompt (str): 提示
+            stop (list, optional): 停止序列，回應會在第一個停止序列處截斷
+            
+        Returns:
+            str: 回應文本
+        """
+        candidates = re.findall(r'^- 玩家(\d+)', prompt, re.MULTILINE)
+        if not candidates:
+            return "我還在觀察大家的發言，暫時沒有明確的懷疑對象。"
+        
+        target = self.rng.choice(candidates)
+        if '"target"' in prompt:
+            response = f'{{"target": {target}}}'
+        elif "回答格式" in prompt:
+            response = f"我選擇玩家{target}"
+        else:
+            response = f"我覺得玩家{target}的發言有些可疑，大家可以多留意。"
+        for sequence in stop or []:
+            if sequence in response:
+                response = response[:response.index(sequence)]
+        return response
@@ -1,21 +1,255 @@
+import os
+
+from flask import Response, jsonify, request, session
+from flask_socketio import emit, join_room
+
+from models import tracing
+from models.admission import AdmissionController
+from models.broadcast import RoomBroadcaster
+from models.game_manager import GameManager
+from models.lobby_pool import LobbyPool
+from models.response_cache import VersionedResponseCache
+from models.telemetry import llm_telemetry
+
+# Socket.IO 服務器和進行中的遊戲 {game_id: GameManager}，由 register_routes 綁定
+socketio = None
+active_games = {}
+
+# 新遊戲的准入控制（ADMISSION_CONTROL=on 時啟用），根據模型調用延遲自動收緊容量
+admission_controller = AdmissionController.from_env()
+if admission_controller is not None:
+    llm_telemetry.latency_listeners.append(admission_controller.observe_latency)
+
 async def process_ai_night_actions(game_id, game_manager=None):
-    """處理AI玩家的夜間行動"""
+    """處理AI玩家的夜間行動並結算夜晚（在人類玩家提交夜間行動之後調用）
+    
+    各狼群首領和預言家同時決策（見 GameManager.run_night_actions），所有狼群的攻擊一次結算。
+    """
     if game_manager is None:
         game_manager = active_games.get(game_id)
         if not game_manager:
             return
     
-    # 獲取所有存活的AI玩家
-    ai_players = [(p["player_id"], game_manager.game_state.player_objects[p["player_id"]])
-                 for p in game_manager.game_state.players
-                 if p["is_alive"] and p["player_id"] not in game_manager.human_players]  # 排除人類玩家
-    
-    # 為每個AI玩家執行夜間行動
-    for player_id, player_obj in ai_players:
-        api_handler = game_manager.api_handlers.get(player_id)
-        if api_handler:
-            action_result = await player_obj.night_action(
-                game_manager.game_state.get_state_for_player(player_id),
-                api_handler
-            )
-            game_manager.game_state.night_actions[player_id] = action_result
\ No newline at end of file
+    await game_manager.run_night_actions()
+    game_manager.game_state.resolve_night_actions()
+
+async def process_ai_discussions(game_id, game_manager=None):
+    """處理AI玩家的白天討論（模式由 DISCUSSION_MODE 環境變量決定）"""
+    if game_manager is None:
+        game_manager = active_games.get(game_id)
+        if not game_manager:
+            return []
+    
+    return await game_manager.run_day_discussion()
+
+def register_win_probability_push(game_id, game_manager):
+    """每個階段結束後向房間內的客戶端推送勝率估計"""
+    def push(manager, phase):
+        with tracing.span("emit", event="win_probability"):
+            broadcaster = room_broadcasters.get(game_id)
+            if broadcaster is not None:
+                broadcaster.emit_event('win_probability', manager.get_win_probability())
+            else:
+                socketio.emit('win_probability', manager.get_win_probability(), room=game_id)
+    
+    game_manager.phase_listeners.append(push)
+
+# 預建常用配置的遊戲（LOBBY_POOL_SIZE=0 時關閉）；收到第一個請求時才在後台補充，
+# 導入本模組時不構建處理程序，也不導入服務商 SDK
+lobby_pool = LobbyPool.from_env()
+lobby_pool_warmed = False
+
+def warm_lobby_pool():
+    """第一個請求到達時在後台預建遊戲（由 register_routes 註冊為 before_request）"""
+    global lobby_pool_warmed
+    if lobby_pool is not None and not lobby_pool_warmed:
+        lobby_pool_warmed = True
+        lobby_pool.warm()
+
+def create_game_manager(player_count, werewolf_count, special_roles, human_players, api_type, model_name,
+                        game_id=None):
+    """在 /create_game 中調用：優先從遊戲池取得已設置好的遊戲，沒有預建時同步創建；game_id 會附加到遊戲日誌"""
+    if lobby_pool is not None:
+        game_manager = lobby_pool.acquire(player_count, werewolf_count, special_roles, human_players, api_type,
+                                          model_name)
+    else:
+        game_manager = GameManager()
+        game_manager.setup_game(player_count, werewolf_count, special_roles, human_players, api_type, model_name)
+    game_manager.game_state.game_id = game_id
+    return game_manager
+
+def admit_game(game_id, game_manager):
+    """在 /create_game 中調用：按本局的模型需求申請容量
+    
+    返回 rejected 時應以 503 回應並附上 Retry-After；返回 queued 時遊戲保留在 active_games 中，
+    但在收到 game_admitted 事件前不開始進行。
+    
+    Returns:
+        dict: 准入結果，見 AdmissionController.admit
+    """
+    if admission_controller is None:
+        return {"status": "admitted", "position": 0, "eta": 0.0, "reason": None}
+    return admission_controller.admit(game_id, game_manager.llm_demand())
+
+def finish_game(game_id, completed=True):
+    """遊戲結束或被放棄時釋放容量，排隊的遊戲會收到 game_admitted 事件"""
+    if admission_controller is not None:
+        admission_controller.release(game_id, completed)
+    response_cache.discard(game_id)
+
+def notify_game_admitted(game_id):
+    """通知房間內的客戶端排隊的遊戲可以開始"""
+    socketio.emit('game_admitted', {"game_id": game_id}, room=game_id)
+
+if admission_controller is not None:
+    admission_controller.admit_listeners.append(notify_game_admitted)
+
+def admission_status():
+    """准入控制的容量、預留和排隊情況"""
+    if admission_controller is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(admission_controller.status(), enabled=True))
+
+def lobby_pool_status():
+    """遊戲池的命中情況和各配置的預建數量"""
+    if lobby_pool is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(lobby_pool.stats(), enabled=True))
+
+# 按可見性分組的房間廣播 {game_id: RoomBroadcaster}
+room_broadcasters = {}
+
+def register_room_broadcast(game_id, game_manager):
+    """每個階段結束後按可見性分組推送房間狀態，每個分組只序列化一次"""
+    broadcaster = room_broadcasters[game_id] = RoomBroadcaster(game_id, game_manager.game_state, socketio.emit)
+    
+    def push(manager, phase):
+        with tracing.span("emit", event="room_update"):
+            broadcaster.broadcast()
+    
+    game_manager.phase_listeners.append(push)
+    return broadcaster
+
+def join_visibility_room(game_id, player_id=None):
+    """在加入房間的事件處理中調用：把連接加入對應的可見性子房間（player_id 為 None 表示觀眾）"""
+    broadcaster = room_broadcasters.get(game_id)
+    if broadcaster is not None:
+        join_room(broadcaster.room_for(player_id))
+
+def claim_seat(game_id, player_id):
+    """在 /create_game 或加入遊戲時調用：把人類玩家的座位記錄在會話中（渲染 game.html 時也應傳入 player_id），
+    之後的 resume 和狀態查詢只認會話中的座位，不信任客戶端提交的座位"""
+    seats = dict(session.get('seats', {}))
+    seats[game_id] = player_id
+    session['seats'] = seats
+
+def seat_for(game_id, game_manager):
+    """當前會話在本局的座位，沒有座位或座位不是人類玩家時為 None（按觀眾處理）"""
+    player_id = session.get('seats', {}).get(game_id)
+    return player_id if player_id in game_manager.human_players else None
+
+def on_resume(data):
+    """斷線重連或刷新頁面後補發錯過的事件；重放緩衝區已覆蓋時改發完整的房間狀態
+    
+    客戶端提交 {game_id, last_seq, epoch, player_id}；epoch 與當前房間不同時（服務器重啟）按 last_seq=0 補發。
+    座位以會話中記錄的為準（見 claim_seat），客戶端提交的 player_id 與之不符時按觀眾處理，
+    以免觀眾冒用座位看到狼人分組的內容。
+    """
+    game_id = data.get('game_id')
+    broadcaster = room_broadcasters.get(game_id)
+    game_manager = active_games.get(game_id)
+    if broadcaster is None or game_manager is None:
+        return
+    player_id = seat_for(game_id, game_manager)
+    if data.get('player_id') != player_id:
+        player_id = None
+    join_room(game_id)
+    join_visibility_room(game_id, player_id)
+    for event, payload in broadcaster.replay(int(data.get('last_seq') or 0), player_id, data.get('epoch')):
+        emit(event, payload)
+
+# 輪詢接口的響應緩存：狀態版本不變時重用序列化後的字節，客戶端的 ETag 匹配時回答 304
+response_cache = VersionedResponseCache()
+
+def conditional_json(key, version, build):
+    """按版本返回 JSON 響應：If-None-Match 與當前 ETag 相同時直接回答 304，否則返回緩存的響應體"""
+    etag = response_cache.etag(key, version)
+    if request.if_none_match.contains(etag):
+        response_cache.record_not_modified()
+        response = Response(status=304)
+    else:
+        etag, body = response_cache.get(key, version, build)
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # 允許緩存但每次都要重新驗證
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def game_summary(game_id):
+    """公開的遊戲摘要（帶 ETag，狀態和費用不變時回答 304），遊戲結束前不含存活玩家的角色"""
+    game_manager = active_games.get(game_id)
+    if not game_manager:
+        return jsonify({"error": "遊戲不存在"}), 404
+    return conditional_json((game_id, 'summary'), game_manager.summary_version(),
+                            game_manager.get_public_summary)
+
+def player_state(game_id, player_id):
+    """人類玩家可見的遊戲狀態（帶 ETag，狀態版本不變時回答 304），只能查看會話中記錄的座位"""
+    game_manager = active_games.get(game_id)
+    if not game_manager:
+        return jsonify({"error": "遊戲不存在"}), 404
+    if player_id != seat_for(game_id, game_manager):
+        return jsonify({"error": "只能查看自己座位的狀態"}), 403
+    game_state = game_manager.game_state
+    return conditional_json((game_id, 'state', player_id), game_state.version,
+                            lambda: game_state.get_state_for_player(player_id))
+
+def response_cache_status():
+    """輪詢接口的緩存命中和 304 次數"""
+    return jsonify(response_cache.stats())
+
+def resident_memory_bytes():
+    """當前進程的常駐內存（字節），無法讀取 /proc 時使用峰值"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def render_process_metrics():
+    """以 Prometheus 文本格式輸出進行中的遊戲數和進程內存，供壓測估算每局內存"""
+    return "\n".join([
+        "# HELP werewolf_active_games 進行中的遊戲數",
+        "# TYPE werewolf_active_games gauge",
+        f"werewolf_active_games {len(active_games)}",
+        "# HELP werewolf_process_resident_memory_bytes 服務器進程的常駐內存",
+        "# TYPE werewolf_process_resident_memory_bytes gauge",
+        f"werewolf_process_resident_memory_bytes {resident_memory_bytes()}"
+    ]) + "\n"
+
+def metrics():
+    """以 Prometheus 文本格式輸出模型調用指標和進程指標"""
+    body = llm_telemetry.render_prometheus() + render_process_metrics()
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def register_routes(flask_app, socketio_server, games):
+    """在創建 Flask 應用和 Socket.IO 服務器的地方調用：綁定進行中的遊戲字典並註冊本模組的接口
+    
+    Args:
+        flask_app (Flask): Flask 應用
+        socketio_server (SocketIO): Socket.IO 服務器
+        games (dict): 進行中的遊戲 {game_id: GameManager}
+    """
+    global socketio, active_games
+    socketio = socketio_server
+    active_games = games
+    
+    flask_app.before_request(warm_lobby_pool)
+    flask_app.add_url_rule('/admission', view_func=admission_status)
+    flask_app.add_url_rule('/lobby_pool', view_func=lobby_pool_status)
+    flask_app.add_url_rule('/game/<game_id>/summary', view_func=game_summary)
+    flask_app.add_url_rule('/game/<game_id>/state/<int:player_id>', view_func=player_state)
+    flask_app.add_url_rule('/response_cache', view_func=response_cache_status)
+    flask_app.add_url_rule('/metrics', view_func=metrics)
+    socketio_server.on_event('resume', on_resume)
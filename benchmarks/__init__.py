@@ -0,0 +1 @@
+# 遊戲引擎基準測試：python -m benchmarks.engine
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Callable, Optional
+
+from models.game_log import configure_game_logging
+from models.game_manager import GameManager
+from models.game_state import GameState
+
+# 基準測試的大廳人數
+LOBBY_SIZES = (6, 12, 25, 50, 100, 200)
+
+# 完整遊戲基準使用的人數（大廳越大，一局越慢）
+FULL_GAME_SIZES = (6, 12, 25, 50)
+
+# 每項基準的最少計時次數和最短總時間（秒）
+MIN_ROUNDS = 5
+MIN_TIME = 0.2
+
+# 預設的結果目錄和回歸閾值（中位數變慢超過此比例視為回歸）
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+REGRESSION_THRESHOLD = 0.2
+
+# 每名玩家預先寫入的歷史事件數
+HISTORY_EVENTS = 20
+
+
+def werewolf_count_for(player_count: int) -> int:
+    """大廳人數對應的狼人數量（約四分之一，且符合 setup_game 的限制）"""
+    return max(1, min(player_count // 4, player_count // 2 - 1))
+
+
+def measure(func: Callable, setup: Optional[Callable] = None, min_rounds: int = MIN_ROUNDS,
+            min_time: float = MIN_TIME) -> Dict[str, Any]:
+    """逐次計時，setup 的耗時不計入
+    
+    Args:
+        func (Callable): 被測函數，接收 setup 的返回值（沒有 setup 時不帶參數）
+        setup (Callable, optional): 每次計時前的準備函數
+        min_rounds (int, optional): 最少計時次數
+        min_time (float, optional): 最短總計時時間（秒）
+        
+    Returns:
+        Dict[str, Any]: {"rounds", "min_us", "median_us", "mean_us"}
+    """
+    timings = []
+    total = 0.0
+    while len(timings) < min_rounds or total < min_time:
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        if setup:
+            func(argument)
+        else:
+            func()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        total += elapsed
+        if len(timings) >= 10000:
+            break
+    return {
+        "rounds": len(timings),
+        "min_us": min(timings) * 1e6,
+        "median_us": statistics.median(timings) * 1e6,
+        "mean_us": statistics.fmean(timings) * 1e6
+    }
+
+
+def make_game_state(player_count: int, seed: int = 0) -> GameState:
+    """構建一個處於第二天白天的遊戲狀態：每名玩家有歷史記錄，所有存活玩家都已發言
+    
+    Args:
+        player_count (int): 玩家數量
+        seed (int, optional): 隨機種子
+        
+    Returns:
+        GameState: 遊戲狀態
+    """
+    random.seed(seed)
+    game_state = GameState()
+    game_state.setup_game(player_count, werewolf_count_for(player_count), ["seer"])
+    game_state.day = 2
+    game_state.phase = "day"
+    
+    # 第一晚死一名好人
+    victim = next(p for p in game_state.players if p["role"] != "werewolf")
+    victim["is_alive"] = False
+    game_state.last_night_deaths = [{"player_id": victim["player_id"], "name": victim["name"], "role": victim["role"]}]
+    
+    for index in range(HISTORY_EVENTS):
+        event = f"第{1 + index // 10}天：玩家{1 + index % player_count}懷疑玩家{1 + (index * 7) % player_count}是狼人"
+        for player_obj in game_state.player_objects.values():
+            player_obj.add_history(event)
+    
+    alive = [p for p in game_state.players if p["is_alive"]]
+    game_state.current_discussions = [{
+        "player_id": p["player_id"],
+        "player_name": p["name"],
+        "content": f"我覺得玩家{alive[(i + 1) % len(alive)]['player_id']}的發言有些可疑，大家可以多留意。"
+    } for i, p in enumerate(alive)]
+    game_state.vote_history = [{"day": 1, "votes": {p["player_id"]: alive[0]["player_id"] for p in alive}, "exiled": None}]
+    game_state.bump_version()
+    return game_state
+
+
+def random_votes(game_state: GameState, majority: float = 0.6) -> Dict[int, int]:
+    """為所有存活玩家生成投票：多數人投給同一名玩家，其餘隨機，保證有人被放逐
+    
+    Args:
+        game_state (GameState): 遊戲狀態
+        majority (float, optional): 投給同一目標的比例。默認為 0.6
+        
+    Returns:
+        Dict[int, int]: {投票者ID: 目標ID}
+    """
+    alive = [p["player_id"] for p in game_state.players if p["is_alive"]]
+    target = random.choice(alive)
+    votes = {}
+    for voter in alive:
+        if voter != target and random.random() < majority:
+            votes[voter] = target
+        else:
+            votes[voter] = random.choice([pid for pid in alive if pid not in (voter, target)])
+    return votes
+
+
+def bench_lobby(player_count: int) -> Dict[str, Dict[str, Any]]:
+    """運行一個大廳人數下的所有引擎基準
+    
+    Args:
+        player_count (int): 玩家數量
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: {基準名稱: 計時結果}
+    """
+    results = {}
+    werewolves = werewolf_count_for(player_count)
+    game_state = make_game_state(player_count)
+    player_ids = [p["player_id"] for p in game_state.players]
+    
+    results["setup_game"] = measure(lambda: GameState().setup_game(player_count, werewolves, ["seer"]))
+    
+    def all_states(include_beliefs):
+        game_state.bump_version()
+        for player_id in player_ids:
+            game_state.get_state_for_player(player_id, include_beliefs=include_beliefs)
+    
+    results["get_state_for_player"] = measure(lambda: all_states(False))
+    results["get_state_for_player+beliefs"] = measure(lambda: all_states(True))
+    
+    # 投票會放逐玩家並追加日誌，每次計時前恢復存活狀態和日誌（玩家歷史照常增長）
+    vote_state = make_game_state(player_count)
+    alive_flags = [p["is_alive"] for p in vote_state.players]
+    log_length = len(vote_state.log)
+    
+    def vote_setup():
+        for player, alive in zip(vote_state.players, alive_flags):
+            player["is_alive"] = alive
+        del vote_state.vote_history[1:]
+        del vote_state.log[log_length:]
+        vote_state.votes = random_votes(vote_state)
+        return vote_state
+    
+    results["process_votes"] = measure(lambda state: state._process_votes(), setup=vote_setup)
+    results["check_game_over"] = measure(lambda: game_state.check_game_over())
+    
+    # 提示詞構建：每次計時前清空緩存，測量完整構建的成本
+    prompt_state = make_game_state(player_count)
+    for role_name in ("seer", "werewolf", "villager"):
+        player = next(p for p in prompt_state.players if p["role"] == role_name and p["is_alive"])
+        player_obj = prompt_state.player_objects[player["player_id"]]
+        visible = prompt_state.get_state_for_player(player["player_id"])
+        alive_players = [p for p in visible["players"] if p["is_alive"] and p["player_id"] != player["player_id"]]
+        
+        def cold(obj=player_obj):
+            obj.prompt_builder.invalidate()
+            return obj
+        
+        results[f"prompt_discussion[{role_name}]"] = measure(lambda obj: obj._build_discussion_prompt(visible),
+                                                             setup=cold)
+        results[f"prompt_vote[{role_name}]"] = measure(lambda obj: obj._build_vote_prompt(visible, alive_players),
+                                                       setup=cold)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "game.json")
+        results["save_game"] = measure(lambda: game_state.save_game(path))
+        results["load_game"] = measure(lambda: GameState.load_game(path))
+    
+    return results
+
+
+def bench_full_game(player_count: int, games: int = 3) -> Dict[str, Any]:
+    """用本地替身處理程序完整運行遊戲（不模擬延遲）
+    
+    Args:
+        player_count (int): 玩家數量
+        games (int, optional): 局數，每局使用不同的種子
+        
+    Returns:
+        Dict[str, Any]: 計時結果
+    """
+    seeds = iter(range(10 ** 6))
+    
+    def setup():
+        random.seed(next(seeds))
+        game_manager = GameManager()
+        game_manager.setup_game(player_count, werewolf_count_for(player_count), ["seer"], [], "stub", "stub")
+        for handler in {id(h): h for h in game_manager.api_handlers.values()}.values():
+            handler.time_scale = 0.0
+        return game_manager
+    
+    return measure(lambda game_manager: asyncio.run(game_manager.play_game()), setup=setup, min_rounds=games,
+                   min_time=0.0)
+
+
+def run_benchmarks(sizes=LOBBY_SIZES, full_game_sizes=FULL_GAME_SIZES) -> Dict[str, Any]:
+    """運行整個基準套件
+    
+    Args:
+        sizes (tuple, optional): 引擎基準的大廳人數
+        full_game_sizes (tuple, optional): 完整遊戲基準的大廳人數
+        
+    Returns:
+        Dict[str, Any]: {"meta": {...}, "results": {"名稱[n=人數]": 計時結果}}
+    """
+    results = {}
+    configure_game_logging(level="WARNING")  # 基準測試時只輸出警告
+    for size in sizes:
+        for name, timing in bench_lobby(size).items():
+            results[f"{name}[n={size}]"] = timing
+    for size in full_game_sizes:
+        results[f"full_game_stub[n={size}]"] = bench_full_game(size)
+    return {"meta": _metadata(), "results": results}
+
+
+def _metadata() -> Dict[str, Any]:
+    """記錄運行環境，便於比較不同提交的結果"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine()
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = REGRESSION_THRESHOLD) -> List[Dict[str, Any]]:
+    """比較兩次運行的中位數耗時
+    
+    Args:
+        current (Dict[str, Any]): 本次結果
+        baseline (Dict[str, Any]): 基準結果
+        threshold (float, optional): 回歸閾值。默認為 0.2（變慢 20%）
+        
+    Returns:
+        List[Dict[str, Any]]: 每項基準的 {"name", "baseline_us", "current_us", "change", "regression"}
+    """
+    rows = []
+    for name, timing in current["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous:
+            continue
+        change = timing["median_us"] / previous["median_us"] - 1 if previous["median_us"] else 0.0
+        rows.append({
+            "name": name,
+            "baseline_us": previous["median_us"],
+            "current_us": timing["median_us"],
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def format_results(report: Dict[str, Any]) -> str:
+    """生成結果表格"""
+    lines = [f"{'基準':<40} {'中位數':>14} {'最小值':>14} {'次數':>8}"]
+    for name, timing in report["results"].items():
+        lines.append(f"{name:<40} {timing['median_us']:>11.1f} µs {timing['min_us']:>11.1f} µs {timing['rounds']:>8}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m benchmarks.engine --save --compare benchmarks/results/baseline.json"""
+    parser = argparse.ArgumentParser(description="遊戲引擎熱點路徑的基準測試")
+    parser.add_argument("--sizes", default=",".join(map(str, LOBBY_SIZES)), help="大廳人數，以逗號分隔")
+    parser.add_argument("--full-game-sizes", default=",".join(map(str, FULL_GAME_SIZES)),
+                        help="完整遊戲基準的大廳人數，以逗號分隔（空字符串表示跳過）")
+    parser.add_argument("--save", nargs="?", const="", default=None,
+                        help="保存結果，默認保存到 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="與之前保存的結果比較，發現回歸時返回非零狀態碼")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="回歸閾值（中位數變慢的比例）")
+    args = parser.parse_args(argv)
+    
+    sizes = tuple(int(size) for size in args.sizes.split(",") if size)
+    full_game_sizes = tuple(int(size) for size in args.full_game_sizes.split(",") if size)
+    report = run_benchmarks(sizes, full_game_sizes)
+    print(format_results(report))
+    
+    if args.save is not None:
+        path = args.save or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已保存到 {path}")
+    
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        regressions = [row for row in rows if row["regression"]]
+        print(f"\n與 {baseline['meta'].get('commit', args.compare)} 比較：")
+        for row in rows:
+            flag = "  <-- 回歸" if row["regression"] else ""
+            print(f"{row['name']:<40} {row['baseline_us']:>11.1f} -> {row['current_us']:>11.1f} µs "
+                  f"({row['change']:+.1%}){flag}")
+        if regressions:
+            print(f"\n發現 {len(regressions)} 項回歸（閾值 {args.threshold:.0%}）")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
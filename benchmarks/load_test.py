@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Dict, Any, List, Optional
+
+from models.metrics import Histogram
+
+# 默認的服務器地址（以 LLM_STUB=on STUB_TIME_SCALE=0 python app.py 啟動）
+DEFAULT_URL = "http://127.0.0.1:5000"
+
+# 與遊戲頁面相同的 Socket.IO 事件名稱，可用 --event 名稱=事件 覆蓋；
+# 房間狀態由 RoomBroadcaster 以 UTF-8 JSON 字節推送到各可見性子房間（room_update）
+EVENTS = {
+    "join": "join_game",
+    "discussion": "player_discussion",
+    "vote": "player_vote",
+    "next_phase": "next_phase",
+    "update": "room_update"
+}
+
+# 每一輪由房主依次發送的操作
+ROUND_ACTIONS = ("discussion", "vote", "next_phase")
+
+# 扇出延遲的分桶上界（秒）
+FANOUT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 飽和判定：扇出延遲的 p95 超過此值（秒），或連接/廣播失敗率超過此比例
+SATURATION_P95 = 1.0
+SATURATION_ERROR_RATE = 0.01
+
+# 等待一次廣播到達所有觀眾的最長時間（秒）
+BROADCAST_TIMEOUT = 10.0
+
+
+def _import_clients():
+    """導入壓測客戶端依賴（不在 requirements.txt 中，只有壓測時需要）"""
+    try:
+        import aiohttp
+        import socketio
+    except ImportError as e:
+        raise SystemExit(f"壓測需要安裝 aiohttp 和 python-socketio：pip install \"python-socketio[asyncio_client]\"（{e}）")
+    return aiohttp, socketio
+
+
+class GameRoom:
+    """一局遊戲的房主和觀眾客戶端，記錄每次廣播的扇出延遲"""
+    
+    def __init__(self, game_id: str, histogram: Histogram):
+        """初始化房間
+        
+        Args:
+            game_id (str): 遊戲ID
+            histogram (Histogram): 扇出延遲直方圖（所有房間共用）
+        """
+        self.game_id = game_id
+        self.histogram = histogram
+        self.clients = []
+        self.received = 0  # 收到的廣播消息數
+        self.timeouts = 0  # 沒有在期限內收到廣播的觀眾數
+        self.game_over = False
+        self._sent_at = None
+        self._pending = set()
+        self._done = asyncio.Event()
+    
+    def on_update(self, client_index: int, data):
+        """觀眾收到房間廣播（room_update 的數據是 UTF-8 JSON 字節，舊的 game_update 是字典）"""
+        self.received += 1
+        if isinstance(data, (bytes, bytearray)):
+            data = json.loads(data.decode("utf-8"))
+        if isinstance(data, dict) and data.get("phase") == "gameover":
+            self.game_over = True
+        if self._sent_at is not None and client_index in self._pending:
+            self.histogram.observe(time.perf_counter() - self._sent_at)
+            self._pending.discard(client_index)
+            if not self._pending:
+                self._done.set()
+    
+    async def broadcast_round(self, event: str, payload: Dict[str, Any]):
+        """由房主發送一個操作，等待所有觀眾收到隨後的廣播
+        
+        Args:
+            event (str): Socket.IO 事件名稱
+            payload (Dict[str, Any]): 事件數據
+        """
+        self._pending = set(range(1, len(self.clients)))
+        self._done.clear()
+        self._sent_at = time.perf_counter()
+        await self.clients[0].emit(event, payload)
+        try:
+            await asyncio.wait_for(self._done.wait(), BROADCAST_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timeouts += len(self._pending)
+        self._sent_at = None
+
+
+async def create_game(session, base_url: str, players: int, werewolves: int) -> str:
+    """通過 /create_game 創建一局使用替身模型的遊戲，1 號玩家由壓測客戶端扮演
+    
+    Args:
+        session (aiohttp.ClientSession): HTTP 會話
+        base_url (str): 服務器地址
+        players (int): 玩家數量
+        werewolves (int): 狼人數量
+        
+    Returns:
+        str: 遊戲ID
+    """
+    form = {
+        "player_count": players,
+        "werewolf_count": werewolves,
+        "special_roles": "seer",
+        "human_player": 1,
+        "api_type": "stub",
+        "model_name": "stub"
+    }
+    async with session.post(f"{base_url}/create_game", json=form) as response:
+        data = await response.json(content_type=None)
+    if not data.get("success"):
+        raise RuntimeError(f"創建遊戲失敗: {data.get('error')}")
+    return data["game_id"]
+
+
+async def scrape_metrics(session, base_url: str) -> Dict[str, float]:
+    """讀取 /metrics 中不帶標籤的指標（進行中的遊戲數和進程內存）"""
+    try:
+        async with session.get(f"{base_url}/metrics") as response:
+            text = await response.text()
+    except Exception:
+        return {}
+    return {match.group(1): float(match.group(2))
+            for match in re.finditer(r"^(werewolf_[a-z_]+) ([0-9.e+]+)$", text, re.MULTILINE)}
+
+
+async def run_room(socketio, session, base_url: str, spectators: int, players: int, werewolves: int,
+                   rounds: int, histogram: Histogram, stats: Dict[str, int]):
+    """創建一局遊戲，連接房主和觀眾，並運行若干輪操作
+    
+    Args:
+        socketio: python-socketio 模塊
+        session (aiohttp.ClientSession): HTTP 會話
+        base_url (str): 服務器地址
+        spectators (int): 每局的觀眾數量
+        players (int): 玩家數量
+        werewolves (int): 狼人數量
+        rounds (int): 每局的操作輪數（遊戲提前結束時停止）
+        histogram (Histogram): 扇出延遲直方圖
+        stats (Dict[str, int]): 連接和消息計數，原地累加
+    """
+    try:
+        game_id = await create_game(session, base_url, players, werewolves)
+    except Exception:
+        stats["create_errors"] += 1
+        return
+    
+    room = GameRoom(game_id, histogram)
+    for _ in range(spectators + 1):
+        # 第一個連接成功的客戶端是房主，其餘是觀眾
+        client = socketio.AsyncClient(reconnection=False)
+        client.on(EVENTS["update"], lambda data, index=len(room.clients): room.on_update(index, data))
+        try:
+            await client.connect(base_url, transports=["websocket"])
+            await client.emit(EVENTS["join"], {"game_id": game_id})
+        except Exception:
+            stats["connect_errors"] += 1
+            continue
+        stats["connections"] += 1
+        room.clients.append(client)
+    
+    try:
+        if not room.clients:
+            return
+        for round_index in range(rounds):
+            action = ROUND_ACTIONS[round_index % len(ROUND_ACTIONS)]
+            payload = {"game_id": game_id, "player_id": 1}
+            if action == "discussion":
+                payload["content"] = f"第{round_index + 1}輪：我覺得玩家{random.randint(2, players)}很可疑。"
+            elif action == "vote":
+                payload["target_id"] = random.randint(2, players)
+            await room.broadcast_round(EVENTS[action], payload)
+            stats["rounds"] += 1
+            if room.game_over:
+                break
+    finally:
+        stats["messages"] += room.received
+        stats["timeouts"] += room.timeouts
+        await asyncio.gather(*(client.disconnect() for client in room.clients), return_exceptions=True)
+
+
+async def run_step(base_url: str, games: int, spectators: int, players: int, werewolves: int,
+                   rounds: int) -> Dict[str, Any]:
+    """以指定的並發局數運行一個壓測階段
+    
+    Args:
+        base_url (str): 服務器地址
+        games (int): 並發局數
+        spectators (int): 每局的觀眾數量
+        players (int): 玩家數量
+        werewolves (int): 狼人數量
+        rounds (int): 每局的操作輪數
+        
+    Returns:
+        Dict[str, Any]: 階段報告
+    """
+    aiohttp, socketio = _import_clients()
+    histogram = Histogram(FANOUT_BUCKETS)
+    stats = {"connections": 0, "connect_errors": 0, "create_errors": 0, "rounds": 0, "messages": 0, "timeouts": 0}
+    
+    async with aiohttp.ClientSession() as session:
+        before = await scrape_metrics(session, base_url)
+        started = time.perf_counter()
+        await asyncio.gather(*(run_room(socketio, session, base_url, spectators, players, werewolves, rounds,
+                                        histogram, stats) for _ in range(games)))
+        duration = time.perf_counter() - started
+        after = await scrape_metrics(session, base_url)
+    
+    memory_key = "werewolf_process_resident_memory_bytes"
+    memory_per_game = None
+    if memory_key in before and memory_key in after and games:
+        memory_per_game = (after[memory_key] - before[memory_key]) / games
+    
+    attempted = games * (spectators + 1)
+    expected_deliveries = stats["rounds"] * spectators
+    failures = stats["connect_errors"] + stats["create_errors"] * (spectators + 1) + stats["timeouts"]
+    error_rate = failures / max(attempted + expected_deliveries, 1)
+    return {
+        "games": games,
+        "clients": attempted,
+        "duration": duration,
+        "stats": stats,
+        "error_rate": error_rate,
+        "fanout": dict(histogram.to_dict(), p95=histogram.quantile(0.95)),
+        "memory_per_game": memory_per_game,
+        "active_games": after.get("werewolf_active_games"),
+        "saturated": histogram.quantile(0.95) > SATURATION_P95 or error_rate > SATURATION_ERROR_RATE
+    }
+
+
+async def run_load_test(base_url: str = DEFAULT_URL, max_games: int = 64, spectators: int = 10,
+                        players: int = 6, werewolves: int = 2, rounds: int = 30) -> Dict[str, Any]:
+    """逐步加倍並發局數（1、2、4、...），直到達到 max_games 或服務器飽和
+    
+    Args:
+        base_url (str, optional): 服務器地址
+        max_games (int, optional): 最多並發局數。默認為 64
+        spectators (int, optional): 每局的觀眾數量。默認為 10
+        players (int, optional): 玩家數量。默認為 6
+        werewolves (int, optional): 狼人數量。默認為 2
+        rounds (int, optional): 每局的操作輪數。默認為 30
+        
+    Returns:
+        Dict[str, Any]: {"steps": [階段報告], "saturation": 首個飽和階段的並發局數或 None}
+    """
+    steps = []
+    games = 1
+    while games <= max_games:
+        step = await run_step(base_url, games, spectators, players, werewolves, rounds)
+        steps.append(step)
+        if step["saturated"]:
+            break
+        games *= 2
+    saturation = next((step["games"] for step in steps if step["saturated"]), None)
+    return {"url": base_url, "spectators": spectators, "steps": steps, "saturation": saturation}
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """生成文本報告"""
+    lines = [f"服務器：{report['url']}，每局 {report['spectators']} 名觀眾 + 1 名房主"]
+    lines.append(f"{'並發局數':>8} {'連接數':>8} {'失敗率':>8} {'p50':>10} {'p95':>10} {'p99':>10} {'每局內存':>12}")
+    for step in report["steps"]:
+        fanout = step["fanout"]
+        memory = f"{step['memory_per_game'] / 1024:.0f} KiB" if step["memory_per_game"] is not None else "-"
+        lines.append(f"{step['games']:>8} {step['stats']['connections']:>8} {step['error_rate']:>8.1%} "
+                     f"{fanout['p50'] * 1000:>7.1f} ms {fanout['p95'] * 1000:>7.1f} ms {fanout['p99'] * 1000:>7.1f} ms "
+                     f"{memory:>12}")
+    if report["saturation"] is None:
+        lines.append("未達到飽和點")
+    else:
+        lines.append(f"飽和點：{report['saturation']} 局並發（p95 扇出延遲 > {SATURATION_P95:g}s "
+                     f"或失敗率 > {SATURATION_ERROR_RATE:.0%}）")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m benchmarks.load_test --max-games 64 --spectators 10"""
+    parser = argparse.ArgumentParser(description="模擬大量瀏覽器客戶端對本地服務器進行 Socket.IO 壓測")
+    parser.add_argument("--url", default=DEFAULT_URL, help="服務器地址")
+    parser.add_argument("--max-games", type=int, default=64, help="最多並發局數（從 1 開始逐步加倍）")
+    parser.add_argument("--spectators", type=int, default=10, help="每局的觀眾數量")
+    parser.add_argument("--players", type=int, default=6, help="玩家數量")
+    parser.add_argument("--werewolves", type=int, default=2, help="狼人數量")
+    parser.add_argument("--rounds", type=int, default=30, help="每局的操作輪數")
+    parser.add_argument("--event", action="append", default=[], help="覆蓋事件名稱，例如 update=game_state")
+    parser.add_argument("--json", dest="json_path", default=None, help="將報告另存為 JSON 文件")
+    args = parser.parse_args(argv)
+    
+    for override in args.event:
+        name, _, event = override.partition("=")
+        if name not in EVENTS or not event:
+            parser.error(f"無效的事件覆蓋: {override}（可用名稱：{', '.join(EVENTS)}）")
+        EVENTS[name] = event
+    
+    report = asyncio.run(run_load_test(args.url, args.max_games, args.spectators, args.players, args.werewolves,
+                                       args.rounds))
+    print(format_report(report))
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
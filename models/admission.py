@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# 各服務商默認可同時處理的模型調用數（PROVIDER_CAPACITY_<PROVIDER> 覆蓋）
+DEFAULT_PROVIDER_CAPACITY = {
+    "openai": 32,
+    "anthropic": 16
+}
+
+# 排隊的遊戲數上限，超過時直接拒絕
+DEFAULT_QUEUE_SIZE = 20
+
+# 沒有完成過遊戲時假設的一局時長（秒），用於估算排隊時間
+DEFAULT_GAME_SECONDS = 600.0
+
+# 單次模型調用的延遲目標（秒），超過時收緊可用容量
+DEFAULT_LATENCY_TARGET = 8.0
+
+# 延遲和遊戲時長的指數移動平均係數
+SMOOTHING = 0.2
+
+# 延遲超標時容量乘以此係數，恢復時每次加回此比例，容量不低於 MIN_CAPACITY_FACTOR
+BACKOFF_FACTOR = 0.8
+RECOVERY_STEP = 0.05
+MIN_CAPACITY_FACTOR = 0.25
+
+
+def provider_for_model(model_name: str) -> Optional[str]:
+    """根據模型名稱判斷服務商，本地替身和規則玩家返回 None
+    
+    Args:
+        model_name (str): 模型名稱
+        
+    Returns:
+        Optional[str]: "openai"、"anthropic" 或 None
+    """
+    if not model_name:
+        return None
+    if model_name.startswith(("gpt-", "o1", "o3")):
+        return "openai"
+    if model_name.startswith("claude"):
+        return "anthropic"
+    return None
+
+
+class AdmissionController:
+    """新遊戲的准入控制
+    
+    每局遊戲按各服務商的模型座位數預留容量（同時發言和夜間行動時，每個座位
+    最多同時有一個調用）。預留總量超過服務商容量時新遊戲進入先進先出的隊列，
+    隊列已滿或單局需求超過總容量時拒絕。遊戲結束後釋放容量並按順序放行排隊的遊戲。
+    
+    觀測到的調用延遲超過目標時按比例收緊可用容量，恢復後逐步放寬，
+    讓進行中的遊戲保持在延遲目標內。
+    """
+    
+    def __init__(self, capacity: Dict[str, int] = None, max_queue: int = DEFAULT_QUEUE_SIZE,
+                 latency_target: float = DEFAULT_LATENCY_TARGET, game_seconds: float = DEFAULT_GAME_SECONDS):
+        """初始化准入控制器
+        
+        Args:
+            capacity (Dict[str, int], optional): {服務商: 可同時處理的調用數}。默認為 DEFAULT_PROVIDER_CAPACITY
+            max_queue (int, optional): 排隊的遊戲數上限。默認為 20
+            latency_target (float, optional): 單次調用的延遲目標（秒）。默認為 8
+            game_seconds (float, optional): 初始的平均遊戲時長估計（秒）。默認為 600
+        """
+        self.capacity = dict(DEFAULT_PROVIDER_CAPACITY if capacity is None else capacity)
+        self.max_queue = max_queue
+        self.latency_target = latency_target
+        self.game_seconds = game_seconds
+        self._lock = threading.Lock()
+        self._running = {}  # {game_id: (demand, started_at)}
+        self._queue = deque()  # [(game_id, demand, enqueued_at)]
+        self._capacity_factor = {provider: 1.0 for provider in self.capacity}
+        self._latency = {}  # {provider: 延遲的指數移動平均}
+        self.rejected = 0
+        self.admit_listeners = []  # 排隊的遊戲被放行時調用 listener(game_id)
+    
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionController"]:
+        """根據環境變量創建控制器，ADMISSION_CONTROL 不是 on 時返回 None
+        
+        環境變量：PROVIDER_CAPACITY_<PROVIDER>、ADMISSION_QUEUE_SIZE 和 PROVIDER_LATENCY_TARGET，
+        可以寫在 .env 中（app 在導入時就創建控制器，此時還沒有創建過 GameManager，需要先讀取 .env）。
+        
+        Returns:
+            AdmissionController: 控制器，未啟用時為 None
+        """
+        # game_manager 導入了本模組，在這裡導入以避免循環導入
+        from .game_manager import load_config
+        load_config()
+        if os.getenv("ADMISSION_CONTROL", "off") != "on":
+            return None
+        
+        capacity = {}
+        for provider, default in DEFAULT_PROVIDER_CAPACITY.items():
+            capacity[provider] = int(os.getenv(f"PROVIDER_CAPACITY_{provider.upper()}", default))
+        return cls(capacity, int(os.getenv("ADMISSION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+                   float(os.getenv("PROVIDER_LATENCY_TARGET", DEFAULT_LATENCY_TARGET)))
+    
+    def available(self, provider: str) -> float:
+        """服務商當前的可用容量（已按延遲收緊）"""
+        return self.capacity.get(provider, 0) * self._capacity_factor.get(provider, 1.0)
+    
+    def _reserved(self) -> Dict[str, int]:
+        """進行中的遊戲已預留的容量"""
+        reserved = {}
+        for demand, _ in self._running.values():
+            for provider, seats in demand.items():
+                reserved[provider] = reserved.get(provider, 0) + seats
+        return reserved
+    
+    def _fits(self, demand: Dict[str, int], reserved: Dict[str, int]) -> bool:
+        """需求能否放入剩餘容量（未配置容量的服務商不受限制）
+        
+        沒有進行中的遊戲時總是放得下（單局需求已確認不超過總容量）：此時沒有模型調用，
+        收緊的容量不會再恢復，也沒有遊戲會結束並釋放容量，不放行的話隊列會永遠卡住。
+        """
+        if not self._running:
+            return True
+        return all(reserved.get(provider, 0) + seats <= self.available(provider)
+                   for provider, seats in demand.items() if provider in self.capacity)
+    
+    def admit(self, game_id: str, demand: Dict[str, int]) -> Dict[str, Any]:
+        """申請運行一局遊戲
+        
+        Args:
+            game_id (str): 遊戲ID
+            demand (Dict[str, int]): {服務商: 模型座位數}，見 GameManager.llm_demand
+            
+        Returns:
+            Dict[str, Any]: {"status": "admitted" | "queued" | "rejected", "position", "eta", "reason"}
+        """
+        demand = {provider: seats for provider, seats in demand.items() if seats}
+        with self._lock:
+            oversized = [provider for provider, seats in demand.items()
+                         if provider in self.capacity and seats > self.capacity[provider]]
+            if oversized:
+                self.rejected += 1
+                return {"status": "rejected", "position": None, "eta": None,
+                        "reason": f"單局需求超過 {', '.join(oversized)} 的總容量"}
+            
+            if not self._queue and self._fits(demand, self._reserved()):
+                self._running[game_id] = (demand, time.monotonic())
+                return {"status": "admitted", "position": 0, "eta": 0.0, "reason": None}
+            
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                return {"status": "rejected", "position": None, "eta": self._eta(len(self._queue), demand),
+                        "reason": "服務器繁忙，排隊已滿"}
+            
+            self._queue.append((game_id, demand, time.monotonic()))
+            position = len(self._queue)
+            return {"status": "queued", "position": position, "eta": self._eta(position - 1, demand),
+                    "reason": "模型容量已滿，正在排隊"}
+    
+    def release(self, game_id: str, completed: bool = True) -> List[str]:
+        """遊戲結束或被放棄時釋放容量，並按順序放行排隊的遊戲
+        
+        Args:
+            game_id (str): 遊戲ID（正在排隊的遊戲會被移出隊列）
+            completed (bool, optional): 遊戲是否正常結束，正常結束的時長用於更新估計。默認為 True
+            
+        Returns:
+            List[str]: 本次被放行的遊戲ID
+        """
+        with self._lock:
+            running = self._running.pop(game_id, None)
+            if running is None:
+                self._queue = deque(entry for entry in self._queue if entry[0] != game_id)
+            elif completed:
+                duration = time.monotonic() - running[1]
+                self.game_seconds += SMOOTHING * (duration - self.game_seconds)
+            admitted = self._promote()
+        self._notify(admitted)
+        return admitted
+    
+    def _promote(self) -> List[str]:
+        """按先進先出放行能放入剩餘容量的排隊遊戲（隊首放不下時停止，避免大局餓死；
+        沒有進行中的遊戲時隊首總是被放行，見 _fits）"""
+        admitted = []
+        reserved = self._reserved()
+        while self._queue and self._fits(self._queue[0][1], reserved):
+            game_id, demand, _ = self._queue.popleft()
+            self._running[game_id] = (demand, time.monotonic())
+            for provider, seats in demand.items():
+                reserved[provider] = reserved.get(provider, 0) + seats
+            admitted.append(game_id)
+        return admitted
+    
+    def _notify(self, admitted: List[str]):
+        """通知監聽者排隊的遊戲已被放行（在鎖外調用）"""
+        for game_id in admitted:
+            for listener in self.admit_listeners:
+                listener(game_id)
+    
+    def _eta(self, ahead: int, demand: Dict[str, int]) -> float:
+        """估計排在 ahead 個遊戲之後、需求為 demand 的遊戲的等待時間（秒）
+        
+        假設每局進行中的遊戲在開始後 game_seconds 秒結束，依次釋放容量，
+        排在前面的遊戲按順序佔用釋放出來的容量。
+        """
+        now = time.monotonic()
+        reserved = self._reserved()
+        finishing = sorted(((max(started + self.game_seconds - now, 0.0), game_demand)
+                            for game_demand, started in self._running.values()), key=lambda item: item[0])
+        pending = [entry[1] for entry in list(self._queue)[:ahead]] + [demand]
+        clock = 0.0
+        for index, game_demand in enumerate(pending):
+            while not self._fits(game_demand, reserved) and finishing:
+                clock, released = finishing.pop(0)
+                for provider, seats in released.items():
+                    reserved[provider] -= seats
+            if index < len(pending) - 1:
+                finishing.append((clock + self.game_seconds, game_demand))
+                finishing.sort(key=lambda item: item[0])
+                for provider, seats in game_demand.items():
+                    reserved[provider] = reserved.get(provider, 0) + seats
+        return round(clock, 1)
+    
+    def observe_latency(self, model_name: str, latency: float):
+        """記錄一次模型調用的延遲，超過目標時收緊該服務商的容量，低於目標時逐步恢復
+        
+        Args:
+            model_name (str): 模型名稱
+            latency (float): 延遲（秒）
+        """
+        provider = provider_for_model(model_name)
+        if provider not in self.capacity:
+            return
+        admitted = []
+        with self._lock:
+            previous = self._latency.get(provider)
+            average = latency if previous is None else previous + SMOOTHING * (latency - previous)
+            self._latency[provider] = average
+            factor = self._capacity_factor[provider]
+            if average > self.latency_target:
+                self._capacity_factor[provider] = max(MIN_CAPACITY_FACTOR, factor * BACKOFF_FACTOR)
+            else:
+                self._capacity_factor[provider] = min(1.0, factor + RECOVERY_STEP)
+                if self._capacity_factor[provider] > factor:
+                    admitted = self._promote()
+        self._notify(admitted)
+    
+    def status(self) -> Dict[str, Any]:
+        """當前的容量、預留和排隊情況
+        
+        Returns:
+            Dict[str, Any]: {"running", "queued", "rejected", "providers", "game_seconds"}
+        """
+        with self._lock:
+            reserved = self._reserved()
+            return {
+                "running": len(self._running),
+                "queued": len(self._queue),
+                "rejected": self.rejected,
+                "providers": {provider: {
+                    "capacity": capacity,
+                    "available": round(self.available(provider), 1),
+                    "reserved": reserved.get(provider, 0),
+                    "latency": round(self._latency[provider], 3) if provider in self._latency else None
+                } for provider, capacity in self.capacity.items()},
+                "game_seconds": round(self.game_seconds, 1)
+            }
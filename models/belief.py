@@ -0,0 +1,257 @@
+import math
+from typing import Dict, Any, List, Iterable, Optional
+
+import numpy as np
+
+# 投票給日後被證實為狼人的玩家，投票者是狼人的似然比
+VOTE_FOR_WEREWOLF_LIKELIHOOD = 0.5
+
+# 投票給日後被證實為好人的玩家，投票者是狼人的似然比
+VOTE_FOR_GOOD_LIKELIHOOD = 1.5
+
+# 角色名稱的顯示文本
+ROLE_LABELS = {
+    "werewolf": "狼人",
+    "seer": "預言家",
+    "villager": "村民"
+}
+
+
+class BeliefTracker:
+    """某個視角下的角色信念矩陣（玩家 × 角色）
+    
+    硬性信息（自己的身份、狼人隊友、查驗結果、死亡後公開的身份）以掩碼表示，
+    投票模式等軟性證據以對數權重累加。每批事件處理完後用迭代比例擬合
+    （Sinkhorn）歸一化，使每行和為 1、每列和等於該角色的人數，
+    得到每個玩家是各角色的邊際概率近似。
+    """
+    
+    def __init__(self, player_ids: List[int], role_counts: Dict[str, int], viewpoint: Optional[int] = None):
+        """初始化信念矩陣
+        
+        Args:
+            player_ids (List[int]): 玩家 ID 列表
+            role_counts (Dict[str, int]): 每個角色的人數
+            viewpoint (int, optional): 視角玩家 ID，None 表示只使用公開信息的觀眾視角
+        """
+        self.player_ids = list(player_ids)
+        self.roles = tuple(role_counts)
+        self.viewpoint = viewpoint
+        self._index = {pid: i for i, pid in enumerate(self.player_ids)}
+        self._role_index = {role: j for j, role in enumerate(self.roles)}
+        self._counts = np.array([role_counts[role] for role in self.roles], dtype=float)
+        self._mask = np.ones((len(self.player_ids), len(self.roles)), dtype=bool)
+        self._log_weights = np.zeros((len(self.player_ids), len(self.roles)))
+        self._matrix = None
+    
+    def update(self, events: Iterable[Dict[str, Any]]):
+        """批量處理事件，處理完後只歸一化一次
+        
+        支持的事件：
+        - {"type": "role", "player_id": id, "role": role}：確定身份（自己、隊友、死亡公開）
+        - {"type": "check", "player_id": id, "result": "狼人" 或 "好人"}：查驗結果
+        - {"type": "votes", "votes": {voter_id: target_id}}：一輪投票
+        
+        Args:
+            events (Iterable[Dict[str, Any]]): 事件列表
+        """
+        voters, targets = [], []
+        for event in events:
+            event_type = event["type"]
+            if event_type == "role":
+                self._fix_role(event["player_id"], event["role"])
+            elif event_type == "check":
+                if event["result"] == "狼人":
+                    self._fix_role(event["player_id"], "werewolf")
+                else:
+                    self._exclude_role(event["player_id"], "werewolf")
+            elif event_type == "votes":
+                for voter_id, target_id in event["votes"].items():
+                    if int(voter_id) in self._index and int(target_id) in self._index:
+                        voters.append(self._index[int(voter_id)])
+                        targets.append(self._index[int(target_id)])
+        
+        # 投票證據依賴被投票者的身份，因此在硬性信息之後統一處理
+        if voters:
+            self._apply_votes(np.array(voters), np.array(targets))
+        self._matrix = None
+    
+    def _fix_role(self, player_id: int, role: str):
+        """將玩家固定為某個角色"""
+        i = self._index.get(player_id)
+        j = self._role_index.get(role)
+        if i is None or j is None:
+            return
+        self._mask[i] = False
+        self._mask[i, j] = True
+    
+    def _exclude_role(self, player_id: int, role: str):
+        """排除玩家是某個角色的可能"""
+        i = self._index.get(player_id)
+        j = self._role_index.get(role)
+        if i is None or j is None:
+            return
+        self._mask[i, j] = False
+    
+    def _apply_votes(self, voters: np.ndarray, targets: np.ndarray):
+        """根據投票對象的已知身份更新投票者是狼人的權重
+        
+        Args:
+            voters (np.ndarray): 投票者的行索引
+            targets (np.ndarray): 被投票者的行索引
+        """
+        wolf = self._role_index.get("werewolf")
+        if wolf is None:
+            return
+        known = self._mask.sum(axis=1) == 1
+        target_is_wolf = known[targets] & self._mask[targets, wolf]
+        target_is_good = known[targets] & ~self._mask[targets, wolf]
+        factors = np.where(target_is_wolf, math.log(VOTE_FOR_WEREWOLF_LIKELIHOOD),
+                           np.where(target_is_good, math.log(VOTE_FOR_GOOD_LIKELIHOOD), 0.0))
+        np.add.at(self._log_weights[:, wolf], voters, factors)
+    
+    @property
+    def matrix(self) -> np.ndarray:
+        """歸一化後的信念矩陣，形狀為 (玩家數, 角色數)"""
+        if self._matrix is None:
+            self._matrix = self._normalize()
+        return self._matrix
+    
+    def _normalize(self, iterations: int = 50, tolerance: float = 1e-6) -> np.ndarray:
+        """迭代比例擬合，使行和為 1、列和等於角色人數
+        
+        Args:
+            iterations (int, optional): 最大迭代次數。默認為 50
+            tolerance (float, optional): 收斂閾值。默認為 1e-6
+            
+        Returns:
+            np.ndarray: 信念矩陣
+        """
+        mask = self._propagate(self._mask.copy())
+        weights = np.where(mask, np.exp(self._log_weights - self._log_weights.max()), 0.0)
+        for _ in range(iterations):
+            column_sums = weights.sum(axis=0)
+            weights *= np.divide(self._counts, column_sums, out=np.zeros_like(column_sums), where=column_sums > 0)
+            row_sums = weights.sum(axis=1, keepdims=True)
+            weights = np.divide(weights, row_sums, out=np.zeros_like(weights), where=row_sums > 0)
+            if np.abs(weights.sum(axis=0) - self._counts).max() < tolerance:
+                break
+        return weights
+    
+    def _propagate(self, mask: np.ndarray) -> np.ndarray:
+        """某角色的名額已被確定身份的玩家用完時，從其他玩家排除該角色
+        
+        排除後可能產生新的確定身份，因此重複直到不再變化。
+        
+        Args:
+            mask (np.ndarray): 可能性掩碼，會被就地修改
+            
+        Returns:
+            np.ndarray: 修改後的掩碼
+        """
+        while True:
+            fixed = mask.sum(axis=1) == 1
+            exhausted = mask[fixed].sum(axis=0) >= self._counts
+            update = ~fixed[:, None] & exhausted[None, :] & mask
+            if not update.any():
+                return mask
+            mask[update] = False
+    
+    def probabilities(self, role: str) -> Dict[int, float]:
+        """每個玩家是某角色的概率
+        
+        Args:
+            role (str): 角色
+            
+        Returns:
+            Dict[int, float]: {player_id: probability}
+        """
+        j = self._role_index.get(role)
+        if j is None:
+            return {}
+        return dict(zip(self.player_ids, self.matrix[:, j].tolist()))
+    
+    def summary(self, candidates: Iterable[int] = None, top: int = 3) -> str:
+        """生成可放入提示詞的簡短摘要
+        
+        每個非村民角色列出概率最高的幾名玩家，例如「- 狼人：玩家3 72%、玩家5 55%」。
+        
+        Args:
+            candidates (Iterable[int], optional): 只列出這些玩家。默認為視角以外的所有玩家
+            top (int, optional): 每個角色列出的玩家數量。默認為 3
+            
+        Returns:
+            str: 摘要文本
+        """
+        if candidates is None:
+            candidates = [pid for pid in self.player_ids if pid != self.viewpoint]
+        rows = np.array([self._index[pid] for pid in candidates if pid in self._index], dtype=int)
+        if not rows.size:
+            return ""
+        
+        lines = []
+        for role in self.roles:
+            if role == "villager":
+                continue
+            column = self.matrix[rows, self._role_index[role]]
+            order = np.argsort(-column, kind="stable")[:top]
+            ranked = "、".join(f"玩家{self.player_ids[rows[k]]} {column[k]:.0%}" for k in order if column[k] > 0)
+            if ranked:
+                lines.append(f"- {ROLE_LABELS.get(role, role)}：{ranked}\n")
+        return "".join(lines)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典
+        
+        Returns:
+            Dict[str, Any]: {"viewpoint", "roles", "players": {player_id: {role: probability}}}
+        """
+        matrix = np.round(self.matrix, 4).tolist()
+        return {
+            "viewpoint": self.viewpoint,
+            "roles": list(self.roles),
+            "players": {pid: dict(zip(self.roles, row)) for pid, row in zip(self.player_ids, matrix)}
+        }
+
+
+def build_belief_tracker(game_state, viewpoint: Optional[int] = None) -> BeliefTracker:
+    """從遊戲狀態構建某個視角的信念矩陣
+    
+    Args:
+        game_state (GameState): 遊戲狀態
+        viewpoint (int, optional): 視角玩家 ID，None 表示觀眾視角（只使用公開信息）
+        
+    Returns:
+        BeliefTracker: 已處理所有可見事件的信念矩陣
+    """
+    role_counts = {}
+    for player in game_state.players:
+        role_counts[player["role"]] = role_counts.get(player["role"], 0) + 1
+    tracker = BeliefTracker([p["player_id"] for p in game_state.players], role_counts, viewpoint)
+    
+    # 死亡玩家的身份是公開的
+    events = [{"type": "role", "player_id": p["player_id"], "role": p["role"]}
+              for p in game_state.players if not p["is_alive"]]
+    
+    if viewpoint is not None:
+        player = game_state.get_player(viewpoint)
+        if player is not None:
+            events.append({"type": "role", "player_id": viewpoint, "role": player["role"]})
+            pack = game_state.pack_of(viewpoint)
+            if pack is not None:
+                # 狼人知道同一狼群的所有隊友；只有一個狼群時，其他人都不是狼人
+                packmates = set(game_state.werewolf_packs[pack])
+                single_pack = len(game_state.werewolf_packs) == 1
+                for other in game_state.players:
+                    if other["player_id"] in packmates:
+                        events.append({"type": "role", "player_id": other["player_id"], "role": "werewolf"})
+                    elif single_pack:
+                        events.append({"type": "check", "player_id": other["player_id"], "result": "好人"})
+        
+        player_obj = game_state.player_objects.get(viewpoint)
+        for target_id, result in getattr(player_obj, "checked_players", {}).items():
+            events.append({"type": "check", "player_id": target_id, "result": result})
+    
+    events.extend({"type": "votes", "votes": record["votes"]} for record in game_state.vote_history)
+    tracker.update(events)
+    return tracker
@@ -0,0 +1,181 @@
+import json
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from .event_log import GameEventLog, ALL_VISIBILITIES
+
+# 可見性分組：狼人能看到隊友身份，其他玩家和觀眾只看到公開信息
+# （有多個狼群時狼人分組按狼群拆分為 werewolves0、werewolves1 等）
+WEREWOLVES = "werewolves"
+PLAYERS = "players"
+SPECTATORS = "spectators"
+VISIBILITY_CLASSES = (WEREWOLVES, PLAYERS, SPECTATORS)
+
+
+def visibility_class(game_state, player_id: Optional[int]) -> str:
+    """玩家所屬的可見性分組
+    
+    Args:
+        game_state (GameState): 遊戲狀態
+        player_id (int, optional): 玩家ID，None 表示觀眾
+        
+    Returns:
+        str: 分組名稱
+    """
+    if player_id is None:
+        return SPECTATORS
+    pack = game_state.pack_of(player_id)
+    if pack is not None:
+        # 有多個狼群時每個狼群一個分組，狼人只看到同伴
+        return WEREWOLVES if len(game_state.werewolf_packs) == 1 else f"{WEREWOLVES}{pack}"
+    return PLAYERS
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """序列化為緊湊的 UTF-8 JSON"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RoomBroadcaster:
+    """按可見性分組的房間廣播
+    
+    每局遊戲的房間按可見性分為子房間（<game_id>:werewolves 等），每次更新時
+    每種可見內容只序列化一次（其他玩家和觀眾看到的內容相同，共用同一份字節），
+    編碼後的字節直接發給子房間的所有連接，不再為每個客戶端分別序列化。
+    同一狀態版本重複廣播時直接重用緩存的字節。
+    
+    所有推送的事件都記錄在 GameEventLog 中並帶有序號和 epoch，斷線重連的客戶端
+    只需補發錯過的事件。
+    """
+    
+    def __init__(self, game_id: str, game_state, emit: Callable, event_log: GameEventLog = None):
+        """初始化
+        
+        Args:
+            game_id (str): 遊戲ID
+            game_state (GameState): 遊戲狀態
+            emit (Callable): 發送函數 emit(event, data, room)，例如 socketio.emit
+            event_log (GameEventLog, optional): 事件序號和重放緩衝區。默認新建
+        """
+        self.game_id = game_id
+        self.game_state = game_state
+        self.event_log = event_log or GameEventLog()
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._encoded = (None, {})  # 最近一次房間狀態 (version, {visibility: bytes})
+        self.encodes = 0  # 實際序列化的次數
+        self.reuses = 0  # 重用緩存字節的次數
+        self.bytes_sent = 0  # 發出的字節數（每個子房間計一次）
+    
+    def room_for(self, player_id: Optional[int]) -> str:
+        """連接應加入的子房間
+        
+        Args:
+            player_id (int, optional): 玩家ID，None 表示觀眾
+            
+        Returns:
+            str: 子房間名稱
+        """
+        return f"{self.game_id}:{visibility_class(self.game_state, player_id)}"
+    
+    def _encode_state(self, seq: int) -> Dict[str, bytes]:
+        """序列化當前房間狀態，每種可見內容只序列化一次"""
+        def encode(**options):
+            state = self.game_state.get_public_state(**options)
+            state["seq"] = seq
+            state["epoch"] = self.event_log.epoch
+            self.encodes += 1
+            return encode_payload(state)
+        
+        public = encode()
+        encoded = {PLAYERS: public, SPECTATORS: public}
+        packs = self.game_state.werewolf_packs
+        if len(packs) > 1:
+            for pack in range(len(packs)):
+                encoded[f"{WEREWOLVES}{pack}"] = encode(reveal_werewolves=True, pack=pack)
+        else:
+            encoded[WEREWOLVES] = encode(reveal_werewolves=True)
+        return encoded
+    
+    def broadcast(self, event: str = "room_update") -> Dict[str, int]:
+        """向所有分組發送當前狀態（狀態版本未變時重用上次的字節和序號）
+        
+        Args:
+            event (str, optional): Socket.IO 事件名稱。默認為 "room_update"
+            
+        Returns:
+            Dict[str, int]: 各分組的負載字節數
+        """
+        version = self.game_state.version
+        with self._lock:
+            if self._encoded[0] == version:
+                payloads = self._encoded[1]
+                self.reuses += len(payloads)
+            else:
+                _, payloads = self.event_log.append(event, self._encode_state)
+                self._encoded = (version, payloads)
+        
+        sizes = {}
+        for visibility, data in payloads.items():
+            self._emit(event, data, room=f"{self.game_id}:{visibility}")
+            sizes[visibility] = len(data)
+        with self._lock:
+            self.bytes_sent += sum(sizes.values())
+        return sizes
+    
+    def emit_event(self, event: str, data: Dict[str, Any]) -> int:
+        """向整個房間推送一個帶序號的事件（所有分組可見）
+        
+        Args:
+            event (str): Socket.IO 事件名稱
+            data (Dict[str, Any]): 事件數據
+            
+        Returns:
+            int: 事件序號
+        """
+        seq, payloads = self.event_log.append(event, lambda seq: {
+            ALL_VISIBILITIES: dict(data, seq=seq, epoch=self.event_log.epoch)
+        })
+        self._emit(event, payloads[ALL_VISIBILITIES], room=self.game_id)
+        return seq
+    
+    def replay(self, last_seq: int, player_id: Optional[int] = None, epoch: str = None) -> List[Tuple[str, Any]]:
+        """重連的客戶端需要補發的事件
+        
+        緩衝區中還有 last_seq 之後的所有事件時只返回錯過的事件（房間狀態是完整狀態，
+        只保留最後一次），否則返回當前房間狀態作為快照（快照帶有最新序號）。
+        
+        Args:
+            last_seq (int): 客戶端最後收到的序號
+            player_id (int, optional): 玩家ID，None 表示觀眾
+            epoch (str, optional): 客戶端序號所屬的 epoch，與當前事件日誌不同時按 0 處理
+                （服務器重啟或房間重建後舊序號無效）
+            
+        Returns:
+            List[Tuple[str, Any]]: [(event, payload)]，按序號排列
+        """
+        if epoch != self.event_log.epoch:
+            last_seq = 0
+        visibility = visibility_class(self.game_state, player_id)
+        missed = self.event_log.since(last_seq, visibility)
+        if missed is not None:
+            last_state = max((seq for seq, event, _ in missed if event == "room_update"), default=None)
+            return [(event, payload) for seq, event, payload in missed
+                    if event != "room_update" or seq == last_state]
+        
+        version = self.game_state.version
+        with self._lock:
+            if self._encoded[0] != version:
+                _, payloads = self.event_log.append("room_update", self._encode_state)
+                self._encoded = (version, payloads)
+            return [("room_update", self._encoded[1][visibility])]
+    
+    def stats(self) -> Dict[str, int]:
+        """序列化和重用次數
+        
+        Returns:
+            Dict[str, int]: {"encodes", "reuses", "bytes_sent", "seq"}
+        """
+        with self._lock:
+            return {"encodes": self.encodes, "reuses": self.reuses, "bytes_sent": self.bytes_sent,
+                    "seq": self.event_log.seq}
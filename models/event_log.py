@@ -0,0 +1,75 @@
+import secrets
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+# 每局保留的最近事件數，重連時更早的事件需要改用完整快照
+DEFAULT_REPLAY_CAPACITY = 256
+
+# 發給所有可見性分組的負載鍵
+ALL_VISIBILITIES = "*"
+
+
+class GameEventLog:
+    """一局遊戲的事件序號和有界重放緩衝區
+    
+    每個推送給客戶端的事件都帶有單調遞增的序號。客戶端重連時提交最後收到的序號，
+    只補發之後的事件；緩衝區已經覆蓋掉需要的事件時返回 None，由調用方改發快照。
+    序號只在同一個事件日誌內有效：epoch 是每個實例的隨機標記，服務器重啟或房間重建後會改變，
+    客戶端發現 epoch 改變時應丟棄記住的序號。
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_REPLAY_CAPACITY):
+        """初始化
+        
+        Args:
+            capacity (int, optional): 保留的最近事件數。默認為 256
+        """
+        self.seq = 0  # 最後一個事件的序號
+        self.epoch = secrets.token_hex(4)  # 序號所屬的日誌實例
+        self._events = deque(maxlen=capacity)  # [(seq, event, {visibility: payload})]
+        self._lock = threading.Lock()
+    
+    def append(self, event: str, make_payloads: Callable[[int], Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+        """記錄一個事件
+        
+        Args:
+            event (str): 事件名稱
+            make_payloads (Callable[[int], Dict[str, Any]]): 根據分配的序號生成負載
+                {visibility: payload}，鍵為 ALL_VISIBILITIES 時發給所有分組
+                
+        Returns:
+            Tuple[int, Dict[str, Any]]: (序號, 負載)
+        """
+        with self._lock:
+            seq = self.seq + 1
+            payloads = make_payloads(seq)
+            self._events.append((seq, event, payloads))
+            self.seq = seq
+        return seq, payloads
+    
+    def since(self, last_seq: int, visibility: str) -> Optional[List[Tuple[int, str, Any]]]:
+        """獲取某個分組在 last_seq 之後錯過的事件
+        
+        Args:
+            last_seq (int): 客戶端最後收到的序號（0 表示沒有收到過）
+            visibility (str): 可見性分組
+            
+        Returns:
+            Optional[List[Tuple[int, str, Any]]]: [(seq, event, payload)]，緩衝區已覆蓋需要的事件
+                或序號無效時返回 None
+        """
+        with self._lock:
+            if last_seq > self.seq or last_seq < 0:
+                return None
+            oldest = self._events[0][0] if self._events else self.seq + 1
+            if last_seq + 1 < oldest:
+                return None
+            missed = []
+            for seq, event, payloads in self._events:
+                if seq <= last_seq:
+                    continue
+                payload = payloads.get(visibility, payloads.get(ALL_VISIBILITIES))
+                if payload is not None:
+                    missed.append((seq, event, payload))
+            return missed
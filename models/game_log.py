@@ -0,0 +1,200 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Optional
+
+# 遊戲事件的記錄器；未配置時 INFO 級別的事件直接丟棄，不會輸出到控制台
+game_logger = logging.getLogger("werewolf.game")
+
+# 遊戲上下文字段，log_game_event 會附加到每條記錄上
+GAME_FIELDS = ("game_id", "day", "phase", "event")
+
+# 後台隊列的容量，隊列已滿時丟棄新記錄而不是阻塞遊戲
+DEFAULT_QUEUE_SIZE = 10000
+
+_listener = None  # 已配置時為後台線程的 GameLogListener
+_handler = None  # 已配置時為 NonBlockingQueueHandler
+_sampler = None  # 啟用抽樣時為 SamplingFilter
+_lock = threading.Lock()
+
+
+def log_game_event(game_state, event: str, message: str, level: int = logging.INFO, **fields):
+    """記錄一個遊戲事件，級別未啟用時直接返回
+    
+    已配置後台隊列時只把 (時間, 級別, 訊息, 上下文) 放入隊列，LogRecord 由後台線程構建，
+    遊戲循環中的開銷只有一次入隊。
+    
+    Args:
+        game_state (GameState): 遊戲狀態，提供 game_id、day 和 phase
+        event (str): 事件類型，例如 "log"、"role_assignment"
+        message (str): 訊息
+        level (int, optional): 日誌級別。默認為 INFO
+        **fields: 附加字段（JSON 格式時展開到記錄中）
+    """
+    if not game_logger.isEnabledFor(level):
+        return
+    context = {
+        "game_id": getattr(game_state, "game_id", None),
+        "day": game_state.day,
+        "phase": game_state.phase,
+        "event": event,
+        "fields": fields
+    }
+    if isinstance(_handler, NonBlockingQueueHandler):
+        if _sampler is None or _sampler.keep(level):
+            _handler.enqueue((time.time(), level, message, context))
+        return
+    game_logger.log(level, message, extra=context)
+
+
+class SamplingFilter(logging.Filter):
+    """按比例抽樣記錄，WARNING 及以上級別始終保留"""
+    
+    def __init__(self, rate: float, keep_level: int = logging.WARNING):
+        """初始化
+        
+        Args:
+            rate (float): 保留比例（0 到 1）
+            keep_level (int, optional): 不抽樣的最低級別。默認為 WARNING
+        """
+        super().__init__()
+        self.rate = rate
+        self.keep_level = keep_level
+        self._random = random.Random()
+    
+    def keep(self, level: int) -> bool:
+        """是否保留該級別的一條記錄"""
+        return level >= self.keep_level or self.rate >= 1.0 or self._random.random() < self.rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.keep(record.levelno)
+
+
+class JsonFormatter(logging.Formatter):
+    """每條記錄輸出一行 JSON，方便日誌收集系統解析"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        for field in GAME_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """控制台文本格式：[遊戲日誌] <game_id> 第N天 <phase> 訊息"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        context = []
+        if getattr(record, "game_id", None):
+            context.append(str(record.game_id))
+        if getattr(record, "phase", None):
+            context.append(f"第{record.day}天 {record.phase}")
+        prefix = "[遊戲日誌]" if getattr(record, "event", None) else f"[{record.levelname}]"
+        text = " ".join([prefix] + context + [record.getMessage()])
+        if getattr(record, "fields", None):
+            text += " " + json.dumps(record.fields, ensure_ascii=False, default=str)
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """把記錄放入有界隊列，隊列已滿時丟棄並計數，不阻塞調用方"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class GameLogListener(logging.handlers.QueueListener):
+    """後台輸出線程：把 log_game_event 入隊的事件轉換為 LogRecord 後交給輸出處理程序"""
+    
+    def prepare(self, record):
+        if isinstance(record, tuple):
+            created, level, message, context = record
+            record = game_logger.makeRecord(game_logger.name, level, "", 0, message, None, None, extra=context)
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+        return record
+    
+    def enqueue_sentinel(self):
+        # 隊列已滿時等待後台線程騰出空間，保證剩餘記錄都被輸出
+        self.queue.put(self._sentinel)
+    
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+def configure_game_logging(level: str = None, fmt: str = None, sample_rate: float = None, path: str = None,
+                           queue_size: int = DEFAULT_QUEUE_SIZE) -> Optional["GameLogListener"]:
+    """配置遊戲日誌：記錄經有界隊列交給後台線程輸出（每個進程只配置一次，之後的調用直接返回）
+    
+    參數默認讀取環境變量：GAME_LOG_LEVEL（DEBUG、INFO、WARNING 或 OFF）、GAME_LOG_FORMAT（text 或 json）、
+    GAME_LOG_SAMPLE_RATE（INFO 及以下級別的保留比例）和 GAME_LOG_FILE（默認輸出到標準輸出）。
+    
+    Args:
+        level (str, optional): 日誌級別，OFF 表示關閉
+        fmt (str, optional): 輸出格式
+        sample_rate (float, optional): 抽樣比例
+        path (str, optional): 輸出文件
+        queue_size (int, optional): 隊列容量。默認為 10000
+        
+    Returns:
+        GameLogListener: 後台輸出線程，關閉時為 None
+    """
+    global _listener, _handler, _sampler
+    with _lock:
+        if _handler is not None:
+            return _listener
+        
+        level = (level or os.getenv("GAME_LOG_LEVEL", "INFO")).upper()
+        fmt = fmt or os.getenv("GAME_LOG_FORMAT", "text")
+        sample_rate = float(os.getenv("GAME_LOG_SAMPLE_RATE", "1.0")) if sample_rate is None else sample_rate
+        path = path or os.getenv("GAME_LOG_FILE") or None
+        
+        game_logger.propagate = False
+        if level == "OFF":
+            _handler = logging.NullHandler()
+            game_logger.addHandler(_handler)
+            game_logger.setLevel(logging.CRITICAL + 1)
+            return None
+        
+        output = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        _handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        if sample_rate < 1.0:
+            _sampler = SamplingFilter(sample_rate)
+            _handler.addFilter(_sampler)
+        game_logger.addHandler(_handler)
+        game_logger.setLevel(level)
+        
+        _listener = GameLogListener(_handler.queue, output)
+        _listener.start()
+        # 退出前輸出隊列中剩餘的記錄
+        atexit.register(_listener.stop)
+        return _listener
+
+
+def dropped_records() -> int:
+    """因隊列已滿而丟棄的記錄數"""
+    return getattr(_handler, "dropped", 0)
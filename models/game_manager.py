@@ -1,9 +1,20 @@
 import os
-from typing import Dict, Any, List, Optional
+import asyncio
+import copy
+import functools
+import logging
+import random
+from typing import Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
 from .game_state import GameState
-from api import OpenAIHandler, AnthropicHandler
+from .win_probability import WinProbabilityEstimator
+from .model_router import ModelRouter
+from .telemetry import GameCost, InstrumentedHandler, llm_telemetry
+from .admission import provider_for_model
+from .game_log import game_logger, configure_game_logging, log_game_event
+from . import tracing
+from api import StubHandler, HeuristicBotHandler, PromptCacheStats
 
 class HumanPlayerHandler:
     """處理與人類玩家的交互"""
@@ -16,7 +27,7 @@ class HumanPlayerHandler:
         """
         self.player_name = player_name
     
-    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500):
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
         """從人類玩家獲取回應 (Web版中不會被直接使用，而是通過API來處理)
         
         Args:
@@ -24,6 +35,8 @@ class HumanPlayerHandler:
             system_message (str, optional): 系統消息
             temperature (float, optional): 不適用於人類玩家
             max_tokens (int, optional): 不適用於人類玩家
+            prompt_prefix (str, optional): 不適用於人類玩家
+            stop (list, optional): 不適用於人類玩家
             
         Returns:
             str: 玩家的回應
@@ -31,20 +44,51 @@ class HumanPlayerHandler:
         # 在Web版中，這個方法會被重寫，通過API交互
         return "人類玩家的回應將通過Web界面獲取"
 
+def default_pack_count(player_count: int, werewolf_count: int) -> int:
+    """大廳模式的默認狼群數量
+    
+    玩家數達到 LARGE_LOBBY_MIN_PLAYERS（默認 50）時，狼人按 WEREWOLF_PACK_SIZE（默認 4）人一群分為
+    多個狼群，否則所有狼人屬於同一狼群。
+    
+    Args:
+        player_count (int): 玩家數量
+        werewolf_count (int): 狼人數量
+        
+    Returns:
+        int: 狼群數量
+    """
+    if player_count < int(os.getenv("LARGE_LOBBY_MIN_PLAYERS", "50")):
+        return 1
+    pack_size = max(1, int(os.getenv("WEREWOLF_PACK_SIZE", "4")))
+    return max(1, -(-werewolf_count // pack_size))
+
+@functools.lru_cache(maxsize=None)
+def load_config():
+    """讀取 .env 文件到環境變量，每個進程只執行一次"""
+    load_dotenv()
+
 class GameManager:
     """狼人殺遊戲管理器"""
     
     def __init__(self):
         """初始化遊戲管理器"""
-        # 載入環境變量
-        load_dotenv()
+        # 載入環境變量（每個進程只讀取一次 .env），並啟動後台日誌線程
+        load_config()
+        configure_game_logging()
         
         self.game_state = GameState()
         self.api_handlers = {}  # {player_id: api_handler}
         self.api_models = {}  # {player_id: model_name}
+        self.win_probability = WinProbabilityEstimator()
+        self.model_router = None  # 按行動類型選擇模型，見 ModelRouter
+        self.game_cost = GameCost()  # 本局模型調用的費用合計
+        self.tracer = None  # 啟用追蹤時為 tracing.Tracer
+        self.phase_listeners = []  # 每個階段結束後調用 listener(game_manager, phase)
     
     def setup_game(self, player_count: int = None, werewolf_count: int = None, special_roles: List[str] = None,
-                   human_players: List[int] = None, api_type: str = None, model_name: str = None):
+                   human_players: List[int] = None, api_type: str = None, model_name: str = None,
+                   bot_players: List[int] = None, seat_models: Dict[int, Tuple[str, str]] = None,
+                   pack_count: int = None, seed: int = None):
         """設置遊戲
         
         Args:
@@ -52,8 +96,13 @@ class GameManager:
             werewolf_count (int, optional): 狼人數量。默認使用環境變量
             special_roles (List[str], optional): 特殊角色列表。默認使用環境變量
             human_players (List[int], optional): 人類玩家的ID列表。默認為空
-            api_type (str, optional): 使用的API類型('openai' 或 'anthropic')。默認根據環境變量混合
+            api_type (str, optional): 使用的API類型('openai'、'anthropic'、本地替身 'stub' 或規則玩家 'heuristic')。默認根據環境變量混合
             model_name (str, optional): 使用的模型名稱。默認根據環境變量混合
+            bot_players (List[int], optional): 使用規則玩家的ID列表，其餘AI玩家使用模型。默認為空
+            seat_models (Dict[int, Tuple[str, str]], optional): 為指定座位設置 (api_type, model_name)，
+                優先於其他分配方式。默認為空
+            pack_count (int, optional): 狼群數量。默認由 default_pack_count 按大廳人數決定
+            seed (int, optional): 本局角色分配的隨機種子，不影響全局的 random。默認使用全局的 random
         """
         # 如果沒有提供參數，使用環境變量
         if player_count is None:
@@ -66,8 +115,13 @@ class GameManager:
             special_roles_str = os.getenv("DEFAULT_SPECIAL_ROLES", "seer")
             special_roles = [role.strip() for role in special_roles_str.split(",")]
         
+        if pack_count is None:
+            pack_count = default_pack_count(player_count, werewolf_count)
+        
         # 設置人類玩家
         self.human_players = human_players or []
+        self.bot_players = bot_players or []
+        self.seat_models = seat_models or {}
         
         # 設置API類型和模型
         self.use_single_api = api_type is not None and model_name is not None
@@ -75,10 +129,40 @@ class GameManager:
         self.model_name = model_name
         
         # 設置遊戲
-        self.game_state.setup_game(player_count, werewolf_count, special_roles)
+        self.game_state.setup_game(player_count, werewolf_count, special_roles, pack_count,
+                                   rng=random.Random(seed) if seed is not None else None)
         
         # 為玩家分配處理程序
         self._setup_api_handlers()
+        self.model_router = ModelRouter.from_env(self._create_api_handler)
+        self.game_cost = GameCost()
+    
+    def _create_api_handler(self, api_type: str, model_name: str):
+        """創建API處理程序
+        
+        Args:
+            api_type (str): API類型（'openai'、'anthropic'、'stub' 或 'heuristic'）
+            model_name (str): 模型名稱
+            
+        Returns:
+            tuple: (api_handler, 顯示用的模型名稱)
+        """
+        if api_type in ("openai", "anthropic") and os.getenv("LLM_STUB", "off") == "on":
+            # 壓測模式：不調用真實模型，按 STUB_TIME_SCALE 縮放模擬延遲（0 表示不等待）
+            time_scale = float(os.getenv("STUB_TIME_SCALE", "1.0"))
+            return StubHandler(model=f"stub:{model_name}", time_scale=time_scale), f"Stub - {model_name}"
+        # 服務商 SDK 在第一次創建對應處理程序時才導入，加快服務器啟動
+        if api_type == "openai":
+            from api import OpenAIHandler
+            return OpenAIHandler(model=model_name), f"OpenAI - {model_name}"
+        elif api_type == "anthropic":
+            from api import AnthropicHandler
+            return AnthropicHandler(model=model_name), f"Anthropic - {model_name}"
+        elif api_type == "stub":
+            return StubHandler(model=model_name), f"Stub - {model_name}"
+        elif api_type == "heuristic":
+            return HeuristicBotHandler(model=model_name), "Heuristic Bot"
+        raise ValueError(f"不支持的API類型: {api_type}")
     
     def _setup_api_handlers(self):
         """為玩家設置API處理程序"""
@@ -89,14 +173,7 @@ class GameManager:
         # 如果使用單一API
         if self.use_single_api:
             # 創建單一API處理程序
-            if self.api_type == "openai":
-                api_handler = OpenAIHandler(model=self.model_name)
-                model_display = f"OpenAI - {self.model_name}"
-            elif self.api_type == "anthropic":
-                api_handler = AnthropicHandler(model=self.model_name)
-                model_display = f"Anthropic - {self.model_name}"
-            else:
-                raise ValueError(f"不支持的API類型: {self.api_type}")
+            api_handler, model_display = self._create_api_handler(self.api_type, self.model_name)
         else:
             # 獲取可用的API模型
             openai_models = ["gpt-4", "gpt-3.5-turbo"]
@@ -108,6 +185,8 @@ class GameManager:
             models.extend([(api_type, model_name) for api_type, model_name in [("anthropic", m) for m in anthropic_models]])
         
         # 為每個玩家分配處理程序
+        bot_handler = None
+        seat_handlers = {}  # {(api_type, model_name): (api_handler, model_display)}
         for i, player in enumerate(self.game_state.players):
             player_id = player["player_id"]
             player_name = player["name"]
@@ -118,6 +197,22 @@ class GameManager:
                 self.api_models[player_id] = "Human Player"
                 continue
             
+            # 指定了模型的座位，同一模型共用一個處理程序
+            if player_id in self.seat_models:
+                seat_model = tuple(self.seat_models[player_id])
+                if seat_model not in seat_handlers:
+                    seat_handlers[seat_model] = self._create_api_handler(*seat_model)
+                self.api_handlers[player_id], self.api_models[player_id] = seat_handlers[seat_model]
+                continue
+            
+            # 規則玩家，共用一個處理程序
+            if player_id in self.bot_players:
+                if bot_handler is None:
+                    bot_handler = HeuristicBotHandler()
+                self.api_handlers[player_id] = bot_handler
+                self.api_models[player_id] = "Heuristic Bot"
+                continue
+            
             # AI玩家
             if self.use_single_api:
                 self.api_handlers[player_id] = api_handler
@@ -125,22 +220,324 @@ class GameManager:
             else:
                 # 使用混合API
                 api_type, model_name = models[i % len(models)]
-                
-                if api_type == "openai":
-                    self.api_handlers[player_id] = OpenAIHandler(model=model_name)
-                    self.api_models[player_id] = f"OpenAI - {model_name}"
-                elif api_type == "anthropic":
-                    self.api_handlers[player_id] = AnthropicHandler(model=model_name)
-                    self.api_models[player_id] = f"Anthropic - {model_name}"
-        
-        # 打印分配結果
-        print("玩家角色分配：")
-        for player in self.game_state.players:
-            player_id = player["player_id"]
-            player_name = player["name"]
-            player_role = player["role"]
-            model = self.api_models.get(player_id, "未分配")
-            print(f"玩家{player_id}（{player_name}）- {player_role}：使用 {model}")
+                self.api_handlers[player_id], self.api_models[player_id] = self._create_api_handler(api_type, model_name)
+        
+        self.game_state.player_models = dict(self.api_models)
+        
+        # 記錄分配結果（包含身份，只在 DEBUG 級別輸出）
+        if game_logger.isEnabledFor(logging.DEBUG):
+            log_game_event(self.game_state, "role_assignment", "玩家角色分配", logging.DEBUG, assignments=[
+                {"player_id": p["player_id"], "name": p["name"], "role": p["role"],
+                 "model": self.api_models.get(p["player_id"], "未分配")}
+                for p in self.game_state.players
+            ])
+    
+    async def play_game(self, max_days: int = 30):
+        """自動進行遊戲直到結束（適用於全AI遊戲）
+        
+        Args:
+            max_days (int, optional): 最多進行的天數，超過後停止。默認為 30
+        """
+        while not self.game_state.game_over and self.game_state.day <= max_days:
+            await self.play_phase()
+    
+    async def play_phase(self) -> str:
+        """執行當前階段所有AI玩家的行動，並進入下一階段
+        
+        Returns:
+            str: 執行的階段名稱
+        """
+        token = tracing.activate(self.tracer)
+        try:
+            with tracing.span(f"phase:{self.game_state.phase}", day=self.game_state.day):
+                return await self._play_phase()
+        finally:
+            tracing.deactivate(token)
+    
+    async def _play_phase(self) -> str:
+        """執行當前階段（play_phase 的實現）
+        
+        Returns:
+            str: 執行的階段名稱
+        """
+        game_state = self.game_state
+        phase = game_state.phase
+        
+        if phase == "night":
+            await self.run_night_actions()
+            game_state.resolve_night_actions()
+            # 夜晚的死亡也可能結束遊戲
+            if game_state.check_game_over():
+                game_state.phase = "gameover"
+                game_state.add_log("遊戲結束")
+                self._notify_phase_listeners(phase)
+                return phase
+        elif phase == "day":
+            await self.run_day_discussion()
+        elif phase == "vote":
+            await self.run_votes()
+        else:
+            return phase
+        
+        game_state.next_phase()
+        self._notify_phase_listeners(phase)
+        return phase
+    
+    def enable_tracing(self) -> tracing.Tracer:
+        """為本局遊戲啟用追蹤，之後 play_phase 中的區段都會被記錄
+        
+        Returns:
+            tracing.Tracer: 追蹤器，可用 export_chrome_trace 導出
+        """
+        self.tracer = tracing.Tracer(name=f"werewolf game ({len(self.game_state.players)} players)")
+        return self.tracer
+    
+    def fork(self, api_handlers: Dict[int, Any] = None) -> "GameManager":
+        """從當前局面創建一個分支，用於假設分析和前瞻推演
+        
+        分支的遊戲狀態見 GameState.fork。處理程序默認與原遊戲共用，可以用 api_handlers
+        替換部分座位（例如換成規則玩家快速推演）；分支不追蹤、不通知監聽者，費用單獨統計。
+        
+        Args:
+            api_handlers (Dict[int, Any], optional): 替換的處理程序 {player_id: api_handler}
+            
+        Returns:
+            GameManager: 分支
+        """
+        branch = copy.copy(self)
+        branch.game_state = self.game_state.fork()
+        branch.api_handlers = dict(self.api_handlers)
+        branch.api_handlers.update(api_handlers or {})
+        branch.win_probability = WinProbabilityEstimator(self.win_probability.playouts, self.win_probability.policy)
+        branch.game_cost = GameCost()
+        branch.tracer = None
+        branch.phase_listeners = []
+        return branch
+    
+    def _notify_phase_listeners(self, phase: str):
+        """通知階段監聽器（例如向觀眾推送勝率），監聽器的錯誤不影響遊戲進行
+        
+        Args:
+            phase (str): 剛結束的階段
+        """
+        for listener in self.phase_listeners:
+            try:
+                listener(self, phase)
+            except Exception:
+                game_logger.warning("階段監聽器出錯", exc_info=True)
+    
+    def get_win_probability(self) -> Dict[str, Any]:
+        """估計雙方陣營當前的勝率（同一狀態版本只計算一次）
+        
+        Returns:
+            Dict[str, Any]: 勝率估計，見 WinProbabilityEstimator.estimate
+        """
+        return self.win_probability.estimate(self.game_state)
+    
+    def llm_demand(self) -> Dict[str, int]:
+        """估計本局對各服務商的模型需求：每個模型座位在同時發言和夜間行動時最多同時有一個調用
+        
+        Returns:
+            Dict[str, int]: {服務商: 模型座位數}，人類、規則玩家和本地替身不計入
+        """
+        demand = {}
+        for player_id, handler in self.api_handlers.items():
+            if player_id in self.human_players:
+                continue
+            provider = provider_for_model(getattr(handler, "model", None))
+            if provider:
+                demand[provider] = demand.get(provider, 0) + 1
+        return demand
+    
+    async def run_night_actions(self) -> Dict[int, Dict[str, Any]]:
+        """讓所有存活的AI玩家同時執行夜間行動
+        
+        各狼群的首領和預言家同時決策；村民和非首領狼人只能等待，直接記錄等待，
+        不構建狀態和提示（大廳模式下這些玩家佔絕大多數）。
+        
+        Returns:
+            Dict[int, Dict[str, Any]]: 夜間行動 {player_id: action_result}
+        """
+        alive_ai = self._alive_ai_players()
+        actors = self.game_state.night_actors(alive_ai)
+        # 保留人類玩家已經提交的行動（夜晚開始時已清空上一晚的記錄）
+        self.game_state.night_actions = {pid: action for pid, action in self.game_state.night_actions.items()
+                                         if pid in self.human_players}
+        waiting = set(alive_ai).difference(actors)
+        for player_id in alive_ai:
+            if player_id in waiting:
+                self.game_state.night_actions[player_id] = {"action": "wait", "target": None, "result": None}
+        
+        results = await asyncio.gather(*(
+            self._traced("night_action", pid, lambda pid=pid: self.game_state.player_objects[pid].night_action(
+                self._player_state(pid), self._handler_for(pid, "night_action")))
+            for pid in actors
+        ))
+        for player_id, action_result in zip(actors, results):
+            self.game_state.night_actions[player_id] = action_result
+        
+        return self.game_state.night_actions
+    
+    async def run_votes(self) -> Dict[int, int]:
+        """讓所有存活的AI玩家同時投票
+        
+        Returns:
+            Dict[int, int]: 投票 {voter_id: target_id}
+        """
+        voters = self._alive_ai_players()
+        
+        targets = await asyncio.gather(*(
+            self._traced("vote", pid, lambda pid=pid: self.game_state.player_objects[pid].vote(
+                self._player_state(pid), self._handler_for(pid, "vote")))
+            for pid in voters
+        ))
+        for voter_id, target_id in zip(voters, targets):
+            if target_id is not None:
+                self.game_state.votes[voter_id] = target_id
+        
+        return self.game_state.votes
+    
+    async def _traced(self, action_type: str, player_id: int, start):
+        """在追蹤區段內執行一名玩家的行動
+        
+        Args:
+            action_type (str): 行動類型
+            player_id (int): 玩家 ID
+            start (Callable): 無參數函數，返回行動的協程（狀態準備也計入區段）
+            
+        Returns:
+            行動結果
+        """
+        with tracing.span(action_type, player_id=player_id):
+            return await start()
+    
+    def _handler_for(self, player_id: int, action_type: str):
+        """獲取玩家本次決策使用的處理程序
+        
+        啟用路由器時按行動類型選擇模型；AI玩家的調用都會記錄到 llm_telemetry 和本局費用中。
+        
+        Args:
+            player_id (int): 玩家 ID
+            action_type (str): 行動類型（night_action、speech、vote）
+            
+        Returns:
+            處理程序
+        """
+        handler = self.api_handlers[player_id]
+        # 人類玩家和規則玩家不調用模型
+        if isinstance(handler, HumanPlayerHandler) or hasattr(handler, "choose_target"):
+            return handler
+        if self.model_router is not None:
+            handler = self.model_router.route(action_type, handler)
+        
+        player = self.game_state.get_player(player_id)
+        role = player["role"] if player is not None else "unknown"
+        return InstrumentedHandler(handler, llm_telemetry, self.game_cost, role, self.game_state.phase)
+    
+    def _player_state(self, player_id: int) -> Dict[str, Any]:
+        """獲取AI玩家可見的遊戲狀態，規則玩家不需要身份推斷摘要
+        
+        Args:
+            player_id (int): 玩家 ID
+            
+        Returns:
+            Dict[str, Any]: 遊戲狀態
+        """
+        include_beliefs = not hasattr(self.api_handlers.get(player_id), "choose_target")
+        return self.game_state.get_state_for_player(player_id, include_beliefs=include_beliefs)
+    
+    def _alive_ai_players(self) -> List[int]:
+        """獲取存活的AI玩家
+        
+        Returns:
+            List[int]: 存活AI玩家的 ID 列表
+        """
+        return [p["player_id"] for p in self.game_state.players
+                if p["is_alive"] and p["player_id"] not in self.human_players]
+    
+    async def run_day_discussion(self, mode: str = None, rebuttal_rounds: int = None) -> List[Dict[str, Any]]:
+        """讓所有存活的AI玩家進行白天討論
+        
+        serial 模式下玩家依次發言，每人都能看到之前所有發言；
+        simultaneous 模式下所有AI玩家基於同一份快照同時發表開場發言，
+        之後再進行有限輪的同時反駁，每輪都能看到之前所有輪次的發言。
+        
+        Args:
+            mode (str, optional): 討論模式（'serial' 或 'simultaneous'）。默認使用環境變量
+            rebuttal_rounds (int, optional): simultaneous 模式下的反駁輪數。默認使用環境變量
+            
+        Returns:
+            List[Dict[str, Any]]: 本次新增的發言
+        """
+        if mode is None:
+            mode = os.getenv("DISCUSSION_MODE", "serial")
+        if rebuttal_rounds is None:
+            rebuttal_rounds = int(os.getenv("DISCUSSION_REBUTTAL_ROUNDS", "1"))
+        
+        speakers = self._alive_ai_players()
+        new_discussions = []
+        
+        if mode == "simultaneous":
+            for round_index in range(1 + max(rebuttal_rounds, 0)):
+                # 所有發言者共用同一份快照，本輪的發言在全部完成後才加入討論
+                snapshot = list(self.game_state.current_discussions)
+                contents = await asyncio.gather(*(self._player_discussion(pid, snapshot) for pid in speakers))
+                for player_id, content in zip(speakers, contents):
+                    new_discussions.append(self._add_discussion(player_id, content, round_index))
+        elif mode == "serial":
+            for player_id in speakers:
+                content = await self._player_discussion(player_id)
+                new_discussions.append(self._add_discussion(player_id, content))
+        else:
+            raise ValueError(f"不支持的討論模式: {mode}")
+        
+        return new_discussions
+    
+    async def _player_discussion(self, player_id: int, discussions: List[Dict[str, Any]] = None) -> str:
+        """獲取一名AI玩家的發言
+        
+        Args:
+            player_id (int): 玩家 ID
+            discussions (List[Dict[str, Any]], optional): 玩家能看到的討論快照。默認為當前討論
+            
+        Returns:
+            str: 發言內容
+        """
+        def speak():
+            state = self._player_state(player_id)
+            if discussions is not None:
+                state["current_discussions"] = discussions
+            player_obj = self.game_state.player_objects[player_id]
+            return player_obj.day_discussion(state, self._handler_for(player_id, "speech"))
+        
+        return await self._traced("speech", player_id, speak)
+    
+    def _add_discussion(self, player_id: int, content: str, round_index: int = None) -> Dict[str, Any]:
+        """將發言加入當前討論
+        
+        Args:
+            player_id (int): 玩家 ID
+            content (str): 發言內容
+            round_index (int, optional): simultaneous 模式下的輪次（0 為開場發言）
+            
+        Returns:
+            Dict[str, Any]: 加入的討論記錄
+        """
+        player_obj = self.game_state.player_objects[player_id]
+        discussion = {"player_id": player_id, "player_name": player_obj.name, "content": content}
+        if round_index is not None:
+            discussion["round"] = round_index
+        self.game_state.current_discussions.append(discussion)
+        self.game_state.bump_version()
+        return discussion
+    
+    def summary_version(self) -> Tuple[int, int]:
+        """遊戲摘要的內容版本：狀態版本號和本局的模型調用次數（費用在階段內也會變化）
+        
+        Returns:
+            Tuple[int, int]: (狀態版本號, 調用次數)
+        """
+        return self.game_state.version, self.game_cost.calls
     
     def get_game_summary(self) -> Dict[str, Any]:
         """獲取遊戲摘要
@@ -160,6 +557,7 @@ class GameManager:
             "alive_villagers": alive_villagers,
             "game_over": self.game_state.game_over,
             "winner": self.game_state.winner,
+            "werewolf_packs": self.game_state.werewolf_packs,
             "players": []
         }
         
@@ -174,4 +572,54 @@ class GameManager:
             }
             summary["players"].append(player_info)
         
+        # 觀眾視角的身份推斷（只使用公開信息）
+        summary["beliefs"] = self.game_state.get_beliefs().to_dict()
+        summary["win_probability"] = self.get_win_probability()
+        summary["cost"] = self.game_cost.to_dict()
+        if self.model_router is not None:
+            summary["routing"] = self.model_router.report()
+        
+        return summary
+    
+    def get_public_summary(self) -> Dict[str, Any]:
+        """獲取可以公開給所有玩家和觀眾的遊戲摘要
+        
+        遊戲結束前不含狼群分組，也只列出已出局玩家的角色，以免存活的狼人身份被輪詢接口洩露。
+        
+        Returns:
+            Dict[str, Any]: 遊戲摘要，見 get_game_summary
+        """
+        summary = self.get_game_summary()
+        if self.game_state.game_over:
+            return summary
+        
+        del summary["werewolf_packs"]
+        for player_info in summary["players"]:
+            if player_info["is_alive"]:
+                del player_info["role"]
         return summary
+    
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """獲取本局遊戲所有API處理程序的提示詞緩存統計
+        
+        Returns:
+            Dict[str, Any]: 總計和按模型劃分的緩存統計
+        """
+        total = PromptCacheStats()
+        by_model = {}
+        seen = set()
+        
+        for player_id, handler in self.api_handlers.items():
+            stats = getattr(handler, "cache_stats", None)
+            # 單一API模式下多個玩家共用同一個處理程序，只統計一次
+            if stats is None or id(handler) in seen:
+                continue
+            seen.add(id(handler))
+            total.merge(stats)
+            model_stats = by_model.setdefault(self.api_models.get(player_id, "未知"), PromptCacheStats())
+            model_stats.merge(stats)
+        
+        return {
+            "total": total.to_dict(),
+            "by_model": {model: stats.to_dict() for model, stats in by_model.items()}
+        }
@@ -3,30 +3,47 @@ from typing import List, Dict, Any, Optional
 import json
 import os
 
+from .belief import build_belief_tracker
+from .game_log import log_game_event
+from . import tracing
+
 class GameState:
     """管理狼人殺遊戲的狀態"""
     
     def __init__(self):
         """初始化遊戲狀態"""
+        self.game_id = None  # 遊戲ID，由服務器設置，用於日誌
         self.day = 0  # 遊戲天數
         self.phase = "setup"  # 遊戲階段：setup, night, day, vote, gameover
         self.players = []  # 玩家列表
         self.player_objects = {}  # 玩家對象 {player_id: player_object}
         self.current_discussions = []  # 當前討論 [{"player_id": id, "player_name": name, "content": content}]
         self.votes = {}  # 投票 {voter_id: target_id}
+        self.vote_history = []  # 歷史投票 [{"day": day, "votes": {voter_id: target_id}, "exiled": player_id}]
         self.night_actions = {}  # 夜間行動 {player_id: {"action": action, "target": target_id, "result": result}}
         self.last_night_deaths = []  # 上一晚死亡的玩家
         self.game_over = False  # 遊戲是否結束
         self.winner = None  # 獲勝陣營
         self.log = []  # 遊戲日誌
+        self.version = 0  # 狀態版本號，每次狀態改變時遞增
+        self.player_models = {}  # 每個座位使用的模型 {player_id: model}，由 GameManager 設置，用於統計分析
+        self.werewolf_packs = []  # 狼群 [[player_id, ...], ...]，狼人只認識同一狼群的同伴
+        self._player_positions = {}  # 玩家在 players 中的位置 {player_id: index}
+        self._pack_of = {}  # 狼人所屬的狼群 {player_id: pack_index}
+        self._belief_cache = {}  # {viewpoint: (version, BeliefTracker)}
     
-    def setup_game(self, player_count: int, werewolf_count: int, special_roles: List[str] = None):
+    def setup_game(self, player_count: int, werewolf_count: int, special_roles: List[str] = None,
+                   pack_count: int = 1, rng: Optional[random.Random] = None):
         """設置遊戲
         
         Args:
             player_count (int): 玩家數量
             werewolf_count (int): 狼人數量
             special_roles (List[str], optional): 特殊角色列表。默認為 None
+            pack_count (int, optional): 狼群數量（大廳模式）。每個狼群由各自的首領決定攻擊目標，
+                狼人只認識同一狼群的同伴。默認為 1
+            rng (random.Random, optional): 分配角色使用的隨機數生成器（同時進行多局時各局獨立重現）。
+                默認使用全局的 random
         """
         if special_roles is None:
             special_roles = []
@@ -38,6 +55,8 @@ class GameState:
             raise ValueError(f"狼人數量必須在1到{player_count // 2 - 1}之間")
         if len(special_roles) > player_count - werewolf_count - 1:
             raise ValueError("特殊角色數量過多")
+        if pack_count < 1 or pack_count > werewolf_count:
+            raise ValueError(f"狼群數量必須在1到{werewolf_count}之間")
         
         # 重置遊戲狀態
         self.day = 0
@@ -46,11 +65,14 @@ class GameState:
         self.player_objects = {}
         self.current_discussions = []
         self.votes = {}
+        self.vote_history = []
         self.night_actions = {}
         self.last_night_deaths = []
         self.game_over = False
         self.winner = None
         self.log = []
+        self._belief_cache = {}
+        self.bump_version()
         
         # 創建角色分配
         roles = ["werewolf"] * werewolf_count
@@ -59,7 +81,7 @@ class GameState:
         roles.extend(["villager"] * remaining_count)
         
         # 打亂角色
-        random.shuffle(roles)
+        (rng or random).shuffle(roles)
         
         # 生成玩家ID和名稱
         player_ids = list(range(1, player_count + 1))
@@ -96,10 +118,10 @@ class GameState:
                 player_obj = Villager(player_id, name)
                 self.player_objects[player_id] = player_obj
         
-        # 設置狼人的隊友
-        for werewolf_id in werewolf_ids:
-            werewolf = self.player_objects[werewolf_id]
-            werewolf.set_teammates([wid for wid in werewolf_ids if wid != werewolf_id])
+        # 座位順序已經隨機，按座位輪流分入各狼群，各狼群人數最多相差一人
+        self.werewolf_packs = [werewolf_ids[pack::pack_count] for pack in range(pack_count)]
+        self._index_players()
+        self._set_werewolf_teammates()
         
         self.add_log("遊戲已設置")
         
@@ -108,9 +130,15 @@ class GameState:
     
     def next_phase(self):
         """進入下一個遊戲階段"""
+        with tracing.span("next_phase", phase=self.phase):
+            self._advance_phase()
+    
+    def _advance_phase(self):
+        """根據當前階段切換到下一個階段（next_phase 的實現）"""
         if self.phase == "setup":
             self.phase = "night"
             self.day += 1
+            self.night_actions = {}
             self.add_log(f"第{self.day}天夜晚開始")
         elif self.phase == "night":
             self.phase = "day"
@@ -124,7 +152,8 @@ class GameState:
             self.votes = {}
         elif self.phase == "vote":
             # 處理投票結果
-            self._process_votes()
+            with tracing.span("process_votes", votes=len(self.votes)):
+                self._process_votes()
             # 檢查遊戲是否結束
             if self.check_game_over():
                 self.phase = "gameover"
@@ -132,6 +161,8 @@ class GameState:
             else:
                 self.phase = "night"
                 self.day += 1
+                # 清除上一晚的行動
+                self.night_actions = {}
                 self.add_log(f"第{self.day}天夜晚開始")
     
     def check_game_over(self) -> bool:
@@ -159,30 +190,49 @@ class GameState:
         
         return False
     
+    def resolve_night_actions(self):
+        """結算夜間行動：預言家查驗結果、狼人攻擊和玩家歷史記錄"""
+        self.last_night_deaths = []
+        
+        # 查驗結果以真實身份為準（玩家可見的狀態中不包含其他玩家的身份）
+        for player_id, action in self.night_actions.items():
+            if action.get("action") != "check" or action.get("target") is None:
+                continue
+            target_id = action["target"]
+            target = self.get_player(target_id)
+            if target:
+                result = "狼人" if target["role"] == "werewolf" else "好人"
+                action["result"] = result
+                seer = self.player_objects.get(player_id)
+                if seer is not None and hasattr(seer, "checked_players"):
+                    seer.checked_players[target_id] = result
+        
+        self._process_werewolf_attacks()
+        self._update_player_history()
+    
     def _process_werewolf_attacks(self):
-        """處理狼人的攻擊行動"""
-        # 找出所有狼人的攻擊目標
-        attack_targets = []
+        """處理狼人的攻擊行動：每個狼群取首領的選擇，所有狼群的攻擊一次結算"""
+        # 每個狼群取第一個攻擊目標（首領狼人的選擇）
+        pack_targets = {}
         for player_id, action in self.night_actions.items():
             if action.get("action") == "attack" and action.get("target") is not None:
-                attack_targets.append(action.get("target"))
+                pack_targets.setdefault(self._pack_of.get(player_id, 0), action["target"])
         
-        if not attack_targets:
+        if not pack_targets:
             self.add_log("狼人沒有選擇攻擊目標")
             return
         
-        # 如果有多個狼人，取第一個攻擊目標（首領狼人的選擇）
-        target_id = attack_targets[0]
-        target = next((p for p in self.players if p["player_id"] == target_id), None)
-        
-        if target and target["is_alive"]:
-            # 處理玩家死亡
-            target["is_alive"] = False
-            target_name = target["name"]
-            self.last_night_deaths.append({"player_id": target_id, "name": target_name, "role": target["role"]})
-            self.add_log(f"玩家{target_id}（{target_name}）被狼人殺死了")
-        else:
-            self.add_log(f"狼人的攻擊目標無效或已經死亡")
+        # 多個狼群選擇同一目標時只結算一次
+        for target_id in dict.fromkeys(pack_targets.values()):
+            target = self.get_player(target_id)
+            if target and target["is_alive"]:
+                # 處理玩家死亡
+                target = self._update_player(target, is_alive=False)
+                target_name = target["name"]
+                self.last_night_deaths.append({"player_id": target_id, "name": target_name, "role": target["role"]})
+                self.add_log(f"玩家{target_id}（{target_name}）被狼人殺死了")
+            else:
+                self.add_log(f"狼人的攻擊目標無效或已經死亡")
     
     def _process_votes(self):
         """處理投票結果，放逐得票最多的玩家"""
@@ -199,6 +249,13 @@ class GameState:
         max_votes = max(vote_counts.values())
         most_voted = [pid for pid, count in vote_counts.items() if count == max_votes]
         
+        # 記錄投票結果（投票是公開的，用於推斷身份）
+        self.vote_history.append({
+            "day": self.day,
+            "votes": dict(self.votes),
+            "exiled": most_voted[0] if len(most_voted) == 1 else None
+        })
+        
         # 處理平票情況
         if len(most_voted) > 1:
             self.add_log(f"平票！{', '.join([f'玩家{pid}' for pid in most_voted])}票數相同，無人被放逐")
@@ -206,10 +263,10 @@ class GameState:
         
         # 放逐得票最多的玩家
         target_id = most_voted[0]
-        target = next((p for p in self.players if p["player_id"] == target_id), None)
+        target = self.get_player(target_id)
         
         if target and target["is_alive"]:
-            target["is_alive"] = False
+            target = self._update_player(target, is_alive=False)
             target_name = target["name"]
             target_role = target["role"]
             self.add_log(f"玩家{target_id}（{target_name}）被放逐，他的身份是{target_role}")
@@ -229,12 +286,12 @@ class GameState:
                 result = action.get("result")
                 
                 if action_type == "attack" and target_id:
-                    target = next((p for p in self.players if p["player_id"] == target_id), None)
+                    target = self.get_player(target_id)
                     if target:
                         player_obj.add_history(f"第{self.day}天夜晚：你選擇攻擊玩家{target_id}（{target['name']}）")
                 
                 elif action_type == "check" and target_id and result:
-                    target = next((p for p in self.players if p["player_id"] == target_id), None)
+                    target = self.get_player(target_id)
                     if target:
                         player_obj.add_history(f"第{self.day}天夜晚：你查驗了玩家{target_id}（{target['name']}），結果是{result}")
         
@@ -245,11 +302,12 @@ class GameState:
                 for player_obj in self.player_objects.values():
                     player_obj.add_history(death_msg)
     
-    def get_state_for_player(self, player_id: int) -> Dict[str, Any]:
+    def get_state_for_player(self, player_id: int, include_beliefs: bool = True) -> Dict[str, Any]:
         """獲取特定玩家可見的遊戲狀態
         
         Args:
             player_id (int): 玩家 ID
+            include_beliefs (bool, optional): 是否計算身份推斷摘要。默認為 True
             
         Returns:
             Dict[str, Any]: 遊戲狀態
@@ -262,9 +320,14 @@ class GameState:
             "current_discussions": self.current_discussions,
             "last_night_deaths": [],
             "game_over": self.game_over,
-            "winner": self.winner
+            "winner": self.winner,
+            "version": self.version,
+            "belief_summary": ""
         }
         
+        # 狼人只能看到同一狼群同伴的身份
+        pack = set(self.werewolf_packs[self._pack_of[player_id]]) if player_id in self._pack_of else set()
+        
         # 添加所有玩家的公開信息
         for player in self.players:
             player_info = {
@@ -277,8 +340,8 @@ class GameState:
             if player["player_id"] == player_id:
                 player_info["role"] = player["role"]
             
-            # 狼人可以看到其他狼人的身份
-            elif self._is_werewolf(player_id) and player["role"] == "werewolf":
+            # 狼人可以看到同伴的身份
+            elif player["player_id"] in pack:
                 player_info["role"] = "werewolf"
             
             state["players"].append(player_info)
@@ -292,8 +355,61 @@ class GameState:
             }
             state["last_night_deaths"].append(death_info)
         
+        # 身份推斷摘要，只列出其他存活玩家
+        if include_beliefs and self.players:
+            candidates = [p["player_id"] for p in self.players if p["is_alive"] and p["player_id"] != player_id]
+            state["belief_summary"] = self.get_beliefs(player_id).summary(candidates)
+        
         return state
     
+    def get_public_state(self, reveal_werewolves: bool = False, pack: Optional[int] = None) -> Dict[str, Any]:
+        """獲取房間廣播用的遊戲狀態（不含任何玩家自己的角色和身份推斷）
+        
+        Args:
+            reveal_werewolves (bool, optional): 是否標出狼人（只發給狼人分組）。默認為 False
+            pack (int, optional): 只標出這個狼群的狼人（有多個狼群時發給該狼群的分組）。默認標出所有狼人
+            
+        Returns:
+            Dict[str, Any]: 遊戲狀態
+        """
+        revealed = set(self.werewolf_packs[pack]) if reveal_werewolves and pack is not None else None
+        return {
+            "day": self.day,
+            "phase": self.phase,
+            "players": [{
+                "player_id": player["player_id"],
+                "name": player["name"],
+                "is_alive": player["is_alive"],
+                **({"role": "werewolf"} if reveal_werewolves and player["role"] == "werewolf" and (
+                    revealed is None or player["player_id"] in revealed) else {})
+            } for player in self.players],
+            "current_discussions": self.current_discussions,
+            "last_night_deaths": [{
+                "player_id": death["player_id"],
+                "name": death["name"],
+                "role": death["role"]
+            } for death in self.last_night_deaths],
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "version": self.version
+        }
+    
+    def get_beliefs(self, viewpoint: Optional[int] = None):
+        """獲取某個視角的角色信念矩陣，同一狀態版本內只計算一次
+        
+        Args:
+            viewpoint (int, optional): 視角玩家 ID，None 表示只使用公開信息的觀眾視角
+            
+        Returns:
+            BeliefTracker: 信念矩陣
+        """
+        cached = self._belief_cache.get(viewpoint)
+        if cached is None or cached[0] != self.version:
+            with tracing.span("build_beliefs", viewpoint=viewpoint):
+                cached = (self.version, build_belief_tracker(self, viewpoint))
+            self._belief_cache[viewpoint] = cached
+        return cached[1]
+    
     def _is_werewolf(self, player_id: int) -> bool:
         """檢查玩家是否是狼人
         
@@ -303,9 +419,119 @@ class GameState:
         Returns:
             bool: 是否是狼人
         """
-        player = next((p for p in self.players if p["player_id"] == player_id), None)
+        player = self.get_player(player_id)
         return player is not None and player["role"] == "werewolf"
     
+    def get_player(self, player_id: int) -> Optional[Dict[str, Any]]:
+        """按 ID 查找玩家條目
+        
+        Args:
+            player_id (int): 玩家 ID
+            
+        Returns:
+            Dict[str, Any]: 玩家條目，不存在時為 None
+        """
+        position = self._player_positions.get(player_id)
+        return self.players[position] if position is not None else None
+    
+    def pack_of(self, player_id: int) -> Optional[int]:
+        """狼人所屬的狼群
+        
+        Args:
+            player_id (int): 玩家 ID
+            
+        Returns:
+            int: 狼群序號，不是狼人時為 None
+        """
+        return self._pack_of.get(player_id)
+    
+    def pack_leaders(self) -> Dict[int, int]:
+        """每個狼群的首領（狼群中ID最小的存活狼人），全部死亡的狼群不列出
+        
+        Returns:
+            Dict[int, int]: {pack_index: player_id}
+        """
+        leaders = {}
+        for pack, members in enumerate(self.werewolf_packs):
+            alive = [pid for pid in members if self.players[self._player_positions[pid]]["is_alive"]]
+            if alive:
+                leaders[pack] = min(alive)
+        return leaders
+    
+    def night_actors(self, player_ids: List[int]) -> List[int]:
+        """需要在夜間做出決策的玩家：村民和非首領狼人只能等待，不需要構建狀態和提示
+        
+        Args:
+            player_ids (List[int]): 候選玩家 ID
+            
+        Returns:
+            List[int]: 有夜間行動的玩家 ID
+        """
+        leaders = set(self.pack_leaders().values())
+        actors = []
+        for player_id in player_ids:
+            role = self.get_player(player_id)["role"]
+            if role == "villager" or (role == "werewolf" and player_id not in leaders):
+                continue
+            actors.append(player_id)
+        return actors
+    
+    def _index_players(self):
+        """重建玩家位置和狼群索引（玩家列表或狼群改變時調用）"""
+        self._player_positions = {p["player_id"]: index for index, p in enumerate(self.players)}
+        self._pack_of = {pid: pack for pack, members in enumerate(self.werewolf_packs) for pid in members}
+    
+    def _set_werewolf_teammates(self):
+        """按狼群設置狼人的隊友"""
+        for pack, members in enumerate(self.werewolf_packs):
+            for werewolf_id in members:
+                werewolf = self.player_objects.get(werewolf_id)
+                if werewolf is not None:
+                    werewolf.set_teammates([wid for wid in members if wid != werewolf_id], pack,
+                                           len(self.werewolf_packs))
+    
+    def _update_player(self, player: Dict[str, Any], **changes) -> Dict[str, Any]:
+        """更新玩家條目：替換為新字典而不是就地修改，分支之間共享的條目不受影響
+        
+        Args:
+            player (Dict[str, Any]): 玩家條目（必須在 self.players 中）
+            **changes: 要修改的字段
+            
+        Returns:
+            Dict[str, Any]: 新的玩家條目
+        """
+        updated = dict(player, **changes)
+        self.players[self._player_positions[player["player_id"]]] = updated
+        return updated
+    
+    def fork(self) -> "GameState":
+        """創建一個可以獨立推進的分支，用於假設分析（例如改變某天的投票）和 AI 前瞻
+        
+        分支與原狀態共享所有記錄：日誌、投票記錄、發言、死亡記錄和玩家條目只複製
+        容器中的引用，記錄本身不會被修改（玩家條目改變時整條替換，見 _update_player）。
+        玩家位置和狼群在設置後不再改變，直接共享。
+        角色對象的遊戲歷史和事件索引在任一方追加新事件之前保持共享（見 BaseRole.fork），
+        因此分支的成本與歷史長度無關，只有分歧之後的狀態才會被複製。
+        
+        Returns:
+            GameState: 分支
+        """
+        branch = self.__class__.__new__(self.__class__)
+        branch.__dict__.update(self.__dict__)
+        branch.players = list(self.players)
+        branch.player_objects = {pid: player_obj.fork() for pid, player_obj in self.player_objects.items()}
+        branch.current_discussions = list(self.current_discussions)
+        branch.votes = dict(self.votes)
+        branch.vote_history = list(self.vote_history)
+        # 結算時會寫入查驗結果，行動記錄需要單獨複製
+        branch.night_actions = {pid: dict(action) for pid, action in self.night_actions.items()}
+        branch.last_night_deaths = list(self.last_night_deaths)
+        branch.log = list(self.log)
+        branch.player_models = dict(self.player_models)
+        # 已計算的信念矩陣不會被修改，可以共享；之後兩邊的版本號各自遞增，緩存字典分開
+        branch._belief_cache = dict(self._belief_cache)
+        return branch
+    
     def add_log(self, message: str):
         """添加日誌
         
@@ -313,7 +539,16 @@ class GameState:
             message (str): 日誌訊息
         """
         self.log.append(message)
-        print(f"[遊戲日誌] {message}")
+        self.bump_version()
+        log_game_event(self, "log", message)
+    
+    def bump_version(self):
+        """遞增狀態版本號
+        
+        所有狀態改變都會經過 add_log，因此通常不需要手動調用；
+        在不寫日誌的情況下修改狀態（例如追加討論）時應調用此方法。
+        """
+        self.version += 1
     
     def save_game(self, filename: str):
         """保存遊戲狀態到文件
@@ -321,23 +556,32 @@ class GameState:
         Args:
             filename (str): 文件名
         """
-        # 創建可序列化的遊戲狀態
-        state = {
+        # 保存到文件
+        with tracing.span("save_game"), open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """創建可序列化的遊戲狀態（存檔和回放格式共用）
+        
+        Returns:
+            Dict[str, Any]: 遊戲狀態
+        """
+        return {
             "day": self.day,
             "phase": self.phase,
             "players": self.players,
             "current_discussions": self.current_discussions,
             "votes": self.votes,
+            "vote_history": self.vote_history,
             "night_actions": self.night_actions,
             "last_night_deaths": self.last_night_deaths,
             "game_over": self.game_over,
             "winner": self.winner,
-            "log": self.log
+            "log": self.log,
+            "version": self.version,
+            "player_models": self.player_models,
+            "werewolf_packs": self.werewolf_packs
         }
-        
-        # 保存到文件
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
     
     @classmethod
     def load_game(cls, filename: str):
@@ -357,6 +601,18 @@ class GameState:
         with open(filename, 'r', encoding='utf-8') as f:
             state_data = json.load(f)
         
+        return cls.from_dict(state_data)
+    
+    @classmethod
+    def from_dict(cls, state_data: Dict[str, Any]):
+        """從 to_dict 的結果（或存檔、回放文件的內容）重建遊戲狀態
+        
+        Args:
+            state_data (Dict[str, Any]): 遊戲狀態
+            
+        Returns:
+            GameState: 遊戲狀態
+        """
         # 創建新的遊戲狀態實例
         game_state = cls()
         
@@ -366,11 +622,14 @@ class GameState:
         game_state.players = state_data.get("players", [])
         game_state.current_discussions = state_data.get("current_discussions", [])
         game_state.votes = state_data.get("votes", {})
+        game_state.vote_history = state_data.get("vote_history", [])
         game_state.night_actions = state_data.get("night_actions", {})
         game_state.last_night_deaths = state_data.get("last_night_deaths", [])
         game_state.game_over = state_data.get("game_over", False)
         game_state.winner = state_data.get("winner")
         game_state.log = state_data.get("log", [])
+        game_state.version = state_data.get("version", len(game_state.log))
+        game_state.player_models = {int(pid): model for pid, model in state_data.get("player_models", {}).items()}
         
         # 重新創建玩家對象
         from roles import Villager, Werewolf, Seer
@@ -397,9 +656,9 @@ class GameState:
             if not player["is_alive"]:
                 player_obj.is_alive = False
         
-        # 設置狼人的隊友
-        for werewolf_id in werewolf_ids:
-            werewolf = game_state.player_objects[werewolf_id]
-            werewolf.set_teammates([wid for wid in werewolf_ids if wid != werewolf_id])
+        # 設置狼人的隊友（舊存檔沒有狼群記錄，所有狼人屬於同一狼群）
+        game_state.werewolf_packs = state_data.get("werewolf_packs") or ([werewolf_ids] if werewolf_ids else [])
+        game_state._index_players()
+        game_state._set_werewolf_teammates()
         
         return game_state
@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from .game_log import game_logger
+from .game_manager import GameManager, load_config
+
+# 默認預建的配置：6 名玩家、2 名狼人、預言家、1 號為人類玩家、混合模型
+DEFAULT_POOL_CONFIGS = "6,2,seer,1,,"
+
+# 每種配置默認預建的遊戲數
+DEFAULT_POOL_SIZE = 2
+
+# 各服務商需要的 API key 環境變量
+PROVIDER_KEYS = {"openai": "OPENAI_API_KEY", "anthropic": "ANTHROPIC_API_KEY"}
+
+
+def config_key(player_count: int, werewolf_count: int, special_roles: List[str] = None,
+               human_players: List[int] = None, api_type: str = None, model_name: str = None) -> Tuple:
+    """setup_game 參數對應的池鍵
+    
+    Returns:
+        Tuple: (player_count, werewolf_count, special_roles, human_players, api_type, model_name)
+    """
+    return (int(player_count), int(werewolf_count), tuple(sorted(special_roles or [])),
+            tuple(sorted(human_players or [])), api_type or None, model_name or None)
+
+
+def parse_pool_config(text: str) -> Tuple:
+    """解析一項池配置：玩家數,狼人數,特殊角色(+分隔),人類玩家(+分隔),api_type,model_name
+    
+    例如 "6,2,seer,1,openai,gpt-4o-mini"；api_type 和 model_name 留空表示混合模型。
+    
+    Args:
+        text (str): 配置文本
+        
+    Returns:
+        Tuple: 池鍵，見 config_key
+    """
+    fields = [field.strip() for field in text.split(",")]
+    fields += [""] * (6 - len(fields))
+    player_count, werewolf_count, roles, humans, api_type, model_name = fields[:6]
+    return config_key(int(player_count), int(werewolf_count),
+                      [role for role in roles.split("+") if role],
+                      [int(pid) for pid in humans.split("+") if pid],
+                      api_type, model_name)
+
+
+def format_pool_config(key: Tuple) -> str:
+    """把池鍵轉換回配置文本（parse_pool_config 的逆操作）"""
+    player_count, werewolf_count, special_roles, human_players, api_type, model_name = key
+    return ",".join([str(player_count), str(werewolf_count), "+".join(special_roles),
+                     "+".join(str(pid) for pid in human_players), api_type or "", model_name or ""])
+
+
+def missing_credentials(key: Tuple) -> List[str]:
+    """配置需要但沒有設置的 API key 環境變量（混合模型需要所有服務商，替身模式不需要）
+    
+    Args:
+        key (Tuple): 池鍵，見 config_key
+        
+    Returns:
+        List[str]: 缺少的環境變量名稱
+    """
+    load_config()
+    if os.getenv("LLM_STUB", "off") == "on":
+        return []
+    api_type = key[4]
+    providers = [api_type] if api_type else list(PROVIDER_KEYS)
+    return [PROVIDER_KEYS[provider] for provider in providers
+            if provider in PROVIDER_KEYS and not os.getenv(PROVIDER_KEYS[provider])]
+
+
+class LobbyPool:
+    """預先構建常用配置的遊戲管理器（已分配角色和處理程序），創建遊戲時直接取用
+    
+    取出後在後台線程中補充；沒有預建的配置按原方式同步創建。
+    缺少服務商 API key 的配置不預建（創建時按原方式報錯）。
+    """
+    
+    def __init__(self, configs: List[Tuple], size: int = DEFAULT_POOL_SIZE):
+        """初始化遊戲池
+        
+        Args:
+            configs (List[Tuple]): 預建的配置（池鍵，見 config_key）
+            size (int, optional): 每種配置預建的遊戲數。默認為 2
+        """
+        self.size = size
+        self._pools = {key: deque() for key in configs}
+        self._lock = threading.Lock()
+        self._refilling = set()
+        self.hits = 0
+        self.misses = 0
+    
+    @classmethod
+    def from_env(cls) -> Optional["LobbyPool"]:
+        """根據環境變量創建遊戲池，LOBBY_POOL_SIZE 為 0 時返回 None
+        
+        環境變量：LOBBY_POOL_SIZE 和 LOBBY_POOL_CONFIGS（以分號分隔的配置，見 parse_pool_config），
+        可以寫在 .env 中。
+        
+        Returns:
+            LobbyPool: 遊戲池，未啟用時為 None
+        """
+        load_config()
+        size = int(os.getenv("LOBBY_POOL_SIZE", DEFAULT_POOL_SIZE))
+        if size <= 0:
+            return None
+        configs = [parse_pool_config(text) for text in os.getenv("LOBBY_POOL_CONFIGS", DEFAULT_POOL_CONFIGS).split(";")
+                   if text.strip()]
+        return cls(configs, size)
+    
+    @staticmethod
+    def _build(key: Tuple) -> GameManager:
+        """按池鍵創建並設置一局遊戲"""
+        player_count, werewolf_count, special_roles, human_players, api_type, model_name = key
+        game_manager = GameManager()
+        game_manager.setup_game(player_count, werewolf_count, list(special_roles), list(human_players),
+                                api_type, model_name)
+        return game_manager
+    
+    def warm(self, background: bool = True):
+        """把所有配置補充到預建數量
+        
+        Args:
+            background (bool, optional): 是否在後台線程中補充（服務器啟動時不阻塞）。默認為 True
+        """
+        for key in self._pools:
+            missing = missing_credentials(key)
+            if missing:
+                game_logger.info(f"跳過預建遊戲（{format_pool_config(key)}）：缺少 {', '.join(missing)}")
+            elif background:
+                self._schedule_refill(key)
+            else:
+                self._refill(key)
+    
+    def acquire(self, player_count: int, werewolf_count: int, special_roles: List[str] = None,
+                human_players: List[int] = None, api_type: str = None, model_name: str = None) -> GameManager:
+        """取得一局已設置好的遊戲，參數與 GameManager.setup_game 相同
+        
+        Returns:
+            GameManager: 遊戲管理器
+        """
+        key = config_key(player_count, werewolf_count, special_roles, human_players, api_type, model_name)
+        game_manager = None
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool:
+                game_manager = pool.popleft()
+                self.hits += 1
+            else:
+                self.misses += 1
+        if pool is not None:
+            self._schedule_refill(key)
+        return game_manager or self._build(key)
+    
+    def _schedule_refill(self, key: Tuple):
+        """在後台線程中補充一種配置（同一配置同時只有一個補充線程，缺少 API key 時跳過）"""
+        if missing_credentials(key):
+            return
+        with self._lock:
+            if key in self._refilling:
+                return
+            self._refilling.add(key)
+        threading.Thread(target=self._refill, args=(key,), name="lobby-pool-refill", daemon=True).start()
+    
+    def _refill(self, key: Tuple):
+        """把一種配置補充到預建數量"""
+        try:
+            while len(self._pools[key]) < self.size:
+                game_manager = self._build(key)
+                with self._lock:
+                    self._pools[key].append(game_manager)
+        except Exception:
+            game_logger.warning(f"預建遊戲失敗（{format_pool_config(key)}）", exc_info=True)
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+    
+    def stats(self) -> Dict[str, Any]:
+        """命中情況和各配置的預建數量
+        
+        Returns:
+            Dict[str, Any]: {"hits", "misses", "ready"}
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "ready": {format_pool_config(key): len(pool) for key, pool in self._pools.items()}
+            }
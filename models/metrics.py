@@ -0,0 +1,110 @@
+import bisect
+import math
+from typing import Dict, Any, List, Sequence
+
+# 默認延遲分桶上界（秒），覆蓋從微秒級的規則決策到數十秒的模型調用
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5,
+                           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """固定分桶的直方圖，可在進程之間合併"""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        """初始化直方圖
+        
+        Args:
+            buckets (Sequence[float], optional): 遞增的分桶上界，最後自動追加 +Inf
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def observe(self, value: float):
+        """記錄一個觀測值
+        
+        Args:
+            value (float): 觀測值
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def merge(self, other: "Histogram"):
+        """合併另一個分桶相同的直方圖
+        
+        Args:
+            other (Histogram): 另一個直方圖
+        """
+        if other.buckets != self.buckets:
+            raise ValueError("直方圖分桶不一致，無法合併")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def quantile(self, q: float) -> float:
+        """按分桶估計分位數（返回所在分桶的上界）
+        
+        Args:
+            q (float): 分位數，介於 0 和 1 之間
+            
+        Returns:
+            float: 估計值，沒有數據時為 0
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        """平均值"""
+        return self.sum / self.count if self.count else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典
+        
+        Returns:
+            Dict[str, Any]: 直方圖摘要和分桶計數
+        """
+        labels = [f"<={b:g}" for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip(labels, self.counts))
+        }
+    
+    def format_lines(self, width: int = 40) -> List[str]:
+        """以文本柱狀圖顯示非空分桶
+        
+        Args:
+            width (int, optional): 最長柱的字元數。默認為 40
+            
+        Returns:
+            List[str]: 每個非空分桶一行
+        """
+        peak = max(self.counts) if self.count else 0
+        labels = [f"<={b:g}s" for b in self.buckets] + [">"]
+        lines = []
+        for label, bucket_count in zip(labels, self.counts):
+            if bucket_count:
+                bar = "#" * max(1, round(width * bucket_count / peak))
+                lines.append(f"{label:>10} {bucket_count:>8} {bar}")
+        return lines
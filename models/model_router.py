@@ -0,0 +1,297 @@
+import os
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+from api.prompt_cache import call_usage
+from roles import action_output
+
+# 行動類型
+ACTION_TYPES = ("night_action", "speech", "vote")
+
+# 各模型每百萬標記的價格（美元）：(輸入, 輸出)
+MODEL_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "claude-3-opus-20240229": (15.0, 75.0),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-haiku-20240307": (0.25, 1.25)
+}
+
+# 沒有實測數據前各模型的預估延遲（秒）
+DEFAULT_LATENCY = 2.0
+MODEL_LATENCIES = {
+    "gpt-4o-mini": 1.0,
+    "gpt-3.5-turbo": 1.0,
+    "claude-3-haiku-20240307": 1.0,
+    "gpt-4": 4.0,
+    "claude-3-opus-20240229": 5.0
+}
+
+# 各行動類型的最大生成標記數上限（夜間行動和投票只在結構化輸出模式下限制，見 action_max_tokens）
+ACTION_MAX_TOKENS = {
+    "night_action": 32,
+    "vote": 32,
+    "speech": 200
+}
+
+# 各行動類型的延遲預算（秒）
+ACTION_LATENCY_BUDGETS = {
+    "night_action": 3.0,
+    "vote": 3.0,
+    "speech": 8.0
+}
+
+# 延遲的指數移動平均係數
+LATENCY_SMOOTHING = 0.2
+
+# 模型因延遲超出預算被跳過時，其延遲平均值每次向預估值回落的比例；
+# 否則被排除的模型不會再被選中，平均值也不會再更新
+LATENCY_DECAY = 0.1
+
+
+def model_price(model_name: str):
+    """獲取模型價格，未知模型（例如本地替身）視為免費
+    
+    Args:
+        model_name (str): 模型名稱
+        
+    Returns:
+        tuple: 每百萬標記的 (輸入價格, 輸出價格)
+    """
+    return MODEL_PRICES.get(model_name, (0.0, 0.0))
+
+
+def action_max_tokens(action_type: str) -> Optional[int]:
+    """獲取行動類型的最大生成標記數上限
+    
+    自由文本模式（ACTION_OUTPUT_MODE=text）下投票和夜間行動要求模型先分析再回答，
+    限制長度會截斷回答，因此只有結構化模式下才限制。
+    
+    Args:
+        action_type (str): 行動類型
+        
+    Returns:
+        Optional[int]: 上限，None 表示不限制
+    """
+    if action_type != "speech" and not action_output.is_structured():
+        return None
+    return ACTION_MAX_TOKENS.get(action_type)
+
+
+def call_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    """估計一次調用的費用
+    
+    Args:
+        model_name (str): 模型名稱
+        input_tokens (int): 輸入標記數
+        output_tokens (int): 輸出標記數
+        
+    Returns:
+        float: 費用（美元）
+    """
+    input_price, output_price = model_price(model_name)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class RoutedHandler:
+    """路由後的處理程序：限制 max_tokens，並記錄實際費用、延遲和相對座位原模型節省的費用
+    
+    其他屬性直接轉發給實際使用的處理程序。
+    """
+    
+    def __init__(self, router: "ModelRouter", action_type: str, handler, baseline_model: str):
+        """初始化
+        
+        Args:
+            router (ModelRouter): 路由器
+            action_type (str): 行動類型
+            handler: 實際使用的處理程序
+            baseline_model (str): 座位原本使用的模型名稱
+        """
+        self._router = router
+        self._action_type = action_type
+        self._handler = handler
+        self._baseline_model = baseline_model
+    
+    def __getattr__(self, name):
+        return getattr(self._handler, name)
+    
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
+        """調用實際的處理程序
+        
+        Args:
+            prompt (str): 提示（易變部分）
+            system_message (str, optional): 系統消息
+            temperature (float, optional): 溫度參數。默認為 0.7
+            max_tokens (int, optional): 最大生成標記數，不超過行動類型的上限（見 action_max_tokens）。默認為 500
+            prompt_prefix (str, optional): 穩定的提示前綴
+            stop (list, optional): 停止序列
+            
+        Returns:
+            str: 模型回應
+        """
+        cap = action_max_tokens(self._action_type)
+        if cap is not None:
+            max_tokens = min(max_tokens, cap)
+        started = time.perf_counter()
+        response = await self._handler.get_response(prompt, system_message, temperature=temperature,
+                                                    max_tokens=max_tokens, prompt_prefix=prompt_prefix, stop=stop)
+        input_tokens, output_tokens = call_usage(self._handler, response, prompt, prompt_prefix, system_message)
+        self._router.record(self._action_type, self._handler.model, self._baseline_model, input_tokens,
+                            output_tokens, time.perf_counter() - started)
+        return response
+
+
+class ModelRouter:
+    """按行動類型選擇模型和 max_tokens
+    
+    每種行動類型配置一組候選模型（按偏好排序）。選擇第一個預期延遲不超過預算、
+    且預估費用不超過本局剩餘預算的候選；都不滿足時使用最後一個（通常是最便宜的）。
+    沒有配置候選的行動類型繼續使用座位原本的模型，只限制 max_tokens。
+    """
+    
+    def __init__(self, create_handler: Callable, routes: Dict[str, List[str]] = None,
+                 latency_budgets: Dict[str, float] = None, cost_budget: Optional[float] = None):
+        """初始化路由器
+        
+        Args:
+            create_handler (Callable): 處理程序工廠 create_handler(api_type, model_name) -> (handler, 顯示名稱)
+            routes (Dict[str, List[str]], optional): {行動類型: ["<api_type>:<model_name>", ...]}
+            latency_budgets (Dict[str, float], optional): 各行動類型的延遲預算（秒）。默認為 ACTION_LATENCY_BUDGETS
+            cost_budget (float, optional): 每局費用預算（美元），None 表示不限制
+        """
+        self._create_handler = create_handler
+        self.routes = {action: list(options) for action, options in (routes or {}).items() if options}
+        self.latency_budgets = dict(ACTION_LATENCY_BUDGETS, **(latency_budgets or {}))
+        self.cost_budget = cost_budget
+        self._handlers = {}  # {"<api_type>:<model_name>": handler}
+        self._latencies = {}  # {model_name: 延遲的指數移動平均}
+        self._input_tokens = {}  # {action_type: 平均輸入標記數}
+        self.calls = {}  # {action_type: {model_name: count}}
+        self.cost = 0.0
+        self.baseline_cost = 0.0
+    
+    @classmethod
+    def from_env(cls, create_handler: Callable) -> Optional["ModelRouter"]:
+        """根據環境變量創建路由器，MODEL_ROUTER 不是 on 時返回 None
+        
+        環境變量：MODEL_ROUTES_<ACTION>（以逗號分隔的候選模型）、
+        MODEL_LATENCY_BUDGET_<ACTION>（秒）和 GAME_COST_BUDGET（美元）。
+        
+        Args:
+            create_handler (Callable): 處理程序工廠
+            
+        Returns:
+            ModelRouter: 路由器，未啟用時為 None
+        """
+        if os.getenv("MODEL_ROUTER", "off") != "on":
+            return None
+        
+        routes = {}
+        latency_budgets = {}
+        for action in ACTION_TYPES:
+            options = os.getenv(f"MODEL_ROUTES_{action.upper()}", "")
+            routes[action] = [option.strip() for option in options.split(",") if option.strip()]
+            budget = os.getenv(f"MODEL_LATENCY_BUDGET_{action.upper()}")
+            if budget:
+                latency_budgets[action] = float(budget)
+        cost_budget = os.getenv("GAME_COST_BUDGET")
+        return cls(create_handler, routes, latency_budgets, float(cost_budget) if cost_budget else None)
+    
+    def route(self, action_type: str, seat_handler):
+        """為一次決策選擇處理程序
+        
+        Args:
+            action_type (str): 行動類型（night_action、speech、vote）
+            seat_handler: 座位原本的處理程序
+            
+        Returns:
+            處理程序；人類玩家和規則玩家直接返回原處理程序
+        """
+        baseline_model = getattr(seat_handler, "model", None)
+        if baseline_model is None or hasattr(seat_handler, "choose_target"):
+            return seat_handler
+        
+        options = self.routes.get(action_type)
+        if not options:
+            return RoutedHandler(self, action_type, seat_handler, baseline_model)
+        
+        chosen = options[-1]
+        for option in options:
+            model_name = option.split(":", 1)[1]
+            if self._expected_latency(model_name) > self.latency_budgets.get(action_type, float("inf")):
+                self._decay_latency(model_name)
+                continue
+            if self.cost_budget is not None and self._expected_cost(action_type, model_name) > self.remaining_budget:
+                continue
+            chosen = option
+            break
+        
+        if chosen not in self._handlers:
+            api_type, model_name = chosen.split(":", 1)
+            self._handlers[chosen] = self._create_handler(api_type, model_name)[0]
+        return RoutedHandler(self, action_type, self._handlers[chosen], baseline_model)
+    
+    @property
+    def remaining_budget(self) -> float:
+        """本局剩餘的費用預算"""
+        if self.cost_budget is None:
+            return float("inf")
+        return self.cost_budget - self.cost
+    
+    def _expected_latency(self, model_name: str) -> float:
+        """模型的預期延遲（實測的移動平均，沒有數據時使用預估值）"""
+        return self._latencies.get(model_name, MODEL_LATENCIES.get(model_name, DEFAULT_LATENCY))
+    
+    def _decay_latency(self, model_name: str):
+        """模型因延遲超出預算被跳過時，讓實測的平均值向預估值回落，之後會再被選中並重新測量"""
+        average = self._latencies.get(model_name)
+        if average is not None:
+            estimate = MODEL_LATENCIES.get(model_name, DEFAULT_LATENCY)
+            self._latencies[model_name] = average + LATENCY_DECAY * (estimate - average)
+    
+    def _expected_cost(self, action_type: str, model_name: str) -> float:
+        """一次調用的預估費用（按該行動類型的平均輸入長度和輸出上限計算）"""
+        input_tokens = self._input_tokens.get(action_type, 1000)
+        return call_cost(model_name, input_tokens, action_max_tokens(action_type) or 300)
+    
+    def record(self, action_type: str, model_name: str, baseline_model: str, input_tokens: int,
+               output_tokens: int, latency: float):
+        """記錄一次調用
+        
+        Args:
+            action_type (str): 行動類型
+            model_name (str): 實際使用的模型
+            baseline_model (str): 座位原本使用的模型
+            input_tokens (int): 輸入標記數
+            output_tokens (int): 輸出標記數
+            latency (float): 延遲（秒）
+        """
+        counts = self.calls.setdefault(action_type, {})
+        counts[model_name] = counts.get(model_name, 0) + 1
+        self.cost += call_cost(model_name, input_tokens, output_tokens)
+        self.baseline_cost += call_cost(baseline_model, input_tokens, output_tokens)
+        
+        previous = self._latencies.get(model_name)
+        self._latencies[model_name] = latency if previous is None else (
+            previous + LATENCY_SMOOTHING * (latency - previous))
+        average = self._input_tokens.get(action_type)
+        self._input_tokens[action_type] = input_tokens if average is None else (
+            average + LATENCY_SMOOTHING * (input_tokens - average))
+    
+    def report(self) -> Dict[str, Any]:
+        """路由統計和節省的費用
+        
+        Returns:
+            Dict[str, Any]: {"calls", "cost", "baseline_cost", "savings", "latency"}
+        """
+        return {
+            "calls": {action: dict(counts) for action, counts in self.calls.items()},
+            "cost": round(self.cost, 6),
+            "baseline_cost": round(self.baseline_cost, 6),
+            "savings": round(self.baseline_cost - self.cost, 6),
+            "latency": {model: round(latency, 3) for model, latency in self._latencies.items()}
+        }
@@ -0,0 +1,499 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+# 文件格式：
+#   文件頭  MAGIC + <BB（格式版本, 保留）
+#   數據塊  <BII（塊類型, 原始長度, 壓縮長度）+ zlib 數據，依次為：
+#           表格塊（字符串表、玩家表、其餘狀態的 JSON）、每天一個事件塊、索引塊
+#   文件尾  <Q4s（索引塊偏移, MAGIC）
+MAGIC = b"WWRP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBB")
+BLOCK_HEADER = struct.Struct("<BII")
+FOOTER = struct.Struct("<Q4s")
+INDEX_ENTRY = struct.Struct("<HQI")  # (天數, 塊偏移, 記錄數)
+PLAYER_ENTRY = struct.Struct("<HIIB")  # (player_id, 名稱, 角色, 是否存活)
+
+BLOCK_TABLES = 1
+BLOCK_DAY = 2
+BLOCK_INDEX = 3
+
+# 壓縮級別
+COMPRESSION_LEVEL = 9
+
+# 記錄類型：日誌模板（參數按模板解析），以及原始日誌、投票和發言
+RAW = 0
+VOTE = 1
+DISCUSSION = 2
+
+# 日誌模板 {記錄類型: (名稱, 模板)}；{day}、{pid} 存為整數，{name} 由玩家表還原，
+# {role} 存為字符串表索引，{pids} 為「玩家1, 玩家2」形式的列表。
+# 按模板還原後與原文不一致的日誌按原始字符串保存。
+LOG_TEMPLATES = {
+    10: ("setup", "遊戲已設置"),
+    11: ("night_start", "第{day}天夜晚開始"),
+    12: ("day_start", "第{day}天白天開始"),
+    13: ("vote_start", "第{day}天投票階段開始"),
+    14: ("game_end", "遊戲結束"),
+    15: ("village_win", "所有狼人都被殺死，村民陣營獲勝！"),
+    16: ("werewolf_win", "狼人數量已經超過村民，狼人陣營獲勝！"),
+    17: ("no_attack", "狼人沒有選擇攻擊目標"),
+    18: ("killed", "玩家{pid}（{name}）被狼人殺死了"),
+    19: ("attack_invalid", "狼人的攻擊目標無效或已經死亡"),
+    20: ("no_votes", "沒有有效投票，無人被放逐"),
+    21: ("tie", "平票！{pids}票數相同，無人被放逐"),
+    22: ("exiled", "玩家{pid}（{name}）被放逐，他的身份是{role}")
+}
+
+_FIELD_PATTERNS = {
+    "day": r"(\d+)",
+    "pid": r"(\d+)",
+    "name": r"(.+?)",
+    "role": r"(.+?)",
+    "pids": r"(玩家\d+(?:, 玩家\d+)*)"
+}
+
+
+def _compile_template(template: str) -> Tuple[re.Pattern, List[str]]:
+    """把日誌模板轉換為正則表達式和字段列表"""
+    fields = re.findall(r"\{(\w+)\}", template)
+    pattern = re.escape(template)
+    for field in fields:
+        pattern = pattern.replace(re.escape("{" + field + "}"), _FIELD_PATTERNS[field], 1)
+    return re.compile("^" + pattern + "$"), fields
+
+
+_COMPILED_TEMPLATES = {record_type: _compile_template(template) for record_type, (_, template) in LOG_TEMPLATES.items()}
+_TEMPLATE_PREFIXES = {record_type: template.split("{", 1)[0] for record_type, (_, template) in LOG_TEMPLATES.items()}
+
+# 事件類型名稱對應的記錄類型，用於只解析需要的記錄
+EVENT_TYPES = {"log": RAW, "vote": VOTE, "discussion": DISCUSSION}
+EVENT_TYPES.update({name: record_type for record_type, (name, _) in LOG_TEMPLATES.items()})
+
+
+class _StringTable:
+    """字符串駐留表，重複的名稱、角色和發言只保存一次"""
+    
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+    
+    def add(self, text: str) -> int:
+        index = self._index.get(text)
+        if index is None:
+            index = self._index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+    
+    def encode(self) -> bytes:
+        parts = [struct.pack("<I", len(self.strings))]
+        for text in self.strings:
+            data = text.encode("utf-8")
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+def _decode_strings(data: bytes, offset: int = 0) -> Tuple[List[str], int]:
+    """解析字符串表，返回 (字符串列表, 結束偏移)"""
+    (count,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    strings = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def _render(record_type: int, values: Dict[str, Any], names: Dict[int, str]) -> str:
+    """按模板還原日誌文本"""
+    template = LOG_TEMPLATES[record_type][1]
+    if "{pids}" in template:
+        values = dict(values, pids=", ".join(f"玩家{pid}" for pid in values["pids"]))
+    if "{name}" in template:
+        values = dict(values, name=names.get(values["pid"], ""))
+    return template.format(**values)
+
+
+def _encode_log(message: str, strings: _StringTable, names: Dict[int, str]) -> bytes:
+    """把一條日誌編碼為模板記錄，無法無損還原時編碼為原始字符串"""
+    for record_type, (pattern, fields) in _COMPILED_TEMPLATES.items():
+        if not message.startswith(_TEMPLATE_PREFIXES[record_type]):
+            continue
+        match = pattern.match(message)
+        if not match:
+            continue
+        values = {}
+        for field, text in zip(fields, match.groups()):
+            if field in ("day", "pid"):
+                values[field] = int(text)
+            elif field == "pids":
+                values[field] = [int(pid) for pid in re.findall(r"\d+", text)]
+            else:
+                values[field] = text
+        if any(value > 0xFFFF for key, value in values.items() if key in ("day", "pid")):
+            continue
+        if _render(record_type, values, names) != message:
+            continue
+        
+        parts = [struct.pack("<B", record_type)]
+        for field in fields:
+            if field in ("day", "pid"):
+                parts.append(struct.pack("<H", values[field]))
+            elif field == "role":
+                parts.append(struct.pack("<I", strings.add(values[field])))
+            elif field == "pids":
+                parts.append(struct.pack(f"<H{len(values[field])}H", len(values[field]), *values[field]))
+        return b"".join(parts)
+    return struct.pack("<BI", RAW, strings.add(message))
+
+
+def _encode_vote(entry: Dict[str, Any]) -> bytes:
+    """編碼一條投票記錄（0 表示無人被放逐）"""
+    votes = [(int(voter), int(target)) for voter, target in entry["votes"].items()]
+    flat = [pid for pair in votes for pid in pair]
+    return struct.pack(f"<BHHH{len(flat)}H", VOTE, entry["day"], entry["exiled"] or 0, len(votes), *flat)
+
+
+def _block(kind: int, payload: bytes) -> bytes:
+    """壓縮並封裝一個數據塊"""
+    compressed = zlib.compress(payload, COMPRESSION_LEVEL)
+    return BLOCK_HEADER.pack(kind, len(payload), len(compressed)) + compressed
+
+
+def _split_days(log: List[str]) -> List[Tuple[int, List[str]]]:
+    """按「第N天夜晚開始」把日誌分為每天一段（第 0 段為設置階段）"""
+    days = [(0, [])]
+    for message in log:
+        match = re.match(r"^第(\d+)天夜晚開始$", message)
+        if match and int(match.group(1)) != days[-1][0]:
+            days.append((int(match.group(1)), []))
+        days[-1][1].append(message)
+    return days
+
+
+def _simple_records(items: List[Dict[str, Any]], keys: set) -> bool:
+    """檢查記錄是否只包含可以按類型編碼的字段"""
+    return all(isinstance(item, dict) and set(item) == keys for item in items)
+
+
+def encode_replay(state: Dict[str, Any]) -> bytes:
+    """把遊戲狀態（GameState.to_dict 或 JSON 存檔的內容）編碼為回放格式
+    
+    Args:
+        state (Dict[str, Any]): 遊戲狀態
+        
+    Returns:
+        bytes: 回放數據
+    """
+    strings = _StringTable()
+    meta = {key: value for key, value in state.items()
+            if key not in ("players", "log", "vote_history", "current_discussions")}
+    
+    players = state.get("players", [])
+    names = {}
+    if _simple_records(players, {"player_id", "name", "role", "is_alive"}) and all(
+            0 <= p["player_id"] <= 0xFFFF for p in players):
+        player_table = [struct.pack("<H", len(players))]
+        for player in players:
+            names[player["player_id"]] = player["name"]
+            player_table.append(PLAYER_ENTRY.pack(player["player_id"], strings.add(player["name"]),
+                                                  strings.add(player["role"]), bool(player["is_alive"])))
+    else:
+        player_table = [struct.pack("<H", 0)]
+        meta["players"] = players
+    
+    vote_history = state.get("vote_history", [])
+    typed_votes = _simple_records(vote_history, {"day", "votes", "exiled"})
+    if not typed_votes:
+        meta["vote_history"] = vote_history
+    discussions = state.get("current_discussions", [])
+    typed_discussions = _simple_records(discussions, {"player_id", "player_name", "content"})
+    if not typed_discussions:
+        meta["current_discussions"] = discussions
+    
+    days = _split_days(state.get("log", []))
+    day_blocks = []
+    for index, (day, messages) in enumerate(days):
+        records = [_encode_log(message, strings, names) for message in messages]
+        if typed_votes:
+            records.extend(_encode_vote(entry) for entry in vote_history if entry["day"] == day or (
+                index == 0 and not any(entry["day"] == d for d, _ in days)))
+        if typed_discussions and index == len(days) - 1:
+            records.extend(struct.pack("<BHII", DISCUSSION, d["player_id"], strings.add(d["player_name"]),
+                                       strings.add(d["content"])) for d in discussions)
+        day_blocks.append((day, len(records), b"".join(struct.pack("<H", len(r)) + r for r in records)))
+    
+    tables = strings.encode() + b"".join(player_table) + json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, 0), _block(BLOCK_TABLES, tables)]
+    offset = sum(len(part) for part in parts)
+    index_entries = []
+    for day, count, payload in day_blocks:
+        block = _block(BLOCK_DAY, payload)
+        index_entries.append(INDEX_ENTRY.pack(day, offset, count))
+        parts.append(block)
+        offset += len(block)
+    parts.append(_block(BLOCK_INDEX, struct.pack("<H", len(index_entries)) + b"".join(index_entries)))
+    parts.append(FOOTER.pack(offset, MAGIC))
+    return b"".join(parts)
+
+
+def write_replay(state: Dict[str, Any], path: str):
+    """把遊戲狀態寫入回放文件
+    
+    Args:
+        state (Dict[str, Any]): 遊戲狀態（GameState.to_dict 或 JSON 存檔的內容）
+        path (str): 文件路徑
+    """
+    data = encode_replay(state)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def convert_json_save(json_path: str, replay_path: str) -> Dict[str, int]:
+    """把 save_game 的 JSON 存檔轉換為回放文件
+    
+    Args:
+        json_path (str): JSON 存檔路徑
+        replay_path (str): 回放文件路徑
+        
+    Returns:
+        Dict[str, int]: {"json_bytes", "replay_bytes"}
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    write_replay(state, replay_path)
+    return {"json_bytes": os.path.getsize(json_path), "replay_bytes": os.path.getsize(replay_path)}
+
+
+class ReplayReader:
+    """回放文件的讀取器：可以按順序流式讀取事件，也可以通過索引直接讀取某一天
+    
+    文件以內存映射方式打開，只有實際讀取的數據塊會被載入和解壓。
+    """
+    
+    def __init__(self, path: str):
+        """打開回放文件並讀取表格塊
+        
+        Args:
+            path (str): 文件路徑
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size + FOOTER.size:
+                raise ValueError(f"{path} 不是回放文件")
+            self._file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} 不是回放文件")
+        if version != FORMAT_VERSION:
+            self._file.close()
+            raise ValueError(f"不支持的回放格式版本: {version}")
+        
+        kind, tables = self._read_block()
+        self.strings, offset = _decode_strings(tables)
+        (player_count,) = struct.unpack_from("<H", tables, offset)
+        offset += 2
+        self.players = []
+        for _ in range(player_count):
+            player_id, name, role, is_alive = PLAYER_ENTRY.unpack_from(tables, offset)
+            offset += PLAYER_ENTRY.size
+            self.players.append({"player_id": player_id, "name": self.strings[name],
+                                 "role": self.strings[role], "is_alive": bool(is_alive)})
+        self.meta = json.loads(tables[offset:].decode("utf-8"))
+        if "players" in self.meta:
+            self.players = self.meta["players"]
+        self._names = {p["player_id"]: p["name"] for p in self.players}
+        self._data_offset = self._file.tell()
+        self._index = None
+    
+    def close(self):
+        """關閉文件"""
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def _read_block(self) -> Tuple[int, bytes]:
+        """從當前位置讀取並解壓一個數據塊"""
+        kind, raw_length, compressed_length = BLOCK_HEADER.unpack(self._file.read(BLOCK_HEADER.size))
+        payload = zlib.decompress(self._file.read(compressed_length))
+        if len(payload) != raw_length:
+            raise ValueError("回放數據塊已損壞")
+        return kind, payload
+    
+    @property
+    def index(self) -> Dict[int, Tuple[int, int]]:
+        """每天的事件塊位置 {day: (塊偏移, 記錄數)}，從文件尾讀取"""
+        if self._index is None:
+            self._file.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, magic = FOOTER.unpack(self._file.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError("回放文件不完整（缺少索引）")
+            self._file.seek(index_offset)
+            _, payload = self._read_block()
+            (count,) = struct.unpack_from("<H", payload, 0)
+            self._index = {}
+            for position in range(count):
+                day, offset, records = INDEX_ENTRY.unpack_from(payload, 2 + position * INDEX_ENTRY.size)
+                self._index[day] = (offset, records)
+        return self._index
+    
+    @property
+    def days(self) -> List[int]:
+        """回放中包含的天數"""
+        return sorted(self.index)
+    
+    def _decode_records(self, day: int, payload: bytes, record_types: set = None) -> Iterator[Dict[str, Any]]:
+        """解析一個事件塊中的記錄，record_types 不為 None 時跳過其他類型的記錄"""
+        offset = 0
+        while offset < len(payload):
+            (length,) = struct.unpack_from("<H", payload, offset)
+            start = offset + 2
+            offset = start + length
+            if record_types is None or payload[start] in record_types:
+                yield self._decode_record(day, payload[start:offset])
+    
+    def _decode_record(self, day: int, record: bytes) -> Dict[str, Any]:
+        """解析一條記錄為事件字典"""
+        record_type = record[0]
+        if record_type == RAW:
+            (index,) = struct.unpack_from("<I", record, 1)
+            return {"type": "log", "day": day, "text": self.strings[index]}
+        if record_type == VOTE:
+            vote_day, exiled, count = struct.unpack_from("<HHH", record, 1)
+            flat = struct.unpack_from(f"<{count * 2}H", record, 7)
+            return {"type": "vote", "day": vote_day, "exiled": exiled or None,
+                    "votes": {flat[i]: flat[i + 1] for i in range(0, len(flat), 2)}}
+        if record_type == DISCUSSION:
+            player_id, name, content = struct.unpack_from("<HII", record, 1)
+            return {"type": "discussion", "day": day, "player_id": player_id,
+                    "player_name": self.strings[name], "content": self.strings[content]}
+        
+        name, template = LOG_TEMPLATES[record_type]
+        values = {}
+        offset = 1
+        for field in _COMPILED_TEMPLATES[record_type][1]:
+            if field in ("day", "pid"):
+                (values[field],) = struct.unpack_from("<H", record, offset)
+                offset += 2
+            elif field == "role":
+                (index,) = struct.unpack_from("<I", record, offset)
+                values[field] = self.strings[index]
+                offset += 4
+            elif field == "pids":
+                (count,) = struct.unpack_from("<H", record, offset)
+                values[field] = list(struct.unpack_from(f"<{count}H", record, offset + 2))
+                offset += 2 + 2 * count
+        event = {"type": name, "day": day}
+        event.update(values)
+        event["text"] = _render(record_type, values, self._names)
+        return event
+    
+    def iter_events(self, types: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """按順序流式讀取所有事件，每次只解壓一天的數據
+        
+        Args:
+            types (List[str], optional): 只解析這些類型的事件（見 EVENT_TYPES），例如 ["vote"]。默認為全部
+        
+        Yields:
+            Dict[str, Any]: 事件，日誌類事件帶有 "text"
+        """
+        record_types = None if types is None else {EVENT_TYPES[name] for name in types}
+        days = self.days
+        self._file.seek(self._data_offset)
+        for day in days:
+            kind, payload = self._read_block()
+            if kind != BLOCK_DAY:
+                break
+            yield from self._decode_records(day, payload, record_types)
+    
+    def read_day(self, day: int) -> List[Dict[str, Any]]:
+        """通過索引直接讀取某一天的事件
+        
+        Args:
+            day (int): 天數（0 為設置階段）
+            
+        Returns:
+            List[Dict[str, Any]]: 事件列表，回放中沒有這一天時為空
+        """
+        position = self.index.get(day)
+        if position is None:
+            return []
+        self._file.seek(position[0])
+        _, payload = self._read_block()
+        return list(self._decode_records(day, payload))
+    
+    def to_state(self) -> Dict[str, Any]:
+        """還原為與 JSON 存檔內容相同的遊戲狀態（可傳給 GameState.from_dict）
+        
+        Returns:
+            Dict[str, Any]: 遊戲狀態
+        """
+        log, vote_history, discussions = [], [], []
+        for event in self.iter_events():
+            if event["type"] == "vote":
+                votes = {str(voter): target for voter, target in event["votes"].items()}
+                vote_history.append({"day": event["day"], "votes": votes, "exiled": event["exiled"]})
+            elif event["type"] == "discussion":
+                discussions.append({"player_id": event["player_id"], "player_name": event["player_name"],
+                                    "content": event["content"]})
+            else:
+                log.append(event["text"])
+        
+        state = dict(self.meta)
+        state.setdefault("players", self.players)
+        state.setdefault("vote_history", vote_history)
+        state.setdefault("current_discussions", discussions)
+        state["log"] = log
+        return state
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m models.replay convert game.json game.wwr"""
+    parser = argparse.ArgumentParser(description="狼人殺回放文件工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="把 JSON 存檔轉換為回放文件")
+    convert.add_argument("json_paths", nargs="+", help="JSON 存檔（可以有多個）")
+    convert.add_argument("--out-dir", default=None, help="輸出目錄。默認與存檔相同，擴展名改為 .wwr")
+    show = subparsers.add_parser("show", help="顯示回放內容")
+    show.add_argument("replay_path", help="回放文件")
+    show.add_argument("--day", type=int, default=None, help="只顯示某一天")
+    args = parser.parse_args(argv)
+    
+    if args.command == "convert":
+        for json_path in args.json_paths:
+            directory = args.out_dir or os.path.dirname(json_path)
+            replay_path = os.path.join(directory, os.path.splitext(os.path.basename(json_path))[0] + ".wwr")
+            sizes = convert_json_save(json_path, replay_path)
+            print(f"{json_path} -> {replay_path}：{sizes['json_bytes']} -> {sizes['replay_bytes']} 字節 "
+                  f"({sizes['replay_bytes'] / max(sizes['json_bytes'], 1):.1%})")
+    else:
+        with ReplayReader(args.replay_path) as reader:
+            events = reader.read_day(args.day) if args.day is not None else reader.iter_events()
+            for event in events:
+                if event["type"] == "vote":
+                    exiled = f"玩家{event['exiled']}被放逐" if event["exiled"] else "無人被放逐"
+                    text = f"投票：{len(event['votes'])}票，{exiled}"
+                elif event["type"] == "discussion":
+                    text = f"{event['player_name']}：{event['content']}"
+                else:
+                    text = event["text"]
+                print(f"[第{event['day']}天] {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Tuple
+
+from .broadcast import encode_payload
+
+# 緩存的響應數上限，超過時淘汰最久未使用的
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class VersionedResponseCache:
+    """按狀態版本緩存序列化後的響應體，並生成對應的 ETag
+    
+    同一個鍵在版本不變時直接返回緩存的字節；ETag 只由鍵和版本決定，客戶端帶著
+    匹配的 If-None-Match 輪詢時無需構建或查找響應體即可回答 304。
+    ETag 帶有每個緩存實例的隨機標記，服務器重啟後舊的 ETag 不會誤匹配。
+    """
+    
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """初始化緩存
+        
+        Args:
+            max_entries (int, optional): 緩存的響應數上限。默認為 4096
+        """
+        self.max_entries = max_entries
+        self._token = secrets.token_hex(4)
+        self._entries = OrderedDict()  # {key: (version, etag, body)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+    
+    def etag(self, key: Tuple, version: Hashable) -> str:
+        """鍵和版本對應的 ETag（不含引號）
+        
+        Args:
+            key (Tuple): 響應鍵，第一項為遊戲ID，例如 (game_id, "summary")
+            version (Hashable): 內容版本
+            
+        Returns:
+            str: ETag
+        """
+        parts = [self._token] + [str(part) for part in key]
+        parts += [str(part) for part in version] if isinstance(version, tuple) else [str(version)]
+        return "-".join(parts)
+    
+    def record_not_modified(self):
+        """記錄一次 304 回應"""
+        with self._lock:
+            self.not_modified += 1
+    
+    def get(self, key: Tuple, version: Hashable, build: Callable[[], Dict[str, Any]]) -> Tuple[str, bytes]:
+        """獲取響應體，版本變化時重新構建並序列化
+        
+        Args:
+            key (Tuple): 響應鍵，第一項為遊戲ID
+            version (Hashable): 內容版本
+            build (Callable[[], Dict[str, Any]]): 構建響應數據
+            
+        Returns:
+            Tuple[str, bytes]: (ETag, UTF-8 JSON 響應體)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+        
+        etag, body = self.etag(key, version), encode_payload(build())
+        with self._lock:
+            self._entries[key] = (version, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, body
+    
+    def discard(self, game_id: str):
+        """刪除一局遊戲的所有緩存（遊戲結束或被移除時調用）
+        
+        Args:
+            game_id (str): 遊戲ID
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == game_id]:
+                del self._entries[key]
+    
+    def stats(self) -> Dict[str, int]:
+        """命中情況
+        
+        Returns:
+            Dict[str, int]: {"entries", "hits", "misses", "not_modified"}
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "not_modified": self.not_modified}
@@ -0,0 +1,203 @@
+import threading
+import time
+from typing import Dict, Any, Tuple
+
+from api.prompt_cache import call_usage
+from .metrics import Histogram
+from .model_router import call_cost
+from . import tracing
+
+# Prometheus 指標名稱前綴
+METRIC_PREFIX = "werewolf_llm"
+
+
+def _escape_label(value) -> str:
+    """轉義 Prometheus 標籤值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    """生成 Prometheus 標籤文本，例如 {model="gpt-4o",phase="day"}"""
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class LLMTelemetry:
+    """彙總模型調用的計數器和延遲直方圖，並以 Prometheus 文本格式輸出
+    
+    標記數使用服務商返回的實際用量（替身處理程序按 estimate_tokens 估計），費用按 model_router.MODEL_PRICES 計算。
+    """
+    
+    CALL_LABELS = ("model", "role", "phase", "outcome")
+    TOKEN_LABELS = ("model", "role", "phase")
+    LATENCY_LABELS = ("model", "phase")
+    
+    def __init__(self):
+        """初始化統計"""
+        self._lock = threading.Lock()
+        self.calls = {}  # {(model, role, phase, outcome): count}
+        self.prompt_tokens = {}  # {(model, role, phase): tokens}
+        self.completion_tokens = {}  # {(model, role, phase): tokens}
+        self.cost = {}  # {model: USD}
+        self.latency = {}  # {(model, phase): Histogram}
+        self.latency_listeners = []  # 每次調用後調用 listener(model, latency)，例如准入控制
+    
+    def record(self, model: str, role: str, phase: str, outcome: str, prompt_tokens: int,
+               completion_tokens: int, latency: float, cost: float):
+        """記錄一次模型調用
+        
+        Args:
+            model (str): 模型名稱
+            role (str): 玩家角色
+            phase (str): 遊戲階段
+            outcome (str): 結果（ok、empty 或 error）
+            prompt_tokens (int): 輸入標記數
+            completion_tokens (int): 輸出標記數
+            latency (float): 延遲（秒）
+            cost (float): 費用（美元）
+        """
+        token_key = (model, role, phase)
+        with self._lock:
+            call_key = token_key + (outcome,)
+            self.calls[call_key] = self.calls.get(call_key, 0) + 1
+            self.prompt_tokens[token_key] = self.prompt_tokens.get(token_key, 0) + prompt_tokens
+            self.completion_tokens[token_key] = self.completion_tokens.get(token_key, 0) + completion_tokens
+            self.cost[model] = self.cost.get(model, 0.0) + cost
+            histogram = self.latency.get((model, phase))
+            if histogram is None:
+                histogram = self.latency[(model, phase)] = Histogram()
+            histogram.observe(latency)
+        for listener in self.latency_listeners:
+            listener(model, latency)
+    
+    def render_prometheus(self) -> str:
+        """以 Prometheus 文本格式輸出所有指標
+        
+        Returns:
+            str: 指標文本
+        """
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {METRIC_PREFIX}_calls_total 模型調用次數")
+            lines.append(f"# TYPE {METRIC_PREFIX}_calls_total counter")
+            for key, count in sorted(self.calls.items()):
+                lines.append(f"{METRIC_PREFIX}_calls_total{_format_labels(self.CALL_LABELS, key)} {count}")
+            
+            for name, values, help_text in (
+                ("prompt_tokens_total", self.prompt_tokens, "輸入標記數（估計）"),
+                ("completion_tokens_total", self.completion_tokens, "輸出標記數（估計）")
+            ):
+                lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                for key, value in sorted(values.items()):
+                    lines.append(f"{METRIC_PREFIX}_{name}{_format_labels(self.TOKEN_LABELS, key)} {value}")
+            
+            lines.append(f"# HELP {METRIC_PREFIX}_cost_usd_total 模型調用費用（美元，估計）")
+            lines.append(f"# TYPE {METRIC_PREFIX}_cost_usd_total counter")
+            for model, cost in sorted(self.cost.items()):
+                lines.append(f"{METRIC_PREFIX}_cost_usd_total{_format_labels(('model',), (model,))} {cost:.6f}")
+            
+            lines.append(f"# HELP {METRIC_PREFIX}_latency_seconds 模型調用延遲")
+            lines.append(f"# TYPE {METRIC_PREFIX}_latency_seconds histogram")
+            for key, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    labels = _format_labels(self.LATENCY_LABELS, key, f'le="{le}"')
+                    lines.append(f"{METRIC_PREFIX}_latency_seconds_bucket{labels} {cumulative}")
+                labels = _format_labels(self.LATENCY_LABELS, key)
+                lines.append(f"{METRIC_PREFIX}_latency_seconds_sum{labels} {histogram.sum:.6f}")
+                lines.append(f"{METRIC_PREFIX}_latency_seconds_count{labels} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class GameCost:
+    """一局遊戲的模型調用費用和標記數合計"""
+    
+    def __init__(self):
+        """初始化合計"""
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.by_model = {}  # {model: {"calls", "cost"}}
+    
+    def add(self, model: str, outcome: str, prompt_tokens: int, completion_tokens: int, cost: float):
+        """加入一次調用"""
+        self.calls += 1
+        self.errors += outcome == "error"
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+        model_totals = self.by_model.setdefault(model, {"calls": 0, "cost": 0.0})
+        model_totals["calls"] += 1
+        model_totals["cost"] += cost
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典
+        
+        Returns:
+            Dict[str, Any]: 費用合計
+        """
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": round(self.cost, 6),
+            "by_model": {model: {"calls": t["calls"], "cost": round(t["cost"], 6)} for model, t in self.by_model.items()}
+        }
+
+
+class InstrumentedHandler:
+    """記錄每次 get_response 的模型、角色、階段、標記數、延遲和結果
+    
+    其他屬性直接轉發給原處理程序。
+    """
+    
+    def __init__(self, handler, telemetry: LLMTelemetry, game_cost: GameCost, role: str, phase: str):
+        """初始化
+        
+        Args:
+            handler: 原處理程序
+            telemetry (LLMTelemetry): 進程內的指標彙總
+            game_cost (GameCost): 本局的費用合計
+            role (str): 玩家角色
+            phase (str): 遊戲階段
+        """
+        self._handler = handler
+        self._telemetry = telemetry
+        self._game_cost = game_cost
+        self._role = role
+        self._phase = phase
+    
+    def __getattr__(self, name):
+        return getattr(self._handler, name)
+    
+    async def get_response(self, prompt, system_message=None, temperature=0.7, max_tokens=500, prompt_prefix=None, stop=None):
+        """調用原處理程序並記錄指標，異常會在記錄後重新拋出"""
+        started = time.perf_counter()
+        response = None
+        outcome = "error"
+        try:
+            with tracing.span("llm_call", model=getattr(self._handler, "model", "unknown"), max_tokens=max_tokens):
+                response = await self._handler.get_response(prompt, system_message, temperature=temperature,
+                                                            max_tokens=max_tokens, prompt_prefix=prompt_prefix,
+                                                            stop=stop)
+            outcome = "ok" if response else "empty"
+            return response
+        finally:
+            model = getattr(self._handler, "model", "unknown")
+            prompt_tokens, completion_tokens = call_usage(self._handler, response, prompt, prompt_prefix, system_message)
+            cost = call_cost(model, prompt_tokens, completion_tokens)
+            self._telemetry.record(model, self._role, self._phase, outcome, prompt_tokens, completion_tokens,
+                                   time.perf_counter() - started, cost)
+            self._game_cost.add(model, outcome, prompt_tokens, completion_tokens, cost)
+
+
+# 進程內共用的模型調用指標
+llm_telemetry = LLMTelemetry()
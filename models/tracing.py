@@ -0,0 +1,182 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, List
+
+# 當前上下文中的追蹤器；為 None 時 span() 返回空操作，幾乎沒有開銷
+_current_tracer = contextvars.ContextVar("werewolf_tracer", default=None)
+
+
+class _NullSpan:
+    """追蹤關閉時使用的空操作區段"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """一個計時區段，離開時記錄到追蹤器"""
+    
+    __slots__ = ("_tracer", "_name", "_args", "_start", "_tid")
+    
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+    
+    def __enter__(self):
+        self._tid = self._tracer._current_tid()
+        self._start = time.perf_counter_ns()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._tracer._add(self._name, self._start, time.perf_counter_ns(), self._tid, self._args)
+        return False
+
+
+class Tracer:
+    """記錄一局遊戲的計時區段，並導出為 Chrome trace / Perfetto 可讀的 JSON
+    
+    同時進行的 asyncio 任務各自顯示為一條軌道，以免重疊的區段互相嵌套。
+    """
+    
+    def __init__(self, name: str = "werewolf"):
+        """初始化追蹤器
+        
+        Args:
+            name (str, optional): 追蹤中顯示的進程名稱。默認為 "werewolf"
+        """
+        self.name = name
+        self.events = []  # [(name, start_ns, end_ns, tid, args)]
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._tracks = {}  # {(thread_id, task_id): (tid, label)}
+    
+    def span(self, name: str, **args) -> _Span:
+        """創建一個計時區段
+        
+        Args:
+            name (str): 區段名稱
+            **args: 附加到區段上的參數
+            
+        Returns:
+            _Span: 區段，使用 with 語句計時
+        """
+        return _Span(self, name, args)
+    
+    def _current_tid(self) -> int:
+        """當前線程和 asyncio 任務對應的軌道編號"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = (threading.get_ident(), id(task) if task is not None else 0)
+        with self._lock:
+            track = self._tracks.get(key)
+            if track is None:
+                label = task.get_name() if task is not None else threading.current_thread().name
+                track = self._tracks[key] = (len(self._tracks) + 1, label)
+        return track[0]
+    
+    def _add(self, name: str, start_ns: int, end_ns: int, tid: int, args: Dict[str, Any]):
+        """記錄一個完成的區段"""
+        with self._lock:
+            self.events.append((name, start_ns, end_ns, tid, args))
+    
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """轉換為 Chrome trace 事件格式
+        
+        Returns:
+            Dict[str, Any]: {"traceEvents": [...], "displayTimeUnit": "ms"}
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            tracks = list(self._tracks.values())
+        
+        trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.name}}]
+        trace_events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": label}}
+                            for tid, label in tracks)
+        for name, start_ns, end_ns, tid, args in events:
+            trace_events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start_ns - self._origin) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                         for key, value in args.items()}
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+    
+    def export_chrome_trace(self, path: str):
+        """導出為 JSON 文件，可在 chrome://tracing 或 ui.perfetto.dev 中打開
+        
+        Args:
+            path (str): 文件路徑
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """按區段名稱彙總總耗時，由高到低排列
+        
+        Returns:
+            List[Dict[str, Any]]: [{"name", "count", "total_ms"}]
+        """
+        totals = {}
+        with self._lock:
+            for name, start_ns, end_ns, _, _ in self.events:
+                count, total = totals.get(name, (0, 0))
+                totals[name] = (count + 1, total + end_ns - start_ns)
+        return [{"name": name, "count": count, "total_ms": total / 1e6}
+                for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])]
+
+
+def span(name: str, **args):
+    """在當前追蹤器中創建區段，沒有啟用追蹤時返回空操作
+    
+    Args:
+        name (str): 區段名稱
+        **args: 附加參數
+        
+    Returns:
+        上下文管理器
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def activate(tracer):
+    """將追蹤器設為當前上下文（及之後創建的 asyncio 任務）的追蹤器
+    
+    Args:
+        tracer (Tracer): 追蹤器，None 表示關閉
+        
+    Returns:
+        contextvars.Token: 用於 deactivate 的標記
+    """
+    return _current_tracer.set(tracer)
+
+
+def deactivate(token):
+    """恢復 activate 之前的追蹤器
+    
+    Args:
+        token (contextvars.Token): activate 返回的標記
+    """
+    _current_tracer.reset(token)
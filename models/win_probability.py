@@ -0,0 +1,167 @@
+import time
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+# 放逐投票以平票告終（無人出局）的概率
+NO_EXILE_PROBABILITY = 0.1
+
+# 規則策略下，預言家存活且已查到狼人時，村民跟隨查驗結果放逐該狼人的概率
+SEER_TRUST = 0.8
+
+VILLAGE = "村民陣營"
+WEREWOLVES = "狼人陣營"
+
+
+class WinProbabilityEstimator:
+    """用蒙特卡洛模擬估計雙方陣營的勝率
+    
+    每局模擬只跟蹤存活的狼人、預言家、村民人數、存活的狼群數，以及預言家已查到但尚未出局的狼人數，
+    所有模擬以 NumPy 數組並行推進：夜晚預言家查驗、每個存活的狼群各隨機擊殺一名好人；
+    白天隨機放逐（規則策略下優先放逐預言家查到的狼人），直到一方獲勝。
+    結果按狀態版本緩存。
+    """
+    
+    def __init__(self, playouts: int = 4000, policy: str = "heuristic", seed: Optional[int] = None):
+        """初始化估計器
+        
+        Args:
+            playouts (int, optional): 每次估計的模擬局數。默認為 4000
+            policy (str, optional): 模擬策略（'random' 或 'heuristic'）。默認為 'heuristic'
+            seed (int, optional): 隨機種子
+        """
+        if policy not in ("random", "heuristic"):
+            raise ValueError(f"不支持的模擬策略: {policy}")
+        self.playouts = playouts
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        self._cache = None  # (version, result)
+    
+    def estimate(self, game_state) -> Dict[str, Any]:
+        """估計當前狀態下雙方的勝率，同一狀態版本只計算一次
+        
+        Args:
+            game_state (GameState): 遊戲狀態
+            
+        Returns:
+            Dict[str, Any]: {"村民陣營": p, "狼人陣營": p, "undecided": p, "playouts", "policy",
+                "version", "elapsed_ms"}
+        """
+        if self._cache is not None and self._cache[0] == game_state.version:
+            return self._cache[1]
+        
+        started = time.perf_counter()
+        if game_state.game_over:
+            village = 1.0 if game_state.winner == VILLAGE else 0.0
+            wolves = 1.0 if game_state.winner == WEREWOLVES else 0.0
+            playouts = 0
+        else:
+            night_first = game_state.phase in ("setup", "night")
+            winners = self._simulate(*self._initial_counts(game_state), night_first=night_first)
+            village = float(np.mean(winners == 1))
+            wolves = float(np.mean(winners == 2))
+            playouts = self.playouts
+        
+        result = {
+            VILLAGE: village,
+            WEREWOLVES: wolves,
+            "undecided": max(0.0, 1.0 - village - wolves),
+            "playouts": playouts,
+            "policy": self.policy,
+            "version": game_state.version,
+            "elapsed_ms": (time.perf_counter() - started) * 1000
+        }
+        self._cache = (game_state.version, result)
+        return result
+    
+    def _initial_counts(self, game_state):
+        """從遊戲狀態中統計存活人數
+        
+        Args:
+            game_state (GameState): 遊戲狀態
+            
+        Returns:
+            tuple: (狼人數, 預言家數, 村民數, 預言家已查到的存活狼人數, 存活的狼群數)
+        """
+        alive = {p["player_id"]: p["role"] for p in game_state.players if p["is_alive"]}
+        werewolves = sum(1 for role in alive.values() if role == "werewolf")
+        seers = sum(1 for role in alive.values() if role == "seer")
+        villagers = len(alive) - werewolves - seers
+        
+        found = 0
+        for player_id, role in alive.items():
+            if role != "seer":
+                continue
+            checked = getattr(game_state.player_objects.get(player_id), "checked_players", {})
+            found += sum(1 for pid, result in checked.items() if result == "狼人" and pid in alive)
+        # 每個存活的狼群每晚擊殺一人（見 GameState.pack_leaders）
+        packs = len(game_state.pack_leaders())
+        return werewolves, seers, villagers, min(found, werewolves), packs
+    
+    def _simulate(self, werewolves: int, seers: int, villagers: int, found: int, packs: int,
+                  night_first: bool) -> np.ndarray:
+        """並行推進所有模擬局直到分出勝負
+        
+        Args:
+            werewolves (int): 存活狼人數
+            seers (int): 存活預言家數
+            villagers (int): 存活村民數
+            found (int): 預言家已查到的存活狼人數
+            packs (int): 存活的狼群數，每個狼群每晚擊殺一名好人
+            night_first (bool): 下一個結算的是否是夜晚
+            
+        Returns:
+            np.ndarray: 每局的結果，0 為未分勝負、1 為村民陣營、2 為狼人陣營
+        """
+        n = self.playouts
+        rng = self.rng
+        w = np.full(n, werewolves)
+        s = np.full(n, seers)
+        v = np.full(n, villagers)
+        known = np.full(n, found)
+        p = np.full(n, packs)
+        winners = np.zeros(n, dtype=np.int8)
+        night = night_first
+        
+        # 每一步至少有一名玩家出局或平票，步數上限足夠所有模擬結束
+        for _ in range(2 * (werewolves + seers + villagers) + 2):
+            active = winners == 0
+            if not active.any():
+                break
+            
+            if night:
+                # 預言家在其餘存活玩家中查驗一人，可能發現新的狼人
+                others = w + v
+                p_find = np.where((s > 0) & (others > 0), (w - known) / np.maximum(others, 1), 0.0)
+                known += active & (rng.random(n) < p_find)
+                
+                # 每個存活的狼群在存活的好人中各擊殺一人（不重複），狼群數不超過存活狼人數
+                p = np.minimum(p, w)
+                kills = np.where(active, np.minimum(p, s + v), 0)
+                seer_killed = rng.hypergeometric(s, v, kills)
+                s -= seer_killed
+                v -= kills - seer_killed
+            else:
+                total = w + s + v
+                exiled = active & (rng.random(n) >= NO_EXILE_PROBABILITY)
+                if self.policy == "heuristic":
+                    trusted = exiled & (s > 0) & (known > 0) & (rng.random(n) < SEER_TRUST)
+                else:
+                    trusted = np.zeros(n, dtype=bool)
+                pick = rng.random(n) * total
+                random_exile = exiled & ~trusted
+                wolf_out = trusted | (random_exile & (pick < w))
+                seer_out = random_exile & (pick >= w) & (pick < w + s)
+                villager_out = random_exile & (pick >= w + s)
+                w -= wolf_out
+                s -= seer_out
+                v -= villager_out
+                known -= trusted
+            
+            # 預言家死亡後其查驗結果不再影響投票
+            known = np.where(s > 0, np.minimum(known, w), 0)
+            winners[active & (w == 0)] = 1
+            winners[active & (w > 0) & (w >= s + v)] = 2
+            night = not night
+        
+        return winners
@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import threading
+
+# 每種行動的最大生成標記數（結構化模式）
+ACTION_TOKEN_CAPS = {
+    "check": 16,
+    "attack": 16,
+    "vote": 16
+}
+
+# 結構化模式的停止序列：生成到 JSON 結尾即停止
+ACTION_STOP_SEQUENCES = ["}"]
+
+# 自由文本模式下各行動的回答格式
+TEXT_FORMATS = {
+    "check": "回答格式：'我選擇查驗玩家X'，其中X是玩家ID。",
+    "attack": "回答格式：'我選擇攻擊玩家X'，其中X是玩家ID。",
+    "vote": "請分析並做出決策，回答格式：'我投票給玩家X'，其中X是玩家ID。"
+}
+
+STRUCTURED_FORMAT = '不要解釋，只輸出一行JSON：{"target": X}，其中X是玩家ID。'
+
+_JSON_TARGET_PATTERN = re.compile(r'"target"\s*:\s*"?(?:玩家)?(\d+)')
+_TEXT_TARGET_PATTERN = re.compile(r'玩家(\d+)')
+
+
+def is_structured():
+    """是否使用結構化行動輸出
+    
+    行動輸出模式由 ACTION_OUTPUT_MODE 環境變量決定："structured"（默認）要求模型只輸出簡短 JSON，
+    "text" 為舊的自由文本格式。每次調用時讀取，以便 .env 在導入本模組之後才載入時也能生效。
+    
+    Returns:
+        bool: 是否為結構化模式
+    """
+    return os.getenv("ACTION_OUTPUT_MODE", "structured") == "structured"
+
+
+def answer_instruction(action, guidance=""):
+    """構建行動提示最後的回答指示
+    
+    Args:
+        action (str): 行動類型（check、attack、vote）
+        guidance (str, optional): 放在回答格式之前的決策指引。默認為空
+        
+    Returns:
+        str: 回答指示
+    """
+    answer_format = STRUCTURED_FORMAT if is_structured() else TEXT_FORMATS[action]
+    return f"{guidance}{answer_format}"
+
+
+def request_options(action):
+    """獲取行動請求的生成參數
+    
+    Args:
+        action (str): 行動類型
+        
+    Returns:
+        dict: 傳給 get_response 的關鍵字參數
+    """
+    if not is_structured():
+        return {}
+    return {
+        "temperature": 0.2,
+        "max_tokens": ACTION_TOKEN_CAPS.get(action, 16),
+        "stop": ACTION_STOP_SEQUENCES
+    }
+
+
+def parse_target(response, legal_ids):
+    """從模型回應中解析目標玩家並驗證是否合法
+    
+    依次嘗試 JSON 字段（允許被停止序列截斷的 JSON）和「玩家X」文本引用，
+    只接受合法目標集合中的玩家。
+    
+    Args:
+        response (str): 模型回應
+        legal_ids (collection): 合法的目標玩家 ID
+        
+    Returns:
+        tuple: (target_id, outcome)，outcome 為 "json"、"text"、"illegal" 或 "missing"
+    """
+    text = (response or "").strip()
+    saw_candidate = False
+    
+    # 停止序列會截掉結尾的 "}"，補回後嘗試完整解析
+    if text.startswith("{"):
+        try:
+            data = json.loads(text if text.endswith("}") else text + "}")
+            target = int(str(data.get("target", "")).replace("玩家", ""))
+            saw_candidate = True
+            if target in legal_ids:
+                return target, "json"
+        except (ValueError, TypeError, AttributeError):
+            pass
+    
+    match = _JSON_TARGET_PATTERN.search(text)
+    if match:
+        saw_candidate = True
+        target = int(match.group(1))
+        if target in legal_ids:
+            return target, "json"
+    
+    for value in _TEXT_TARGET_PATTERN.findall(text):
+        saw_candidate = True
+        if int(value) in legal_ids:
+            return int(value), "text"
+    
+    return None, "illegal" if saw_candidate else "missing"
+
+
+class ActionOutputStats:
+    """統計行動輸出的解析結果"""
+    
+    OUTCOMES = ("json", "text", "illegal", "missing", "error", "forced")  # forced：只有一個合法目標，未調用模型
+    
+    def __init__(self):
+        """初始化統計"""
+        self._lock = threading.Lock()
+        self.counts = {}  # {action: {outcome: count}}
+    
+    def record(self, action, outcome):
+        """記錄一次解析結果
+        
+        Args:
+            action (str): 行動類型
+            outcome (str): 解析結果
+        """
+        with self._lock:
+            counts = self.counts.setdefault(action, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] = counts.get(outcome, 0) + 1
+    
+    def failure_rate(self, action=None):
+        """模型調用中解析失敗（需要隨機兜底）的比例
+        
+        Args:
+            action (str, optional): 行動類型，為 None 時統計全部行動
+            
+        Returns:
+            float: 失敗比例
+        """
+        with self._lock:
+            rows = [self.counts.get(action)] if action else list(self.counts.values())
+            rows = [row for row in rows if row]
+            total = sum(sum(row.values()) - row.get("forced", 0) for row in rows)
+            failed = sum(row["illegal"] + row["missing"] + row["error"] for row in rows)
+        return failed / total if total else 0.0
+    
+    def to_dict(self):
+        """轉換為字典
+        
+        Returns:
+            dict: {action: {outcome: count, "failure_rate": rate}}
+        """
+        with self._lock:
+            actions = list(self.counts)
+            snapshot = {action: dict(self.counts[action]) for action in actions}
+        for action in actions:
+            snapshot[action]["failure_rate"] = round(self.failure_rate(action), 4)
+        return snapshot
+
+
+# 進程內共用的行動輸出統計
+action_output_stats = ActionOutputStats()
@@ -1,8 +1,25 @@
+import copy
+import random
 from abc import ABC, abstractmethod
 
+from models import tracing
+
+from . import action_output
+from .action_output import action_output_stats
+from .memory import EventMemory, RECENT_EVENTS, BELIEF_RECENT_EVENTS
+from .prompt_builder import PromptBuilder
+
+# 提示中逐行列出（帶名稱）的玩家數上限，超過時只列出玩家ID（大廳模式）
+PLAYER_LIST_LIMIT = 20
+
+# 提示中保留的今天最近發言數，更早的發言只計數（大廳模式下每天有上百條發言）
+DISCUSSION_LIMIT = 30
+
 class BaseRole(ABC):
     """所有遊戲角色的基本類別"""
     
+    _history_shared = False  # 遊戲歷史和事件索引是否與分支共享（追加前需要先複製）
+    
     def __init__(self, player_id, name=None):
         """初始化角色
         
@@ -16,6 +33,8 @@ class BaseRole(ABC):
         self.role_name = "未知"  # 將由子類覆蓋
         self.team = "未知"  # 將由子類覆蓋（村民陣營或狼人陣營）
         self.game_history = []  # 記錄游戲歷史
+        self.memory = EventMemory()  # 遊戲歷史的檢索索引
+        self.prompt_builder = PromptBuilder()  # 按區段緩存的提示詞構建器
     
     def add_history(self, event):
         """添加事件到遊戲歷史記錄
@@ -23,7 +42,26 @@ class BaseRole(ABC):
         Args:
             event (str): 遊戲事件描述
         """
+        if self._history_shared:
+            self.game_history = list(self.game_history)
+            self.memory = self.memory.copy()
+            self._history_shared = False
         self.game_history.append(event)
+        self.memory.add(event)
+    
+    def fork(self):
+        """創建角色的分支副本（見 GameState.fork）
+        
+        遊戲歷史和事件索引在任一方追加新事件之前保持共享；提示詞緩存不共享，
+        因為不同分支的狀態版本號會重複。
+        
+        Returns:
+            BaseRole: 副本
+        """
+        clone = copy.copy(self)
+        clone.prompt_builder = PromptBuilder()
+        self._history_shared = clone._history_shared = True
+        return clone
     
     def get_status(self):
         """獲取角色狀態
@@ -80,30 +118,85 @@ class BaseRole(ABC):
         if not alive_players:
             return None
         
-        # 構建投票提示
-        prompt = self._build_vote_prompt(game_state, alive_players)
-        
         # 使用 API 獲取決策
         system_message = f"你是一名狼人殺遊戲中的{self.role_name}角色，名字是{self.name}。請根據遊戲情況做出投票決策。"
-        response = await api_handler.get_response(prompt, system_message)
+        legal_ids = [p["player_id"] for p in alive_players]
+        return await self._decide_target("vote", game_state, api_handler, legal_ids, system_message,
+                                         lambda: self._build_vote_prompt(game_state, alive_players))
+    
+    async def _decide_target(self, action, game_state, api_handler, legal_ids, system_message, build_prompt):
+        """選擇一個目標玩家，並驗證其在合法目標集合中
+        
+        只有一個合法目標時直接返回；規則玩家（提供 choose_target 的處理程序）直接決策，不構建提示。
+        模型在結構化模式下使用較小的 max_tokens 和停止序列；解析失敗時從合法目標中
+        隨機選擇，並記錄到 action_output_stats。
+        
+        Args:
+            action (str): 行動類型（check、attack、vote）
+            game_state (dict): 當前遊戲狀態
+            api_handler: API 處理程序
+            legal_ids (list): 合法的目標玩家 ID
+            system_message (str): 系統消息
+            build_prompt (callable): 無參數函數，返回 (穩定前綴, 易變後綴)
+            
+        Returns:
+            int: 目標玩家 ID，沒有合法目標時為 None
+        """
+        if not legal_ids:
+            return None
+        
+        # 只有一個合法目標時不需要調用模型
+        if len(legal_ids) == 1:
+            action_output_stats.record(action, "forced")
+            return legal_ids[0]
+        
+        if hasattr(api_handler, "choose_target"):
+            target_id = api_handler.choose_target(self, action, legal_ids, game_state)
+            return target_id if target_id in legal_ids else self._fallback_rng(api_handler).choice(legal_ids)
         
-        # 解析響應以獲取投票的玩家 ID
         try:
-            # 嘗試找到數字ID引用
-            import re
-            vote_ids = re.findall(r'玩家(\d+)', response)
-            if vote_ids:
-                vote_id = int(vote_ids[0])
-                # 確保是有效的存活玩家
-                if any(p["player_id"] == vote_id and p["is_alive"] for p in game_state["players"]):
-                    return vote_id
+            with tracing.span("build_prompt", action=action):
+                prompt_prefix, prompt = build_prompt()
+            response = await api_handler.get_response(prompt, system_message, prompt_prefix=prompt_prefix,
+                                                      **action_output.request_options(action))
+            target_id, outcome = action_output.parse_target(response, set(legal_ids))
+        except Exception:
+            target_id, outcome = None, "error"
+        
+        action_output_stats.record(action, outcome)
+        
+        # 如果沒有找到有效的ID，隨機選擇一個
+        if target_id is None:
+            target_id = self._fallback_rng(api_handler).choice(legal_ids)
+        return target_id
+    
+    @staticmethod
+    def _fallback_rng(api_handler):
+        """隨機選擇目標時使用的隨機數生成器：處理程序有自己的 rng（替身和規則玩家，可設定種子）時使用它，
+        以免同時進行的多局遊戲互相影響隨機序列；否則使用全局的 random"""
+        return getattr(api_handler, "rng", None) or random
+    
+    async def _speak(self, game_state, api_handler, system_message, build_prompt, temperature=0.7, max_tokens=300):
+        """生成白天發言，規則玩家（提供 compose_speech 的處理程序）不構建提示
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            api_handler: API 處理程序
+            system_message (str): 系統消息
+            build_prompt (callable): 無參數函數，返回 (穩定前綴, 易變後綴)
+            temperature (float, optional): 溫度參數。默認為 0.7
+            max_tokens (int, optional): 最大生成標記數。默認為 300
             
-            # 如果沒有找到有效的ID，隨機選擇一個
-            import random
-            return random.choice(alive_players)["player_id"]
-        except Exception as e:
-            # 出錯時返回第一個存活玩家
-            return alive_players[0]["player_id"]
+        Returns:
+            str: 討論發言
+        """
+        if hasattr(api_handler, "compose_speech"):
+            return api_handler.compose_speech(self, game_state)
+        
+        with tracing.span("build_prompt", action="speech"):
+            prompt_prefix, prompt = build_prompt()
+        return await api_handler.get_response(prompt, system_message, temperature=temperature, max_tokens=max_tokens,
+                                              prompt_prefix=prompt_prefix)
     
     def _build_vote_prompt(self, game_state, alive_players):
         """構建投票提示
@@ -113,25 +206,147 @@ class BaseRole(ABC):
             alive_players (list): 存活玩家列表
             
         Returns:
-            str: 投票提示
+            tuple: (穩定前綴, 易變後綴)
+        """
+        version = game_state.get("version")
+        
+        stable = [
+            f"角色資訊：\n- 你是{self.role_name}\n",
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "狼人 懷疑 查驗 投票"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天，需要進行投票。\n",
+            self._discussion_section(game_state, always=True),
+            self.prompt_builder.section("vote_targets", version, lambda: (
+                "\n請投票選擇你認為最可能是狼人的玩家，僅回答玩家ID即可。可選的玩家：\n"
+                + self._player_list(alive_players)
+            )),
+            "\n" + action_output.answer_instruction("vote")
+        ]
+        
+        return self.prompt_builder.compose(stable, volatile)
+    
+    def _player_list(self, players, note=None):
+        """可選玩家列表，人數較少時逐行列出名稱，超過 PLAYER_LIST_LIMIT 時只列出ID，
+        提示長度不隨大廳人數成倍增長
+        
+        Args:
+            players (iterable): 玩家條目
+            note (callable, optional): 返回某名玩家的附加說明（例如「已查驗過」），沒有時返回空字符串
+            
+        Returns:
+            str: 列表文本
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天，需要進行投票。\n\n"
+        players = list(players)
+        note = note or (lambda player: "")
+        if len(players) <= PLAYER_LIST_LIMIT:
+            return "".join(f"- 玩家{p['player_id']}（{p['name']}）{note(p)}\n" for p in players)
+        return f"共{len(players)}人：" + "、".join(f"玩家{p['player_id']}{note(p)}" for p in players) + "\n"
+    
+    def _recent_window(self, game_state):
+        """提示中保留的最近事件數量，有身份推斷摘要時使用較短的窗口
         
-        # 添加遊戲歷史
-        prompt += "遊戲歷史：\n"
-        for event in self.game_history[-10:]:  # 只使用最近的10個事件
-            prompt += f"- {event}\n"
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            int: 事件數量
+        """
+        return BELIEF_RECENT_EVENTS if game_state.get("belief_summary") else RECENT_EVENTS
+    
+    def _history_section(self, game_state):
+        """最近遊戲歷史區段，只在歷史增加時重新渲染
         
-        # 添加今天的討論
-        prompt += "\n今天的討論：\n"
-        for discussion in game_state["current_discussions"]:
-            prompt += f"- {discussion['player_name']}（玩家{discussion['player_id']}）說：「{discussion['content']}」\n"
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            str: 區段文本
+        """
+        window = self._recent_window(game_state)
+        return self.prompt_builder.section("history", (len(self.game_history), window), lambda: (
+            "\n遊戲歷史：\n" + "".join(f"- {event}\n" for event in self.game_history[-window:])
+        ))
+    
+    def _relevant_history_section(self, game_state, focus):
+        """較早的相關事件區段，從最近窗口之外的歷史中檢索與當前決策相關的事件
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            focus (str): 描述當前決策關注點的關鍵詞
+            
+        Returns:
+            str: 區段文本，沒有較早事件時為空
+        """
+        older_count = len(self.game_history) - self._recent_window(game_state)
+        if older_count <= 0:
+            return ""
         
-        # 添加投票指示
-        prompt += "\n請投票選擇你認為最可能是狼人的玩家，僅回答玩家ID即可。可選的玩家：\n"
-        for player in alive_players:
-            prompt += f"- 玩家{player['player_id']}（{player['name']}）\n"
+        # 查詢由決策關注點和今天最近的發言組成
+        recent_discussions = game_state["current_discussions"][-6:]
+        query = focus + " " + " ".join(d["content"] for d in recent_discussions)
         
-        prompt += "\n請分析並做出決策，回答格式：'我投票給玩家X'，其中X是玩家ID。"
+        def render():
+            indexes = self.memory.search(query, before=older_count)
+            if not indexes:
+                return ""
+            return "\n較早的相關事件：\n" + "".join(f"- {self.game_history[i]}\n" for i in indexes)
+        
+        return self.prompt_builder.section("relevant_history", (len(self.game_history), query), render)
+    
+    def _belief_section(self, game_state):
+        """身份推斷區段（由信念矩陣生成的各角色概率摘要）
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            str: 區段文本，沒有摘要時為空
+        """
+        summary = game_state.get("belief_summary")
+        if not summary:
+            return ""
+        return "\n身份推斷（根據查驗、死亡身份和投票記錄估計）：\n" + summary
+    
+    def _situation_section(self, game_state):
+        """遊戲現狀區段（存活人數和昨晚死亡）
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            str: 區段文本
+        """
+        _, alive_ids = self.prompt_builder.player_index(game_state)
+        return self.prompt_builder.section("situation", game_state.get("version"), lambda: (
+            "遊戲現狀：\n"
+            f"- 存活玩家：{len(alive_ids)}人\n"
+            f"- 昨晚死亡：{game_state['last_night_deaths'] or '無'}\n"
+        ))
+    
+    def _discussion_section(self, game_state, always=False):
+        """今天討論區段，只保留最近 DISCUSSION_LIMIT 條發言，只在有新發言時重新渲染
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            always (bool, optional): 沒有發言時是否仍輸出標題。默認為 False
+            
+        Returns:
+            str: 區段文本
+        """
+        discussions = game_state["current_discussions"]
+        if not discussions and not always:
+            return ""
         
-        return prompt
+        version = game_state.get("version")
+        key = (version, len(discussions)) if version is not None else None
+        omitted = max(0, len(discussions) - DISCUSSION_LIMIT)
+        return self.prompt_builder.section("discussion", key, lambda: (
+            "\n今天的討論：\n"
+            + (f"（較早的{omitted}條發言已省略）\n" if omitted else "")
+            + "".join(
+                f"- {d['player_name']}（玩家{d['player_id']}）說：「{d['content']}」\n" for d in discussions[omitted:]
+            )
+        ))
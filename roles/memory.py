@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter
+
+# 提示中固定保留的最近事件數量
+RECENT_EVENTS = 8
+
+# 有身份推斷摘要時保留的最近事件數量（摘要已概括了較早的查驗、死亡和投票）
+BELIEF_RECENT_EVENTS = 4
+
+# 從較早歷史中檢索的相關事件數量
+RELEVANT_EVENTS = 4
+
+# 遊戲中有特別意義的詞，整詞作為索引標記
+KEYWORDS = ("預言家", "狼人", "好人", "村民", "查驗", "放逐", "投票", "殺死", "攻擊", "平票", "懷疑", "身份")
+
+_PLAYER_PATTERN = re.compile(r'玩家(\d+)')
+_DAY_PATTERN = re.compile(r'第(\d+)天')
+_CJK_PATTERN = re.compile(r'[一-鿿]+')
+
+
+def tokenize(text):
+    """將文本切分為索引標記
+    
+    標記包括：玩家引用（p:3）、天數（d:2）、關鍵詞，以及中文字的二元組。
+    
+    Args:
+        text (str): 文本
+        
+    Returns:
+        list: 標記列表
+    """
+    if not text:
+        return []
+    tokens = [f"p:{pid}" for pid in _PLAYER_PATTERN.findall(text)]
+    tokens.extend(f"d:{day}" for day in _DAY_PATTERN.findall(text))
+    tokens.extend(keyword for keyword in KEYWORDS if keyword in text)
+    for run in _CJK_PATTERN.findall(_PLAYER_PATTERN.sub(" ", text)):
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class EventMemory:
+    """玩家可見事件的詞法索引，用 BM25 檢索與當前決策相關的較早事件"""
+    
+    def __init__(self, k1=1.2, b=0.75):
+        """初始化事件記憶
+        
+        Args:
+            k1 (float, optional): BM25 詞頻飽和參數。默認為 1.2
+            b (float, optional): BM25 長度歸一化參數。默認為 0.75
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # 倒排索引 {token: [(event_index, term_frequency)]}
+        self._lengths = []  # 每個事件的標記數
+        self._total_length = 0
+    
+    def __len__(self):
+        """已索引的事件數量"""
+        return len(self._lengths)
+    
+    def add(self, event):
+        """索引一個新事件（事件按添加順序編號）
+        
+        Args:
+            event (str): 事件描述
+        """
+        index = len(self._lengths)
+        counts = Counter(tokenize(event))
+        for token, tf in counts.items():
+            self._postings.setdefault(token, []).append((index, tf))
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+    
+    def copy(self):
+        """複製索引，副本可以獨立添加事件
+        
+        Returns:
+            EventMemory: 副本
+        """
+        clone = EventMemory(self.k1, self.b)
+        clone._postings = {token: list(postings) for token, postings in self._postings.items()}
+        clone._lengths = list(self._lengths)
+        clone._total_length = self._total_length
+        return clone
+    
+    def search(self, query, k=RELEVANT_EVENTS, before=None):
+        """檢索與查詢最相關的事件
+        
+        Args:
+            query (str): 查詢文本
+            k (int, optional): 返回的事件數量。默認為 RELEVANT_EVENTS
+            before (int, optional): 只檢索編號小於此值的事件。默認為全部
+            
+        Returns:
+            list: 事件編號列表，按時間順序排列
+        """
+        count = len(self._lengths) if before is None else min(before, len(self._lengths))
+        if count <= 0 or k <= 0:
+            return []
+        
+        average_length = self._total_length / len(self._lengths) or 1.0
+        scores = {}
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self._lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings:
+                if index >= count:
+                    break
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / average_length)
+                scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        
+        # 同分時偏好較新的事件
+        best = sorted(scores, key=lambda index: (scores[index], index), reverse=True)[:k]
+        return sorted(best)
@@ -0,0 +1,75 @@
+class PromptBuilder:
+    """按區段緩存的提示詞構建器（每個玩家一個實例）
+    
+    提示詞被拆分為多個區段，每個區段都帶有一個依賴鍵（通常由遊戲狀態版本號
+    或歷史長度組成）。只有當依賴鍵改變時才會重新渲染該區段，其餘區段直接
+    重用上次的渲染結果。
+    
+    穩定的區段（角色規則、隊友、查驗結果、遊戲歷史）排在前面組成前綴，
+    易變的區段（當前階段、討論、指示）排在後面，這樣同一玩家連續的請求會
+    共享相同的前綴，適合服務商側的提示詞緩存。
+    """
+    
+    def __init__(self):
+        """初始化提示詞構建器"""
+        self._sections = {}  # 已渲染的區段 {section_name: (key, text)}
+        self._index = (None, {}, frozenset())  # 玩家索引 (version, players_by_id, alive_ids)
+        self.hits = 0  # 區段緩存命中次數
+        self.misses = 0  # 區段重新渲染次數
+    
+    def section(self, name, key, render):
+        """獲取一個區段的文本，依賴鍵未改變時直接返回緩存
+        
+        Args:
+            name (str): 區段名稱
+            key: 區段的依賴鍵，為 None 時總是重新渲染
+            render (callable): 無參數的渲染函數，返回區段文本
+            
+        Returns:
+            str: 區段文本
+        """
+        cached = self._sections.get(name)
+        if key is not None and cached is not None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+        
+        text = render()
+        self._sections[name] = (key, text)
+        self.misses += 1
+        return text
+    
+    def player_index(self, game_state):
+        """獲取玩家索引，按遊戲狀態版本緩存
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            tuple: (players_by_id, alive_ids)，分別為 {player_id: player} 和存活玩家 ID 集合
+        """
+        version = game_state.get("version")
+        if version is None or version != self._index[0]:
+            players_by_id = {p["player_id"]: p for p in game_state["players"]}
+            alive_ids = frozenset(pid for pid, p in players_by_id.items() if p["is_alive"])
+            self._index = (version, players_by_id, alive_ids)
+        return self._index[1], self._index[2]
+    
+    def compose(self, stable, volatile):
+        """拼接提示詞，穩定區段組成前綴，易變區段組成後綴
+        
+        前綴與後綴分開返回，由 API 處理程序決定如何標記可緩存的部分
+        （例如 Anthropic 的 cache_control）。完整提示詞為 prefix + suffix。
+        
+        Args:
+            stable (list): 穩定區段文本列表
+            volatile (list): 易變區段文本列表
+            
+        Returns:
+            tuple: (prefix, suffix)
+        """
+        return "".join(stable), "".join(volatile)
+    
+    def invalidate(self):
+        """清除所有緩存的區段"""
+        self._sections.clear()
+        self._index = (None, {}, frozenset())
@@ -1,3 +1,4 @@
+from . import action_output
 from .base_role import BaseRole
 
 class Seer(BaseRole):
@@ -15,6 +16,12 @@ class Seer(BaseRole):
         self.team = "村民陣營"
         self.checked_players = {}  # 已查驗的玩家 {player_id: result}
     
+    def fork(self):
+        """創建分支副本，查驗記錄單獨複製"""
+        clone = super().fork()
+        clone.checked_players = dict(self.checked_players)
+        return clone
+    
     async def night_action(self, game_state, api_handler):
         """夜晚行動 - 查驗一名玩家的身份
         
@@ -25,56 +32,30 @@ class Seer(BaseRole):
         Returns:
             dict: 行動結果，包含目標玩家 ID 和查驗結果
         """
-        # 構建夜間行動提示
-        prompt = self._build_night_action_prompt(game_state)
-        
         # 使用 API 獲取決策
         system_message = f"""你是一名狼人殺遊戲中的預言家角色，名字是{self.name}。
 現在是夜晚，你需要選擇一名玩家進行查驗，了解他是否是狼人。
 作為預言家，你應該選擇最有價值的目標進行查驗。"""
         
-        response = await api_handler.get_response(prompt, system_message)
+        valid_targets = [p for p in game_state["players"]
+                         if p["is_alive"] and p["player_id"] != self.player_id]
+        if not valid_targets:
+            return {"action": "wait", "target": None, "result": "無有效目標"}
         
-        # 解析響應以獲取目標玩家 ID
         try:
-            # 嘗試找到數字ID引用
-            import re
-            target_ids = re.findall(r'玩家(\d+)', response)
-            if target_ids:
-                target_id = int(target_ids[0])
-                # 確保是有效的存活玩家且不是自己
-                valid_targets = [p for p in game_state["players"] 
-                               if p["is_alive"] and p["player_id"] != self.player_id]
-                if any(p["player_id"] == target_id for p in valid_targets):
-                    # 獲取查驗結果
-                    target_player = next((p for p in game_state["players"] if p["player_id"] == target_id), None)
-                    if target_player:
-                        is_werewolf = target_player.get("role") == "werewolf"
-                        result = "狼人" if is_werewolf else "好人"
-                        
-                        # 記錄查驗結果
-                        self.checked_players[target_id] = result
-                        
-                        return {"action": "check", "target": target_id, "result": result}
+            target_id = await self._decide_target("check", game_state, api_handler,
+                                                  [p["player_id"] for p in valid_targets], system_message,
+                                                  lambda: self._build_night_action_prompt(game_state))
+            target = next(p for p in valid_targets if p["player_id"] == target_id)
             
-            # 如果沒有找到有效的ID，隨機選擇一個
-            import random
-            valid_targets = [p for p in game_state["players"] 
-                           if p["is_alive"] and p["player_id"] != self.player_id]
-            if valid_targets:
-                target = random.choice(valid_targets)
-                target_id = target["player_id"]
-                
-                # 獲取查驗結果
-                is_werewolf = target.get("role") == "werewolf"
-                result = "狼人" if is_werewolf else "好人"
-                
-                # 記錄查驗結果
-                self.checked_players[target_id] = result
-                
-                return {"action": "check", "target": target_id, "result": result}
-                
-            return {"action": "wait", "target": None, "result": "無有效目標"}
+            # 獲取查驗結果
+            is_werewolf = target.get("role") == "werewolf"
+            result = "狼人" if is_werewolf else "好人"
+            
+            # 記錄查驗結果
+            self.checked_players[target_id] = result
+            
+            return {"action": "check", "target": target_id, "result": result}
         except Exception as e:
             # 出錯時返回等待
             return {"action": "wait", "target": None, "result": f"錯誤：{str(e)}"}
@@ -89,17 +70,14 @@ class Seer(BaseRole):
         Returns:
             str: 討論發言
         """
-        # 構建討論提示
-        prompt = self._build_discussion_prompt(game_state)
-        
         # 使用 API 獲取發言
         system_message = f"""你是一名狼人殺遊戲中的預言家角色，名字是{self.name}。
 你的目標是幫助村民找出狼人並獲勝。
 作為預言家，你掌握著重要信息，但要小心狼人可能會針對你。
 在適當的時機公布你的身份和查驗結果可以幫助村民，但也可能使你成為狼人的目標。"""
         
-        response = await api_handler.get_response(prompt, system_message, temperature=0.7, max_tokens=300)
-        return response
+        return await self._speak(game_state, api_handler, system_message,
+                                 lambda: self._build_discussion_prompt(game_state), temperature=0.7)
     
     def _build_night_action_prompt(self, game_state):
         """構建夜間行動提示
@@ -108,37 +86,30 @@ class Seer(BaseRole):
             game_state (dict): 當前遊戲狀態
             
         Returns:
-            str: 夜間行動提示
+            tuple: (穩定前綴, 易變後綴)
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天夜晚，預言家行動階段。\n\n"
-        
-        # 添加遊戲現狀
-        prompt += "遊戲現狀：\n"
-        prompt += f"- 你是預言家，可以查驗一名玩家的身份（是否為狼人）\n"
-        
-        # 添加已查驗的玩家
-        if self.checked_players:
-            prompt += "- 你已經查驗過的玩家：\n"
-            for player_id, result in self.checked_players.items():
-                player = next((p for p in game_state["players"] if p["player_id"] == player_id), None)
-                if player:
-                    prompt += f"  - 玩家{player_id}（{player['name']}）：{result}\n"
-        
-        # 添加可選目標
-        prompt += "\n可選的查驗目標：\n"
-        for player in game_state["players"]:
-            if player["is_alive"] and player["player_id"] != self.player_id:
-                already_checked = player["player_id"] in self.checked_players
-                prompt += f"- 玩家{player['player_id']}（{player['name']}）{' - 已查驗過' if already_checked else ''}\n"
-        
-        # 添加遊戲歷史上下文
-        prompt += "\n遊戲歷史：\n"
-        for event in self.game_history[-10:]:  # 只使用最近的10個事件
-            prompt += f"- {event}\n"
-        
-        prompt += "\n請選擇一名玩家進行查驗。考慮誰的行為最可疑，或是誰最可能影響遊戲局勢。回答格式：'我選擇查驗玩家X'，其中X是玩家ID。"
-        
-        return prompt
+        builder = self.prompt_builder
+        _, alive_ids = builder.player_index(game_state)
+        
+        stable = [
+            "角色資訊：\n- 你是預言家，可以查驗一名玩家的身份（是否為狼人）\n",
+            self._checked_players_section(game_state),
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "狼人 可疑 查驗 投票"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天夜晚，預言家行動階段。\n",
+            builder.section("check_targets", (game_state.get("version"), len(self.checked_players)), lambda: (
+                "\n可選的查驗目標：\n" + self._player_list(
+                    (p for p in game_state["players"] if p["player_id"] in alive_ids and p["player_id"] != self.player_id),
+                    lambda p: " - 已查驗過" if p["player_id"] in self.checked_players else ""
+                )
+            )),
+            "\n" + action_output.answer_instruction("check", "請選擇一名玩家進行查驗。考慮誰的行為最可疑，或是誰最可能影響遊戲局勢。")
+        ]
+        
+        return builder.compose(stable, volatile)
     
     def _build_discussion_prompt(self, game_state):
         """構建討論提示
@@ -147,38 +118,47 @@ class Seer(BaseRole):
             game_state (dict): 當前遊戲狀態
             
         Returns:
-            str: 討論提示
+            tuple: (穩定前綴, 易變後綴)
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n"
+        stable = [
+            "角色資訊：\n- 你是預言家，掌握著重要信息\n",
+            self._checked_players_section(game_state),
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "查驗 狼人 好人 投票"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n",
+            self._situation_section(game_state),
+            self._discussion_section(game_state),
+            "\n請以第一人稱發表你的看法和分析。你需要考慮是否現在公開自己的預言家身份並分享查驗結果，或者先觀察一下局勢。你的目標是幫助村民找出狼人，同時避免自己過早被狼人盯上。"
+        ]
+        
+        return self.prompt_builder.compose(stable, volatile)
+    
+    def _checked_players_section(self, game_state):
+        """已查驗玩家區段，只在查驗結果或存活狀態改變時重新渲染
         
-        # 添加遊戲現狀
-        prompt += "遊戲現狀：\n"
-        prompt += f"- 存活玩家：{len([p for p in game_state['players'] if p['is_alive']])}人\n"
-        prompt += f"- 昨晚死亡：{game_state['last_night_deaths'] or '無'}\n"
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            str: 區段文本
+        """
+        if not self.checked_players:
+            return ""
         
-        # 添加預言家信息
-        prompt += "- 你是預言家，掌握著重要信息\n"
+        players_by_id, alive_ids = self.prompt_builder.player_index(game_state)
+        checked_alive = tuple(pid in alive_ids for pid in self.checked_players)
+        key = (len(self.checked_players), checked_alive)
         
-        # 添加已查驗的玩家
-        if self.checked_players:
-            prompt += "- 你已經查驗過的玩家：\n"
+        def render():
+            lines = ["- 你已經查驗過的玩家：\n"]
             for player_id, result in self.checked_players.items():
-                player = next((p for p in game_state["players"] if p["player_id"] == player_id), None)
+                player = players_by_id.get(player_id)
                 if player:
-                    is_alive = "存活" if player["is_alive"] else "已死亡"
-                    prompt += f"  - 玩家{player_id}（{player['name']}）：{result}，現在{is_alive}\n"
-        
-        # 添加遊戲歷史
-        prompt += "\n遊戲歷史：\n"
-        for event in self.game_history[-15:]:  # 只使用最近的15個事件
-            prompt += f"- {event}\n"
-        
-        # 添加今天已有的討論
-        if game_state["current_discussions"]:
-            prompt += "\n今天的討論：\n"
-            for discussion in game_state["current_discussions"]:
-                prompt += f"- {discussion['player_name']}（玩家{discussion['player_id']}）說：「{discussion['content']}」\n"
-        
-        prompt += "\n請以第一人稱發表你的看法和分析。你需要考慮是否現在公開自己的預言家身份並分享查驗結果，或者先觀察一下局勢。你的目標是幫助村民找出狼人，同時避免自己過早被狼人盯上。"
+                    is_alive = "存活" if player_id in alive_ids else "已死亡"
+                    lines.append(f"  - 玩家{player_id}（{player['name']}）：{result}，現在{is_alive}\n")
+            return "".join(lines)
         
-        return prompt
+        return self.prompt_builder.section("checked_players", key, render)
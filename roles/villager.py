@@ -36,16 +36,13 @@ class Villager(BaseRole):
         Returns:
             str: 討論發言
         """
-        # 構建討論提示
-        prompt = self._build_discussion_prompt(game_state)
-        
         # 使用 API 獲取發言
         system_message = f"""你是一名狼人殺遊戲中的村民角色，名字是{self.name}。
 你的目標是找出潛藏的狼人並幫助村民陣營獲勝。
 在討論中要注意觀察其他玩家的行為和發言。"""
         
-        response = await api_handler.get_response(prompt, system_message, temperature=0.7, max_tokens=300)
-        return response
+        return await self._speak(game_state, api_handler, system_message,
+                                 lambda: self._build_discussion_prompt(game_state), temperature=0.7)
     
     def _build_discussion_prompt(self, game_state):
         """構建討論提示
@@ -54,26 +51,19 @@ class Villager(BaseRole):
             game_state (dict): 當前遊戲狀態
             
         Returns:
-            str: 討論提示
+            tuple: (穩定前綴, 易變後綴)
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n"
-        
-        # 添加遊戲現狀
-        prompt += "遊戲現狀：\n"
-        prompt += f"- 存活玩家：{len([p for p in game_state['players'] if p['is_alive']])}人\n"
-        prompt += f"- 昨晚死亡：{game_state['last_night_deaths'] or '無'}\n"
-        
-        # 添加遊戲歷史
-        prompt += "\n遊戲歷史：\n"
-        for event in self.game_history[-15:]:  # 只使用最近的15個事件
-            prompt += f"- {event}\n"
-        
-        # 添加今天已有的討論
-        if game_state["current_discussions"]:
-            prompt += "\n今天的討論：\n"
-            for discussion in game_state["current_discussions"]:
-                prompt += f"- {discussion['player_name']}（玩家{discussion['player_id']}）說：「{discussion['content']}」\n"
-        
-        prompt += "\n請以第一人稱發表你的看法和分析，試圖找出狼人。你的發言應該包括你對其他玩家的觀察和你認為誰可能是狼人的猜測。"
+        stable = [
+            "角色資訊：\n- 你是村民，沒有特殊技能\n",
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "狼人 懷疑 投票 查驗"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n",
+            self._situation_section(game_state),
+            self._discussion_section(game_state),
+            "\n請以第一人稱發表你的看法和分析，試圖找出狼人。你的發言應該包括你對其他玩家的觀察和你認為誰可能是狼人的猜測。"
+        ]
         
-        return prompt
+        return self.prompt_builder.compose(stable, volatile)
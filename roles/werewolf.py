@@ -1,3 +1,4 @@
+from . import action_output
 from .base_role import BaseRole
 
 class Werewolf(BaseRole):
@@ -14,14 +15,20 @@ class Werewolf(BaseRole):
         self.role_name = "狼人"
         self.team = "狼人陣營"
         self.teammates = []  # 其他狼人隊友的ID列表
+        self.pack = 0  # 所屬狼群
+        self.pack_count = 1  # 場上的狼群數量
     
-    def set_teammates(self, teammate_ids):
+    def set_teammates(self, teammate_ids, pack=0, pack_count=1):
         """設置狼人隊友
         
         Args:
-            teammate_ids (list): 其他狼人的 ID 列表
+            teammate_ids (list): 同一狼群其他狼人的 ID 列表
+            pack (int, optional): 所屬狼群。默認為 0
+            pack_count (int, optional): 場上的狼群數量。默認為 1
         """
         self.teammates = teammate_ids
+        self.pack = pack
+        self.pack_count = pack_count
     
     async def night_action(self, game_state, api_handler):
         """夜晚行動 - 選擇一名玩家攻擊
@@ -33,41 +40,24 @@ class Werewolf(BaseRole):
         Returns:
             dict: 行動結果，包含目標玩家 ID
         """
-        # 只有當狼群中的首領狼人才能做出決定
+        # 只有狼群中的首領狼人才能做出決定
         if not self._is_alpha_werewolf(game_state):
             return {"action": "wait", "target": None, "result": None}
         
-        # 構建夜間行動提示
-        prompt = self._build_night_action_prompt(game_state)
-        
         # 使用 API 獲取決策
         system_message = f"""你是一名狼人殺遊戲中的狼人角色，名字是{self.name}。
 現在是夜晚，你需要選擇一名玩家進行攻擊。
 作為狼人首領，你要做出最有利於狼人陣營的決策。"""
         
-        response = await api_handler.get_response(prompt, system_message)
+        valid_targets = [p["player_id"] for p in game_state["players"]
+                         if p["is_alive"] and p["player_id"] not in [self.player_id] + self.teammates]
+        if not valid_targets:
+            return {"action": "wait", "target": None, "result": "無有效目標"}
         
-        # 解析響應以獲取目標玩家 ID
         try:
-            # 嘗試找到數字ID引用
-            import re
-            target_ids = re.findall(r'玩家(\d+)', response)
-            if target_ids:
-                target_id = int(target_ids[0])
-                # 確保是有效的存活玩家且不是狼人
-                valid_targets = [p for p in game_state["players"] 
-                               if p["is_alive"] and p["player_id"] not in [self.player_id] + self.teammates]
-                if any(p["player_id"] == target_id for p in valid_targets):
-                    return {"action": "attack", "target": target_id, "result": None}
-            
-            # 如果沒有找到有效的ID，隨機選擇一個
-            import random
-            valid_targets = [p for p in game_state["players"] 
-                           if p["is_alive"] and p["player_id"] not in [self.player_id] + self.teammates]
-            if valid_targets:
-                target = random.choice(valid_targets)
-                return {"action": "attack", "target": target["player_id"], "result": None}
-            return {"action": "wait", "target": None, "result": "無有效目標"}
+            target_id = await self._decide_target("attack", game_state, api_handler, valid_targets, system_message,
+                                                  lambda: self._build_night_action_prompt(game_state))
+            return {"action": "attack", "target": target_id, "result": None}
         except Exception as e:
             # 出錯時返回等待
             return {"action": "wait", "target": None, "result": f"錯誤：{str(e)}"}
@@ -82,20 +72,17 @@ class Werewolf(BaseRole):
         Returns:
             str: 討論發言
         """
-        # 構建討論提示
-        prompt = self._build_discussion_prompt(game_state)
-        
         # 使用 API 獲取發言
         system_message = f"""你是一名狼人殺遊戲中的狼人角色，名字是{self.name}，正在偽裝成村民。
 你的目標是生存並消滅所有村民。
 記住，你必須偽裝成村民，不要暴露自己是狼人。
 試著指控其他無辜的村民，保護自己和狼人同伴。"""
         
-        response = await api_handler.get_response(prompt, system_message, temperature=0.9, max_tokens=300)
-        return response
+        return await self._speak(game_state, api_handler, system_message,
+                                 lambda: self._build_discussion_prompt(game_state), temperature=0.9)
     
     def _is_alpha_werewolf(self, game_state):
-        """判斷是否是首領狼人（狼群中ID最小的存活狼人）
+        """判斷是否是首領狼人（自己狼群中ID最小的存活狼人，每個狼群各有一名首領）
         
         Args:
             game_state (dict): 當前遊戲狀態
@@ -103,10 +90,51 @@ class Werewolf(BaseRole):
         Returns:
             bool: 是否是首領狼人
         """
-        alive_werewolves = [self.player_id] + [wid for wid in self.teammates 
-                                            if any(p["player_id"] == wid and p["is_alive"] 
-                                                 for p in game_state["players"])]
-        return self.player_id == min(alive_werewolves) if alive_werewolves else False
+        alive_werewolves = [self.player_id] + self._alive_teammates(game_state)
+        return self.player_id == min(alive_werewolves)
+    
+    def _alive_teammates(self, game_state):
+        """獲取存活的狼人同伴
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            list: 存活的狼人同伴 ID 列表
+        """
+        _, alive_ids = self.prompt_builder.player_index(game_state)
+        return [tid for tid in self.teammates if tid in alive_ids]
+    
+    def _teammates_section(self, game_state):
+        """狼人同伴區段，只在同伴存活狀態改變時重新渲染
+        
+        Args:
+            game_state (dict): 當前遊戲狀態
+            
+        Returns:
+            str: 區段文本
+        """
+        alive_teammates = self._alive_teammates(game_state)
+        if not alive_teammates:
+            return ""
+        
+        players_by_id, _ = self.prompt_builder.player_index(game_state)
+        return self.prompt_builder.section("teammates", tuple(alive_teammates), lambda: (
+            "- 你的狼人同伴：\n" + "".join(
+                f"  - 玩家{tid}（{players_by_id[tid]['name']}）\n" for tid in alive_teammates if tid in players_by_id
+            )
+        ))
+    
+    def _packs_section(self):
+        """多個狼群時說明其他狼群的存在
+        
+        Returns:
+            str: 區段文本，只有一個狼群時為空
+        """
+        if self.pack_count <= 1:
+            return ""
+        return (f"- 場上共有{self.pack_count}個互不相識的狼群，各自在夜晚攻擊一名玩家；"
+                "你只認識自己狼群的同伴，其他狼群的狼人看起來和好人一樣\n")
     
     def _build_night_action_prompt(self, game_state):
         """構建夜間行動提示
@@ -115,40 +143,32 @@ class Werewolf(BaseRole):
             game_state (dict): 當前遊戲狀態
             
         Returns:
-            str: 夜間行動提示
+            tuple: (穩定前綴, 易變後綴)
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天夜晚，狼人行動階段。\n\n"
-        
-        # 添加遊戲現狀
-        prompt += "遊戲現狀：\n"
-        prompt += f"- 你是狼人首領，需要决定今晚攻擊的目標\n"
-        
-        # 添加狼人同伴信息
-        if self.teammates:
-            alive_teammates = [tid for tid in self.teammates 
-                              if any(p["player_id"] == tid and p["is_alive"] for p in game_state["players"])]
-            if alive_teammates:
-                prompt += "- 你的狼人同伴：\n"
-                for tid in alive_teammates:
-                    teammate = next((p for p in game_state["players"] if p["player_id"] == tid), None)
-                    if teammate:
-                        prompt += f"  - 玩家{tid}（{teammate['name']}）\n"
-        
-        # 添加可選目標
-        prompt += "\n可選的攻擊目標：\n"
-        for player in game_state["players"]:
-            if (player["is_alive"] and player["player_id"] != self.player_id 
-                and player["player_id"] not in self.teammates):
-                prompt += f"- 玩家{player['player_id']}（{player['name']}）\n"
-        
-        # 添加遊戲歷史上下文
-        prompt += "\n遊戲歷史：\n"
-        for event in self.game_history[-10:]:  # 只使用最近的10個事件
-            prompt += f"- {event}\n"
-        
-        prompt += "\n請選擇一名玩家作為今晚的攻擊目標。考慮誰可能是重要角色（如預言家、女巫），以及如何製造混亂。回答格式：'我選擇攻擊玩家X'，其中X是玩家ID。"
-        
-        return prompt
+        builder = self.prompt_builder
+        _, alive_ids = builder.player_index(game_state)
+        excluded = {self.player_id, *self.teammates}
+        
+        stable = [
+            "角色資訊：\n- 你是狼人，夜晚可以和同伴一起攻擊一名玩家\n",
+            self._packs_section(),
+            self._teammates_section(game_state),
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "預言家 查驗 身份 懷疑"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天夜晚，狼人行動階段。\n",
+            "- 你是狼人首領，需要决定今晚攻擊的目標\n",
+            builder.section("attack_targets", game_state.get("version"), lambda: (
+                "\n可選的攻擊目標：\n" + self._player_list(
+                    p for p in game_state["players"] if p["player_id"] in alive_ids and p["player_id"] not in excluded
+                )
+            )),
+            "\n" + action_output.answer_instruction("attack", "請選擇一名玩家作為今晚的攻擊目標。考慮誰可能是重要角色（如預言家、女巫），以及如何製造混亂。")
+        ]
+        
+        return builder.compose(stable, volatile)
     
     def _build_discussion_prompt(self, game_state):
         """構建討論提示
@@ -157,37 +177,21 @@ class Werewolf(BaseRole):
             game_state (dict): 當前遊戲狀態
             
         Returns:
-            str: 討論提示
+            tuple: (穩定前綴, 易變後綴)
         """
-        prompt = f"現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n"
-        
-        # 添加遊戲現狀
-        prompt += "遊戲現狀：\n"
-        prompt += f"- 存活玩家：{len([p for p in game_state['players'] if p['is_alive']])}人\n"
-        prompt += f"- 昨晚死亡：{game_state['last_night_deaths'] or '無'}\n"
-        
-        # 添加狼人同伴信息
-        if self.teammates:
-            alive_teammates = [tid for tid in self.teammates 
-                              if any(p["player_id"] == tid and p["is_alive"] for p in game_state["players"])]
-            if alive_teammates:
-                prompt += "- 你的狼人同伴：\n"
-                for tid in alive_teammates:
-                    teammate = next((p for p in game_state["players"] if p["player_id"] == tid), None)
-                    if teammate:
-                        prompt += f"  - 玩家{tid}（{teammate['name']}）\n"
-        
-        # 添加遊戲歷史
-        prompt += "\n遊戲歷史：\n"
-        for event in self.game_history[-15:]:  # 只使用最近的15個事件
-            prompt += f"- {event}\n"
-        
-        # 添加今天已有的討論
-        if game_state["current_discussions"]:
-            prompt += "\n今天的討論：\n"
-            for discussion in game_state["current_discussions"]:
-                prompt += f"- {discussion['player_name']}（玩家{discussion['player_id']}）說：「{discussion['content']}」\n"
-        
-        prompt += "\n請以第一人稱發表你的看法和分析，偽裝成村民，試圖找出'狼人'（當然不是你自己）。你的發言應該看起來像是一個熱心的村民在分析局勢，但實際上你的目標是誤導其他玩家，保護自己和狼人同伴。"
-        
-        return prompt
+        stable = [
+            "角色資訊：\n- 你是狼人，正在偽裝成村民\n",
+            self._packs_section(),
+            self._teammates_section(game_state),
+            self._history_section(game_state)
+        ]
+        volatile = [
+            self._relevant_history_section(game_state, "懷疑 投票 狼人 查驗"),
+            self._belief_section(game_state),
+            f"\n現在是狼人殺遊戲的第{game_state['day']}天，白天討論階段。\n\n",
+            self._situation_section(game_state),
+            self._discussion_section(game_state),
+            "\n請以第一人稱發表你的看法和分析，偽裝成村民，試圖找出'狼人'（當然不是你自己）。你的發言應該看起來像是一個熱心的村民在分析局勢，但實際上你的目標是誤導其他玩家，保護自己和狼人同伴。"
+        ]
+        
+        return self.prompt_builder.compose(stable, volatile)
@@ -0,0 +1,21 @@
+# 無界面模擬：批量運行遊戲並統計結果
+# 子模組按需導入，以免 python -m simulation.runner 等命令在 runpy 執行前重複導入模組並發出 RuntimeWarning
+import importlib
+
+_EXPORTS = {
+    "run_game": "runner",
+    "run_simulation": "runner",
+    "SimulationReport": "runner",
+    "run_tournament": "tournament",
+    "compute_ratings": "tournament",
+    "analyze": "analytics",
+    "GameStats": "analytics"
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
@@ -0,0 +1,289 @@
+import argparse
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import Dict, Any, List, Optional, Iterator, Iterable
+
+from models.replay import ReplayReader
+from .runner import wilson_interval
+from .tournament import ROLE_TEAMS
+
+# 可分析的存檔：save_game 的 JSON 和 models.replay 的回放文件
+GAME_EXTENSIONS = (".json", ".wwr")
+
+# 每個任務分析的存檔數
+DEFAULT_CHUNK_SIZE = 256
+
+# 沒有記錄座位模型的存檔（舊存檔）使用的模型名稱
+UNKNOWN_MODEL = "未知"
+
+
+def iter_game_files(paths: Iterable[str]) -> Iterator[str]:
+    """逐個列出存檔路徑（目錄會被遞歸掃描，不會一次性列出所有文件）
+    
+    Args:
+        paths (Iterable[str]): 存檔或目錄
+        
+    Yields:
+        str: 存檔路徑
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        with os.scandir(path) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.is_dir():
+                yield from iter_game_files([entry.path])
+            elif entry.name.endswith(GAME_EXTENSIONS):
+                yield entry.path
+
+
+def read_game_summary(path: str) -> Dict[str, Any]:
+    """讀取統計需要的字段，不重建角色對象
+    
+    回放文件只解壓並解析投票記錄；JSON 存檔以內存映射方式讀取後整體解析。
+    
+    Args:
+        path (str): 存檔路徑
+        
+    Returns:
+        Dict[str, Any]: {"day", "winner", "players", "player_models", "vote_history"}
+    """
+    if path.endswith(".wwr"):
+        with ReplayReader(path) as reader:
+            vote_history = [{"day": event["day"], "votes": event["votes"], "exiled": event["exiled"]}
+                            for event in reader.iter_events(["vote"])]
+            state = dict(reader.meta, players=reader.players)
+            state.setdefault("vote_history", vote_history)
+    else:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            state = json.loads(data[:])
+    
+    return {
+        "day": state.get("day", 0),
+        "winner": state.get("winner"),
+        "players": state.get("players", []),
+        "player_models": {int(pid): model for pid, model in state.get("player_models", {}).items()},
+        "vote_history": state.get("vote_history", [])
+    }
+
+
+class GameStats:
+    """存檔的匯總統計，只保存計數器，內存佔用與存檔數量無關
+    
+    各進程分別統計一部分存檔，再用 merge 合併。
+    """
+    
+    COUNTERS = ("seats", "wins", "survived", "votes", "correct_votes")
+    
+    def __init__(self):
+        """初始化統計"""
+        self.games = 0
+        self.errors = 0
+        self.total_days = 0
+        self.wall_time = 0.0
+        self.wins = {}  # {winner: count}
+        self.models = {}  # {model: {counter: count}}
+        self.roles = {}  # {(model, role): {counter: count}}
+    
+    def _entry(self, table: Dict, key) -> Dict[str, int]:
+        return table.setdefault(key, dict.fromkeys(self.COUNTERS, 0))
+    
+    def add_game(self, summary: Dict[str, Any]):
+        """加入一局遊戲
+        
+        投票準確率：投票對象屬於對方陣營的比例（村民投狼人、狼人投村民）。
+        
+        Args:
+            summary (Dict[str, Any]): read_game_summary 的返回值
+        """
+        self.games += 1
+        self.total_days += summary["day"]
+        winner = summary["winner"] or "未分出勝負"
+        self.wins[winner] = self.wins.get(winner, 0) + 1
+        
+        teams = {p["player_id"]: ROLE_TEAMS.get(p["role"], "村民陣營") for p in summary["players"]}
+        votes_cast = {}  # {player_id: (votes, correct_votes)}
+        for entry in summary["vote_history"]:
+            for voter, target in entry["votes"].items():
+                voter, target = int(voter), int(target)
+                if voter not in teams or target not in teams:
+                    continue
+                votes, correct = votes_cast.get(voter, (0, 0))
+                votes_cast[voter] = (votes + 1, correct + (teams[voter] != teams[target]))
+        
+        for player in summary["players"]:
+            player_id = player["player_id"]
+            model = summary["player_models"].get(player_id, UNKNOWN_MODEL)
+            votes, correct = votes_cast.get(player_id, (0, 0))
+            for stats in (self._entry(self.models, model), self._entry(self.roles, (model, player["role"]))):
+                stats["seats"] += 1
+                stats["wins"] += summary["winner"] == teams[player_id]
+                stats["survived"] += bool(player["is_alive"])
+                stats["votes"] += votes
+                stats["correct_votes"] += correct
+    
+    def merge(self, other: "GameStats"):
+        """合併另一份統計
+        
+        Args:
+            other (GameStats): 統計
+        """
+        self.games += other.games
+        self.errors += other.errors
+        self.total_days += other.total_days
+        for winner, count in other.wins.items():
+            self.wins[winner] = self.wins.get(winner, 0) + count
+        for table, other_table in ((self.models, other.models), (self.roles, other.roles)):
+            for key, counters in other_table.items():
+                entry = self._entry(table, key)
+                for counter, value in counters.items():
+                    entry[counter] += value
+    
+    @staticmethod
+    def _rates(counters: Dict[str, int]) -> Dict[str, Any]:
+        """計數器對應的勝率、存活率和投票準確率（95% Wilson 置信區間）"""
+        return {
+            "seats": counters["seats"],
+            "win_rate": wilson_interval(counters["wins"], counters["seats"]),
+            "survival_rate": wilson_interval(counters["survived"], counters["seats"]),
+            "vote_accuracy": wilson_interval(counters["correct_votes"], counters["votes"])
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典
+        
+        Returns:
+            Dict[str, Any]: 報告數據，models 下按角色細分
+        """
+        models = {}
+        for model, counters in sorted(self.models.items()):
+            models[model] = dict(self._rates(counters), roles={
+                role: self._rates(role_counters)
+                for (role_model, role), role_counters in sorted(self.roles.items()) if role_model == model
+            })
+        return {
+            "games": self.games,
+            "errors": self.errors,
+            "wall_time": self.wall_time,
+            "mean_days": self.total_days / self.games if self.games else 0.0,
+            "win_rates": {winner: wilson_interval(count, self.games) for winner, count in self.wins.items()},
+            "models": models
+        }
+    
+    def format_text(self) -> str:
+        """生成文本報告
+        
+        Returns:
+            str: 報告文本
+        """
+        report = self.to_dict()
+        speed = self.games / self.wall_time if self.wall_time else 0.0
+        lines = [
+            f"存檔數：{self.games}（無法讀取 {self.errors} 個），耗時 {self.wall_time:.2f} 秒（{speed:.0f} 局/秒）",
+            f"平均天數：{report['mean_days']:.2f}",
+            "",
+            "陣營勝率（95% 置信區間）："
+        ]
+        for winner, rate in sorted(report["win_rates"].items()):
+            lines.append(f"  {winner}：{rate['rate']:.1%} [{rate['low']:.1%}, {rate['high']:.1%}]（{rate['count']} 局）")
+        
+        lines.append("")
+        lines.append(f"{'模型 / 角色':<32}{'座位':>8}{'勝率':>10}{'存活率':>10}{'投票準確率':>12}")
+        for model, stats in report["models"].items():
+            rows = [(model, stats)] + [(f"  {role}", role_stats) for role, role_stats in stats["roles"].items()]
+            for name, row in rows:
+                lines.append(f"{name:<32}{row['seats']:>8}{row['win_rate']['rate']:>10.1%}"
+                             f"{row['survival_rate']['rate']:>10.1%}{row['vote_accuracy']['rate']:>12.1%}")
+        return "\n".join(lines)
+
+
+def _analyze_chunk(paths: List[str]) -> GameStats:
+    """在工作進程中統計一批存檔
+    
+    Args:
+        paths (List[str]): 存檔路徑
+        
+    Returns:
+        GameStats: 這批存檔的統計
+    """
+    stats = GameStats()
+    for path in paths:
+        try:
+            summary = read_game_summary(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            stats.errors += 1
+            print(f"無法讀取存檔 {path}: {e}")
+            continue
+        stats.add_game(summary)
+    return stats
+
+
+def _chunks(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    """把迭代器按 size 個一組切分"""
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze(paths: Iterable[str], processes: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> GameStats:
+    """在進程池中流式統計存檔
+    
+    存檔路徑按需從目錄中讀取並分批提交，同時在處理的批次不超過進程數的兩倍，
+    每批只返回計數器，因此內存佔用與存檔總數無關。
+    
+    Args:
+        paths (Iterable[str]): 存檔或目錄
+        processes (int, optional): 進程數，1 表示在當前進程中運行。默認為 CPU 數量
+        chunk_size (int, optional): 每批的存檔數。默認為 256
+        
+    Returns:
+        GameStats: 統計結果
+    """
+    stats = GameStats()
+    started = time.perf_counter()
+    chunks = _chunks(iter_game_files(paths), chunk_size)
+    
+    if processes == 1:
+        for chunk in chunks:
+            stats.merge(_analyze_chunk(chunk))
+    else:
+        processes = processes or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = {executor.submit(_analyze_chunk, chunk) for chunk in islice(chunks, processes * 2)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stats.merge(future.result())
+                pending.update(executor.submit(_analyze_chunk, chunk) for chunk in islice(chunks, len(done)))
+    
+    stats.wall_time = time.perf_counter() - started
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m simulation.analytics saves/ --processes 4"""
+    parser = argparse.ArgumentParser(description="統計已保存的狼人殺遊戲")
+    parser.add_argument("paths", nargs="+", help="存檔（.json 或 .wwr）或包含存檔的目錄")
+    parser.add_argument("--processes", type=int, default=None, help="進程數（默認為 CPU 數量）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每批的存檔數")
+    parser.add_argument("--json", dest="json_path", default=None, help="將報告另存為 JSON 文件")
+    args = parser.parse_args(argv)
+    
+    stats = analyze(args.paths, args.processes, args.chunk_size)
+    print(stats.format_text())
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(stats.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
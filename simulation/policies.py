@@ -0,0 +1,29 @@
+from typing import Optional, Tuple
+
+# 內置的玩家策略名稱 -> (api_type, model_name)
+# api_type 為 None 時使用 GameManager 的混合模型分配
+POLICIES = {
+    "stub": ("stub", "stub"),
+    "heuristic": ("heuristic", "heuristic"),
+    "mixed": (None, None)
+}
+
+
+def parse_policy(policy: str) -> Tuple[Optional[str], Optional[str]]:
+    """解析策略名稱
+    
+    支持內置策略（見 POLICIES），或 "<api_type>:<model_name>" 形式的單一模型，
+    例如 "openai:gpt-4o-mini"。
+    
+    Args:
+        policy (str): 策略名稱
+        
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (api_type, model_name)
+    """
+    if policy in POLICIES:
+        return POLICIES[policy]
+    if ":" in policy:
+        api_type, model_name = policy.split(":", 1)
+        return api_type, model_name
+    raise ValueError(f"不支持的策略: {policy}")
@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from models.game_log import configure_game_logging
+from models.game_manager import GameManager
+from models.metrics import Histogram
+from models.replay import write_replay
+from .policies import parse_policy
+
+PHASES = ("night", "day", "vote")
+
+
+def wilson_interval(count: int, total: int, z: float = 1.96) -> Dict[str, float]:
+    """比例及其 Wilson 置信區間（默認 95%）
+    
+    Args:
+        count (int): 成功次數
+        total (int): 總次數
+        z (float, optional): 正態分位數。默認為 1.96
+        
+    Returns:
+        Dict[str, float]: {"count", "rate", "low", "high"}，total 為 0 時比例和區間為 0
+    """
+    if not total:
+        return {"count": count, "rate": 0.0, "low": 0.0, "high": 0.0}
+    p = count / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return {"count": count, "rate": p, "low": max(0.0, center - margin), "high": min(1.0, center + margin)}
+
+
+def run_game(config: Dict[str, Any]) -> Dict[str, Any]:
+    """在當前進程中無界面地運行一局完整遊戲
+    
+    Args:
+        config (Dict[str, Any]): 遊戲配置，包括 player_count、werewolf_count、special_roles、
+            policy、seed、max_days、time_scale，以及可選的 pack_count（狼群數量）、trace_path（導出 Chrome trace）
+            和 save_dir（結束後保存存檔，save_format 為 "json" 或 "replay"）
+            
+    Returns:
+        Dict[str, Any]: 遊戲結果，包括獲勝陣營、天數、總耗時和各階段耗時
+    """
+    seed = config.get("seed")
+    random.seed(seed)
+    api_type, model_name = parse_policy(config.get("policy", "stub"))
+    phase_latencies = {phase: [] for phase in PHASES}
+    
+    configure_game_logging(level="WARNING")  # 批量模擬時只輸出警告
+    game_manager = GameManager()
+    game_manager.setup_game(
+        player_count=config.get("player_count", 6),
+        werewolf_count=config.get("werewolf_count", 2),
+        special_roles=config.get("special_roles", ["seer"]),
+        human_players=[],
+        api_type=api_type,
+        model_name=model_name,
+        pack_count=config.get("pack_count")
+    )
+    _configure_handlers(game_manager, config)
+    if config.get("trace_path"):
+        game_manager.enable_tracing()
+        
+    started = time.perf_counter()
+    asyncio.run(_play(game_manager, config.get("max_days", 30), phase_latencies))
+    duration = time.perf_counter() - started
+    
+    if game_manager.tracer is not None:
+        game_manager.tracer.export_chrome_trace(config["trace_path"])
+    
+    game_state = game_manager.game_state
+    if config.get("save_dir"):
+        _save_game(game_state, config)
+    
+    return {
+        "seed": seed,
+        "policy": config.get("policy", "stub"),
+        "winner": game_state.winner,
+        "days": game_state.day,
+        "duration": duration,
+        "phase_latencies": phase_latencies
+    }
+
+
+async def _play(game_manager: GameManager, max_days: int, phase_latencies: Dict[str, List[float]]):
+    """逐階段進行遊戲並記錄每個階段的耗時
+    
+    Args:
+        game_manager (GameManager): 遊戲管理器
+        max_days (int): 最多進行的天數
+        phase_latencies (Dict[str, List[float]]): 各階段耗時，會被就地更新
+    """
+    game_state = game_manager.game_state
+    while not game_state.game_over and game_state.day <= max_days:
+        started = time.perf_counter()
+        phase = await game_manager.play_phase()
+        phase_latencies.setdefault(phase, []).append(time.perf_counter() - started)
+
+
+def _save_game(game_state, config: Dict[str, Any]):
+    """把結束的遊戲保存到 save_dir，文件名帶有種子
+    
+    Args:
+        game_state (GameState): 遊戲狀態
+        config (Dict[str, Any]): 遊戲配置
+    """
+    name = f"game_{config.get('seed')}"
+    if config.get("save_format") == "replay":
+        write_replay(game_state.to_dict(), os.path.join(config["save_dir"], name + ".wwr"))
+    else:
+        game_state.save_game(os.path.join(config["save_dir"], name + ".json"))
+
+
+def _configure_handlers(game_manager: GameManager, config: Dict[str, Any]):
+    """為可模擬的處理程序設置延遲縮放和隨機種子
+    
+    Args:
+        game_manager (GameManager): 遊戲管理器
+        config (Dict[str, Any]): 遊戲配置
+    """
+    handlers = {id(h): h for h in game_manager.api_handlers.values()}.values()
+    for handler in handlers:
+        if hasattr(handler, "time_scale"):
+            handler.time_scale = config.get("time_scale", 0.0)
+        if hasattr(handler, "rng"):
+            handler.rng.seed(config.get("seed"))
+
+
+class SimulationReport:
+    """匯總多局模擬的吞吐量、階段耗時和勝率"""
+    
+    def __init__(self):
+        """初始化報告"""
+        self.games = 0
+        self.wall_time = 0.0
+        self.wins = {}  # {winner: count}
+        self.days = Histogram(buckets=tuple(range(1, 31)))
+        self.game_latency = Histogram()
+        self.phase_latency = {phase: Histogram() for phase in PHASES}
+    
+    def add_result(self, result: Dict[str, Any]):
+        """加入一局遊戲的結果
+        
+        Args:
+            result (Dict[str, Any]): run_game 的返回值
+        """
+        self.games += 1
+        winner = result["winner"] or "未分出勝負"
+        self.wins[winner] = self.wins.get(winner, 0) + 1
+        self.days.observe(result["days"])
+        self.game_latency.observe(result["duration"])
+        for phase, latencies in result["phase_latencies"].items():
+            histogram = self.phase_latency.setdefault(phase, Histogram())
+            for latency in latencies:
+                histogram.observe(latency)
+    
+    @property
+    def games_per_second(self) -> float:
+        """每秒完成的遊戲數"""
+        return self.games / self.wall_time if self.wall_time else 0.0
+    
+    def win_rates(self) -> Dict[str, Dict[str, float]]:
+        """各陣營勝率及 95% Wilson 置信區間
+        
+        Returns:
+            Dict[str, Dict[str, float]]: {winner: {"rate", "low", "high", "count"}}
+        """
+        return {winner: wilson_interval(count, self.games) for winner, count in self.wins.items()}
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """轉換為字典
+        
+        Returns:
+            Dict[str, Any]: 報告數據
+        """
+        return {
+            "games": self.games,
+            "wall_time": self.wall_time,
+            "games_per_second": self.games_per_second,
+            "win_rates": self.win_rates(),
+            "days": self.days.to_dict(),
+            "game_latency": self.game_latency.to_dict(),
+            "phase_latency": {phase: h.to_dict() for phase, h in self.phase_latency.items()}
+        }
+    
+    def format_text(self) -> str:
+        """生成文本報告
+        
+        Returns:
+            str: 報告文本
+        """
+        lines = [
+            f"遊戲局數：{self.games}",
+            f"總耗時：{self.wall_time:.2f} 秒（{self.games_per_second:.2f} 局/秒）",
+            f"平均天數：{self.days.mean:.2f}",
+            "",
+            "勝率（95% 置信區間）："
+        ]
+        for winner, rate in sorted(self.win_rates().items()):
+            lines.append(f"  {winner}：{rate['rate']:.1%} [{rate['low']:.1%}, {rate['high']:.1%}]（{rate['count']} 局）")
+        
+        for phase, histogram in self.phase_latency.items():
+            if not histogram.count:
+                continue
+            lines.append("")
+            lines.append(f"{phase} 階段耗時：平均 {histogram.mean * 1000:.3f} ms，"
+                         f"p50 <= {histogram.quantile(0.5) * 1000:g} ms，p99 <= {histogram.quantile(0.99) * 1000:g} ms")
+            lines.extend("  " + line for line in histogram.format_lines())
+        return "\n".join(lines)
+
+
+def run_simulation(games: int, processes: int = None, player_count: int = 6, werewolf_count: int = 2,
+                   special_roles: List[str] = None, policy: str = "stub", seed: int = 0,
+                   max_days: int = 30, time_scale: float = 0.0, trace_path: str = None,
+                   save_dir: str = None, save_format: str = "json", pack_count: int = None) -> SimulationReport:
+    """在進程池中運行多局遊戲並匯總結果
+    
+    Args:
+        games (int): 遊戲局數
+        processes (int, optional): 進程數，1 表示在當前進程中運行。默認為 CPU 數量
+        player_count (int, optional): 玩家數量。默認為 6
+        werewolf_count (int, optional): 狼人數量。默認為 2
+        special_roles (List[str], optional): 特殊角色列表。默認為 ["seer"]
+        policy (str, optional): 玩家策略（見 simulation.policies）。默認為 "stub"
+        seed (int, optional): 基礎隨機種子，第 i 局使用 seed + i。默認為 0
+        max_days (int, optional): 每局最多進行的天數。默認為 30
+        time_scale (float, optional): 替身處理程序的延遲縮放，0 表示不等待。默認為 0
+        trace_path (str, optional): 將第一局的追蹤導出為 Chrome trace JSON。默認不追蹤
+        save_dir (str, optional): 保存每局存檔的目錄（供 simulation.analytics 分析）。默認不保存
+        save_format (str, optional): 存檔格式，"json" 或 "replay"。默認為 "json"
+        pack_count (int, optional): 狼群數量。默認按大廳人數決定（見 default_pack_count）
+        
+    Returns:
+        SimulationReport: 模擬報告
+    """
+    if special_roles is None:
+        special_roles = ["seer"]
+    
+    configs = [{
+        "player_count": player_count,
+        "werewolf_count": werewolf_count,
+        "special_roles": special_roles,
+        "policy": policy,
+        "seed": seed + i,
+        "max_days": max_days,
+        "time_scale": time_scale,
+        "pack_count": pack_count
+    } for i in range(games)]
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        for config in configs:
+            config["save_dir"] = save_dir
+            config["save_format"] = save_format
+    if trace_path and configs:
+        configs[0]["trace_path"] = trace_path
+    
+    report = SimulationReport()
+    started = time.perf_counter()
+    
+    if processes == 1:
+        for result in map(run_game, configs):
+            report.add_result(result)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunksize = max(1, games // ((processes or os.cpu_count() or 1) * 4))
+            for result in executor.map(run_game, configs, chunksize=chunksize):
+                report.add_result(result)
+    
+    report.wall_time = time.perf_counter() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m simulation.runner --games 200 --processes 4"""
+    parser = argparse.ArgumentParser(description="無界面批量運行狼人殺遊戲")
+    parser.add_argument("--games", type=int, default=100, help="遊戲局數")
+    parser.add_argument("--processes", type=int, default=None, help="進程數（默認為 CPU 數量）")
+    parser.add_argument("--players", type=int, default=6, help="玩家數量")
+    parser.add_argument("--werewolves", type=int, default=2, help="狼人數量")
+    parser.add_argument("--special-roles", default="seer", help="特殊角色，以逗號分隔")
+    parser.add_argument("--packs", type=int, default=None, help="狼群數量（默認按大廳人數決定）")
+    parser.add_argument("--policy", default="stub", help="玩家策略：stub、heuristic、mixed 或 <api_type>:<model_name>")
+    parser.add_argument("--seed", type=int, default=0, help="基礎隨機種子")
+    parser.add_argument("--max-days", type=int, default=30, help="每局最多進行的天數")
+    parser.add_argument("--time-scale", type=float, default=0.0, help="替身處理程序的延遲縮放")
+    parser.add_argument("--json", dest="json_path", default=None, help="將報告另存為 JSON 文件")
+    parser.add_argument("--trace", dest="trace_path", default=None,
+                        help="將第一局的追蹤導出為 Chrome trace JSON（可在 ui.perfetto.dev 打開）")
+    parser.add_argument("--save-dir", default=None, help="保存每局存檔的目錄")
+    parser.add_argument("--save-format", choices=("json", "replay"), default="json", help="存檔格式")
+    args = parser.parse_args(argv)
+    
+    special_roles = [role.strip() for role in args.special_roles.split(",") if role.strip()]
+    report = run_simulation(args.games, args.processes, args.players, args.werewolves, special_roles,
+                            args.policy, args.seed, args.max_days, args.time_scale, args.trace_path,
+                            args.save_dir, args.save_format, args.packs)
+    print(report.format_text())
+    
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+from models.game_log import configure_game_logging
+from models.game_manager import GameManager
+from .policies import parse_policy
+from .runner import _configure_handlers
+
+# Elo 參數：每局每個陣營的分數變化為 K_FACTOR * (實際 - 期望)，平均分給陣營成員
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+# 角色所屬陣營
+ROLE_TEAMS = {
+    "werewolf": "狼人陣營",
+    "seer": "村民陣營",
+    "villager": "村民陣營"
+}
+
+
+class _LimitedHandler:
+    """為處理程序的模型調用加上提供商並發限制，並統計調用次數和耗時
+    
+    其他屬性（例如規則玩家的 choose_target）直接轉發給原處理程序。
+    """
+    
+    def __init__(self, handler, semaphore: Optional[asyncio.Semaphore], calls: Dict[str, float]):
+        """初始化
+        
+        Args:
+            handler: 原處理程序
+            semaphore (asyncio.Semaphore, optional): 提供商的並發限制，None 表示不限制
+            calls (Dict[str, float]): 調用統計 {"count", "seconds"}，會被就地更新
+        """
+        self._handler = handler
+        self._semaphore = semaphore
+        self._calls = calls
+    
+    def __getattr__(self, name):
+        return getattr(self._handler, name)
+    
+    async def get_response(self, *args, **kwargs):
+        """在並發限制內調用原處理程序"""
+        async with self._semaphore or contextlib.nullcontext():
+            started = time.perf_counter()
+            try:
+                return await self._handler.get_response(*args, **kwargs)
+            finally:
+                self._calls["count"] += 1
+                self._calls["seconds"] += time.perf_counter() - started
+
+
+def schedule(models: List[str], games: int, player_count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """生成循環賽賽程
+    
+    第 i 局中座位 j 使用 models[(i + j) % len(models)]，角色由遊戲隨機分配，
+    因此局數足夠時每個模型在各座位和角色上出現的次數大致相同。
+    
+    Args:
+        models (List[str]): 參賽模型，格式為 "<api_type>:<model_name>"
+        games (int): 遊戲局數
+        player_count (int): 每局玩家數量
+        seed (int, optional): 基礎隨機種子，第 i 局使用 seed + i。默認為 0
+        
+    Returns:
+        List[Dict[str, Any]]: 每局的 {"game", "seed", "seats": {player_id: model}}
+    """
+    return [{
+        "game": i,
+        "seed": seed + i,
+        "seats": {player_id: models[(i + player_id - 1) % len(models)] for player_id in range(1, player_count + 1)}
+    } for i in range(games)]
+
+
+def tournament_settings(models: List[str], seed: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """影響對局結果的錦標賽參數，寫入每條對局記錄，繼續錦標賽時用於檢查結果文件是否屬於同一組參數
+    
+    Args:
+        models (List[str]): 參賽模型
+        seed (int): 基礎隨機種子
+        config (Dict[str, Any]): 遊戲配置（time_scale 只影響耗時，不計入）
+        
+    Returns:
+        Dict[str, Any]: {"models", "seed", "player_count", "werewolf_count", "special_roles", "max_days"}
+    """
+    return {
+        "models": list(models),
+        "seed": seed,
+        "player_count": config["player_count"],
+        "werewolf_count": config["werewolf_count"],
+        "special_roles": list(config["special_roles"]),
+        "max_days": config["max_days"]
+    }
+
+
+def load_results(path: str) -> List[Dict[str, Any]]:
+    """讀取已完成的對局記錄（忽略中斷時寫了一半的行）
+    
+    Args:
+        path (str): JSONL 文件路徑
+        
+    Returns:
+        List[Dict[str, Any]]: 對局記錄
+    """
+    if not path or not os.path.exists(path):
+        return []
+    results = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return results
+
+
+async def _play_game(fixture: Dict[str, Any], config: Dict[str, Any], provider_limits: Dict[str, asyncio.Semaphore],
+                     settings: Dict[str, Any]):
+    """運行賽程中的一局遊戲
+    
+    角色分配和處理程序使用本局自己的隨機種子，不使用全局的 random，同時進行的多局互不影響。
+    
+    Args:
+        fixture (Dict[str, Any]): 賽程中的一局
+        config (Dict[str, Any]): 遊戲配置
+        provider_limits (Dict[str, asyncio.Semaphore]): 各提供商的並發限制
+        settings (Dict[str, Any]): 錦標賽參數，寫入對局記錄，見 tournament_settings
+        
+    Returns:
+        Dict[str, Any]: 對局記錄
+    """
+    seat_models = {pid: parse_policy(model) for pid, model in fixture["seats"].items()}
+    game_manager = GameManager()
+    game_manager.setup_game(
+        player_count=config["player_count"],
+        werewolf_count=config["werewolf_count"],
+        special_roles=config["special_roles"],
+        human_players=[],
+        seat_models=seat_models,
+        seed=fixture["seed"]
+    )
+    _configure_handlers(game_manager, {"seed": fixture["seed"], "time_scale": config["time_scale"]})
+    
+    # 同一模型共用處理程序，包裝一次即可
+    calls = {}
+    wrappers = {}
+    for player_id, handler in game_manager.api_handlers.items():
+        model = fixture["seats"][player_id]
+        if id(handler) not in wrappers:
+            stats = calls.setdefault(model, {"count": 0, "seconds": 0.0})
+            wrappers[id(handler)] = _LimitedHandler(handler, provider_limits.get(seat_models[player_id][0]), stats)
+        game_manager.api_handlers[player_id] = wrappers[id(handler)]
+    
+    started = time.perf_counter()
+    game_state = game_manager.game_state
+    while not game_state.game_over and game_state.day <= config["max_days"]:
+        await game_manager.play_phase()
+    
+    return {
+        "game": fixture["game"],
+        "seed": fixture["seed"],
+        "seats": {str(pid): model for pid, model in fixture["seats"].items()},
+        "roles": {str(p["player_id"]): p["role"] for p in game_state.players},
+        "winner": game_state.winner,
+        "days": game_state.day,
+        "duration": time.perf_counter() - started,
+        "calls": calls,
+        "settings": settings
+    }
+
+
+async def run_tournament_async(models: List[str], games: int, results_path: str = None, concurrency: int = 4,
+                               provider_limits: Dict[str, int] = None, player_count: int = 6, werewolf_count: int = 2,
+                               special_roles: List[str] = None, seed: int = 0, max_days: int = 30,
+                               time_scale: float = 0.0) -> List[Dict[str, Any]]:
+    """運行錦標賽，已記錄在結果文件中的對局會被跳過
+    
+    結果文件中的記錄必須來自同一組參數（模型、種子和遊戲配置），否則拒絕繼續，
+    以免不同參數的對局混入同一份 Elo 排名。
+    
+    Args:
+        models (List[str]): 參賽模型，格式為 "<api_type>:<model_name>"
+        games (int): 遊戲局數
+        results_path (str, optional): 結果 JSONL 文件，每完成一局追加一行。默認不保存
+        concurrency (int, optional): 同時進行的最大局數。默認為 4
+        provider_limits (Dict[str, int], optional): 各提供商（api_type）同時進行的最大模型調用數
+        player_count (int, optional): 玩家數量。默認為 6
+        werewolf_count (int, optional): 狼人數量。默認為 2
+        special_roles (List[str], optional): 特殊角色列表。默認為 ["seer"]
+        seed (int, optional): 基礎隨機種子。默認為 0
+        max_days (int, optional): 每局最多進行的天數。默認為 30
+        time_scale (float, optional): 替身處理程序的延遲縮放。默認為 0
+        
+    Returns:
+        List[Dict[str, Any]]: 所有對局記錄（包括之前已完成的）
+    """
+    config = {
+        "player_count": player_count,
+        "werewolf_count": werewolf_count,
+        "special_roles": special_roles if special_roles is not None else ["seer"],
+        "max_days": max_days,
+        "time_scale": time_scale
+    }
+    settings = tournament_settings(models, seed, config)
+    results = load_results(results_path)
+    if any(result.get("settings") != settings for result in results):
+        raise ValueError(f"結果文件 {results_path} 中的對局使用了不同的模型、種子或遊戲配置，請換一個結果文件")
+    done = {result["game"] for result in results}
+    pending = [f for f in schedule(models, games, player_count, seed) if f["game"] not in done]
+    
+    game_limit = asyncio.Semaphore(max(1, concurrency))
+    limits = {provider: asyncio.Semaphore(limit) for provider, limit in (provider_limits or {}).items()}
+    
+    async def play(fixture):
+        async with game_limit:
+            result = await _play_game(fixture, config, limits, settings)
+        # 每局完成後立即寫入，中斷後可以從這裡繼續
+        if results_path:
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        results.append(result)
+    
+    configure_game_logging(level="WARNING")  # 錦標賽時只輸出警告
+    await asyncio.gather(*(play(fixture) for fixture in pending))
+    
+    return sorted(results, key=lambda result: result["game"])
+
+
+def run_tournament(models: List[str], games: int, **kwargs) -> List[Dict[str, Any]]:
+    """同步運行錦標賽，參數見 run_tournament_async"""
+    return asyncio.run(run_tournament_async(models, games, **kwargs))
+
+
+def compute_ratings(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """根據對局記錄計算每個模型在每個角色上的 Elo 分數
+    
+    每局視為兩個陣營之間的對決：陣營的期望勝率由其成員當前分數的平均值計算，
+    陣營的分數變化平均分給每名成員的（模型, 角色）分數，兩個陣營的總變化互相抵消；
+    模型的總分以同樣方式更新。
+    
+    Args:
+        results (List[Dict[str, Any]]): 對局記錄，按對局編號順序處理
+        
+    Returns:
+        Dict[str, Dict[str, Any]]: {model: {"rating", "games", "wins", "roles": {role: {"rating", "games", "wins"}},
+            "calls", "mean_call_seconds"}}
+    """
+    table = {}
+    
+    def entry(model):
+        return table.setdefault(model, {"rating": INITIAL_RATING, "games": 0, "wins": 0, "roles": {},
+                                        "calls": 0, "call_seconds": 0.0})
+    
+    for result in sorted(results, key=lambda r: r["game"]):
+        for model, stats in result.get("calls", {}).items():
+            entry(model)["calls"] += stats["count"]
+            entry(model)["call_seconds"] += stats["seconds"]
+        if not result.get("winner"):
+            continue
+        
+        # 按陣營分組 (model, role)
+        teams = {}
+        for player_id, model in result["seats"].items():
+            role = result["roles"][player_id]
+            teams.setdefault(ROLE_TEAMS.get(role, "村民陣營"), []).append((model, role))
+        if len(teams) != 2:
+            continue
+        
+        def role_entry(model, role):
+            return entry(model)["roles"].setdefault(role, {"rating": INITIAL_RATING, "games": 0, "wins": 0})
+        
+        averages = {team: sum(role_entry(m, r)["rating"] for m, r in members) / len(members)
+                    for team, members in teams.items()}
+        overall = {team: sum(entry(m)["rating"] for m, _ in members) / len(members)
+                   for team, members in teams.items()}
+        
+        updates = []
+        for team, members in teams.items():
+            opponent = next(t for t in teams if t != team)
+            score = 1.0 if result["winner"] == team else 0.0
+            expected_role = 1 / (1 + 10 ** ((averages[opponent] - averages[team]) / 400))
+            expected_model = 1 / (1 + 10 ** ((overall[opponent] - overall[team]) / 400))
+            share = K_FACTOR / len(members)
+            for model, role in members:
+                updates.append((model, role, score, share * (score - expected_role), share * (score - expected_model)))
+        
+        # 所有期望值基於更新前的分數計算，再統一應用
+        for model, role, score, role_delta, model_delta in updates:
+            stats = role_entry(model, role)
+            stats["rating"] += role_delta
+            stats["games"] += 1
+            stats["wins"] += int(score)
+            entry(model)["rating"] += model_delta
+            entry(model)["games"] += 1
+            entry(model)["wins"] += int(score)
+    
+    for stats in table.values():
+        stats["mean_call_seconds"] = stats["call_seconds"] / stats["calls"] if stats["calls"] else 0.0
+    return table
+
+
+def format_ratings(ratings: Dict[str, Dict[str, Any]]) -> str:
+    """生成排名文本
+    
+    Args:
+        ratings (Dict[str, Dict[str, Any]]): compute_ratings 的返回值
+        
+    Returns:
+        str: 排名文本
+    """
+    lines = []
+    for rank, (model, stats) in enumerate(sorted(ratings.items(), key=lambda item: -item[1]["rating"]), 1):
+        win_rate = stats["wins"] / stats["games"] if stats["games"] else 0.0
+        lines.append(f"{rank}. {model}：Elo {stats['rating']:.0f}，勝率 {win_rate:.1%}（{stats['games']} 座次），"
+                     f"平均調用 {stats['mean_call_seconds'] * 1000:.1f} ms")
+        for role, role_stats in sorted(stats["roles"].items()):
+            lines.append(f"     {role}：Elo {role_stats['rating']:.0f}（{role_stats['wins']}/{role_stats['games']} 勝）")
+    return "\n".join(lines)
+
+
+def _parse_limits(values: List[str]) -> Dict[str, int]:
+    """解析 "provider=limit" 形式的提供商並發限制"""
+    limits = {}
+    for value in values or []:
+        provider, limit = value.split("=", 1)
+        limits[provider.strip()] = int(limit)
+    return limits
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行入口：python -m simulation.tournament --models stub:a,heuristic:bot --games 100"""
+    parser = argparse.ArgumentParser(description="在多個模型之間進行循環賽並計算 Elo 分數")
+    parser.add_argument("--models", required=True, help="參賽模型，以逗號分隔，格式為 <api_type>:<model_name>")
+    parser.add_argument("--games", type=int, default=100, help="遊戲局數")
+    parser.add_argument("--results", default="tournament.jsonl", help="結果文件（JSONL），存在時從中斷處繼續")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時進行的最大局數")
+    parser.add_argument("--provider-limit", action="append", default=[],
+                        help="提供商的最大並發調用數，例如 openai=8，可重複指定")
+    parser.add_argument("--players", type=int, default=6, help="玩家數量")
+    parser.add_argument("--werewolves", type=int, default=2, help="狼人數量")
+    parser.add_argument("--special-roles", default="seer", help="特殊角色，以逗號分隔")
+    parser.add_argument("--seed", type=int, default=0, help="基礎隨機種子")
+    parser.add_argument("--max-days", type=int, default=30, help="每局最多進行的天數")
+    parser.add_argument("--time-scale", type=float, default=0.0, help="替身處理程序的延遲縮放")
+    args = parser.parse_args(argv)
+    
+    models = [model.strip() for model in args.models.split(",") if model.strip()]
+    special_roles = [role.strip() for role in args.special_roles.split(",") if role.strip()]
+    results = run_tournament(models, args.games, results_path=args.results, concurrency=args.concurrency,
+                             provider_limits=_parse_limits(args.provider_limit), player_count=args.players,
+                             werewolf_count=args.werewolves, special_roles=special_roles, seed=args.seed,
+                             max_days=args.max_days, time_scale=args.time_scale)
+    print(format_ratings(compute_ratings(results)))
+
+
+if __name__ == "__main__":
+    main()
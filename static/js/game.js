@@ -1,3 +1,7 @@
+    // 服務器分配給本頁面的座位（觀眾和全AI模式為 null）
+    const playerSeatMeta = document.querySelector('meta[name="player-id"]');
+    const playerSeat = playerSeatMeta && playerSeatMeta.content ? parseInt(playerSeatMeta.content) : null;
+    
     // 根據遊戲階段更新UI
     function updatePhaseUI() {
         // 隱藏所有操作區域
@@ -65,7 +69,7 @@
                 messageElem.className = 'log-entry';
                 
                 // 判斷是否是自己的發言
-                const isSelf = !isAllAI && discussion.player_id === 1;
+                const isSelf = !isAllAI && discussion.player_id === playerSeat;
                 
                 messageElem.innerHTML = `
                     <strong>${discussion.player_name}${isSelf ? '（你）' : ''}:</strong> ${discussion.content}
@@ -77,4 +81,77 @@
             // 自動滾動到底部
             discussionLog.scrollTop = discussionLog.scrollHeight;
         }
-    }
\ No newline at end of file
+    }
+    
+    // 更新勝率預測（每個階段結束後由服務器推送）
+    function updateWinProbability(data) {
+        const village = data['村民陣營'] || 0;
+        const werewolf = data['狼人陣營'] || 0;
+        
+        document.getElementById('village-win-rate').textContent = `${(village * 100).toFixed(1)}%`;
+        document.getElementById('werewolf-win-rate').textContent = `${(werewolf * 100).toFixed(1)}%`;
+        document.getElementById('village-win-bar').style.width = `${village * 100}%`;
+        document.getElementById('werewolf-win-bar').style.width = `${werewolf * 100}%`;
+    }
+    
+    socket.on('win_probability', function(data) {
+        rememberSeq(data.seq, data.epoch);
+        updateWinProbability(data);
+    });
+    
+    // 事件序號：記住最後收到的序號，重連或刷新頁面後只請求錯過的事件
+    // 序號只在同一個 epoch 內有效，服務器重啟或房間重建後 epoch 改變，序號重新計數
+    const resumeGameId = window.location.pathname.split('/').pop();
+    const seqStorageKey = `werewolf-last-seq:${resumeGameId}`;
+    const epochStorageKey = `werewolf-seq-epoch:${resumeGameId}`;
+    let lastSeq = parseInt(sessionStorage.getItem(seqStorageKey) || '0');
+    let seqEpoch = sessionStorage.getItem(epochStorageKey);
+    
+    function rememberSeq(seq, epoch) {
+        if (epoch && epoch !== seqEpoch) {
+            seqEpoch = epoch;
+            lastSeq = 0;
+            sessionStorage.setItem(epochStorageKey, seqEpoch);
+        }
+        if (typeof seq === 'number' && seq > lastSeq) {
+            lastSeq = seq;
+            sessionStorage.setItem(seqStorageKey, String(lastSeq));
+        }
+    }
+    
+    socket.on('connect', function() {
+        socket.emit('resume', {
+            game_id: resumeGameId,
+            last_seq: lastSeq,
+            epoch: seqEpoch,
+            player_id: isAllAI ? null : playerSeat
+        });
+    });
+    
+    // 房間狀態更新：服務器按可見性分組只序列化一次，收到的是 UTF-8 JSON 字節
+    const roomUpdateDecoder = new TextDecoder('utf-8');
+    socket.on('room_update', function(data) {
+        const update = JSON.parse(roomUpdateDecoder.decode(data));
+        const sameEpoch = !update.epoch || update.epoch === seqEpoch;
+        if (sameEpoch && typeof update.seq === 'number' && update.seq <= lastSeq) {
+            return; // 已經處理過的狀態（例如重連時重複收到）
+        }
+        rememberSeq(update.seq, update.epoch);
+        
+        // 房間狀態不含自己的角色，保留已知的角色信息
+        const knownRoles = {};
+        (gameState.players || []).forEach(player => {
+            if (player.role) {
+                knownRoles[player.player_id] = player.role;
+            }
+        });
+        update.players.forEach(player => {
+            if (!player.role && knownRoles[player.player_id]) {
+                player.role = knownRoles[player.player_id];
+            }
+        });
+        
+        Object.assign(gameState, update);
+        updatePhaseUI();
+        updateDiscussionLog();
+    });
\ No newline at end of file
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from models.game_manager import GameManager
+from models.game_state import GameState
+from models.replay import ReplayReader, convert_json_save
+
+
+def play_game(player_count, werewolf_count, max_phases=None):
+    """用規則玩家進行一局遊戲，max_phases 為 None 時進行到結束
+    
+    Returns:
+        GameState: 遊戲狀態
+    """
+    random.seed(7)
+    game_manager = GameManager()
+    game_manager.setup_game(player_count, werewolf_count, ["seer"], human_players=[], api_type="heuristic",
+                            model_name="heuristic", seed=7)
+    for handler in game_manager.api_handlers.values():
+        handler.rng.seed(7)
+    
+    async def run():
+        phases = 0
+        while not game_manager.game_state.game_over and (max_phases is None or phases < max_phases):
+            await game_manager.play_phase()
+            phases += 1
+    
+    asyncio.run(run())
+    return game_manager.game_state
+
+
+def round_trip(game_state, tmp_path):
+    """把遊戲保存為 JSON 存檔並轉換為回放文件
+    
+    Returns:
+        tuple: (JSON 存檔的內容, 回放還原的狀態, 回放讀取器)
+    """
+    json_path = tmp_path / "game.json"
+    replay_path = tmp_path / "game.wwr"
+    game_state.save_game(str(json_path))
+    convert_json_save(str(json_path), str(replay_path))
+    with open(json_path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    reader = ReplayReader(str(replay_path))
+    return saved, reader.to_state(), reader
+
+
+@pytest.mark.parametrize("player_count, werewolf_count, max_phases", [
+    (6, 2, None),  # 完整的一局
+    (9, 2, 4),  # 中途存檔，保留當天的發言和投票
+    (60, 12, None)  # 大廳模式，有多個狼群
+])
+def test_replay_matches_json_save(tmp_path, player_count, werewolf_count, max_phases):
+    """回放還原的狀態與 JSON 存檔的內容完全一致"""
+    game_state = play_game(player_count, werewolf_count, max_phases)
+    saved, restored, reader = round_trip(game_state, tmp_path)
+    try:
+        assert restored == saved
+    finally:
+        reader.close()
+
+
+def test_replay_loads_into_same_game_state(tmp_path):
+    """回放和 JSON 存檔載入後的遊戲狀態相同"""
+    game_state = play_game(9, 2, 5)
+    saved, restored, reader = round_trip(game_state, tmp_path)
+    reader.close()
+    assert GameState.from_dict(restored).to_dict() == GameState.from_dict(saved).to_dict()
+
+
+def test_read_day_matches_stream(tmp_path):
+    """通過索引讀取某一天與按順序讀取的事件相同"""
+    game_state = play_game(6, 2)
+    _, _, reader = round_trip(game_state, tmp_path)
+    with reader:
+        events = list(reader.iter_events())
+        assert reader.days
+        for day in reader.days:
+            assert reader.read_day(day) == [event for event in events if event["day"] == day]